@@ -0,0 +1,128 @@
+"""Paired comparisons of two bout variants with variance reduction.
+
+Each variant is a pair of fencer specs, for example the same opponent
+against two weight profiles. With common random numbers, bout i of both
+variants runs on the same named streams (see ``sim.BoutStreams``), so the
+distance path and rolls match and the per-bout difference in outcome only
+reflects the change between the variants. Antithetic pairing additionally
+plays every bout a second time on the mirrored streams.
+"""
+import argparse
+import random
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from sim import BoutStreams, FencerSpec, HeadlessBout, derive_seed
+from stats import RunningStats
+
+Variant = Tuple[FencerSpec, FencerSpec]
+
+
+@dataclass
+class PairedComparison:
+    """Estimate of P(fencer 1 wins | a) - P(fencer 1 wins | b)"""
+    difference: RunningStats = field(default_factory=RunningStats)
+    outcome_a: RunningStats = field(default_factory=RunningStats)
+    outcome_b: RunningStats = field(default_factory=RunningStats)
+
+    @property
+    def estimate(self) -> float:
+        return self.difference.mean
+
+    @property
+    def standard_error(self) -> float:
+        return self.difference.standard_error
+
+    def confidence_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        return self.difference.confidence_interval(z)
+
+    @property
+    def variance_reduction(self) -> float:
+        """Variance of independent sampling over that of the paired one.
+
+        Roughly how many times more bouts two independent runs would need
+        for the same standard error.
+        """
+        paired = self.difference.variance
+        independent = self.outcome_a.variance + self.outcome_b.variance
+        return independent / paired if paired else float("inf")
+
+
+def _outcome(fencers, points_to_win: int, streams: BoutStreams) -> float:
+    fencer1, fencer2 = fencers
+    fencer1.reset()
+    fencer2.reset()
+    result = HeadlessBout(fencer1, fencer2, points_to_win,
+                          streams=streams).simulate_bout()
+    return 1.0 if result.winner == 1 else 0.0
+
+
+def compare_variants(variant_a: Variant,
+                     variant_b: Variant,
+                     n: int,
+                     seed: Optional[int] = None,
+                     points_to_win: int = 5,
+                     common_random_numbers: bool = True,
+                     antithetic: bool = False) -> PairedComparison:
+    """Plays n paired bouts of both variants and estimates the difference.
+
+    Without ``common_random_numbers`` variant b gets independent streams,
+    which is the baseline the variance reduction is measured against. With
+    ``antithetic`` every bout is also replayed on mirrored streams and the
+    two outcomes are averaged, so n pairs cost 4n bouts.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+
+    fencers_a = tuple(spec.build() for spec in variant_a)
+    fencers_b = tuple(spec.build() for spec in variant_b)
+    comparison = PairedComparison()
+
+    for index in range(n):
+        seed_a = derive_seed(seed, index)
+        seed_b = seed_a if common_random_numbers else derive_seed(
+            seed, index, "b")
+        mirrors = (False, True) if antithetic else (False, )
+
+        outcome_a = sum(
+            _outcome(fencers_a, points_to_win,
+                     BoutStreams.from_seed(seed_a, mirror))
+            for mirror in mirrors) / len(mirrors)
+        outcome_b = sum(
+            _outcome(fencers_b, points_to_win,
+                     BoutStreams.from_seed(seed_b, mirror))
+            for mirror in mirrors) / len(mirrors)
+
+        comparison.outcome_a.add(outcome_a)
+        comparison.outcome_b.add(outcome_b)
+        comparison.difference.add(outcome_a - outcome_b)
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two fencer skill levels against one opponent")
+    parser.add_argument("--skill-a", type=float, default=0.7)
+    parser.add_argument("--skill-b", type=float, default=0.65)
+    parser.add_argument("--opponent", type=float, default=0.6)
+    parser.add_argument("--bouts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    opponent = FencerSpec("Opponent", args.opponent)
+    variant_a = (FencerSpec("A", args.skill_a), opponent)
+    variant_b = (FencerSpec("B", args.skill_b), opponent)
+
+    for label, options in (("independent", dict(common_random_numbers=False)),
+                           ("common random numbers", {}),
+                           ("common + antithetic", dict(antithetic=True))):
+        result = compare_variants(variant_a, variant_b, args.bouts,
+                                  args.seed, **options)
+        low, high = result.confidence_interval()
+        print(f"{label:22}: {result.estimate:+.4f} "
+              f"[{low:+.4f}, {high:+.4f}] "
+              f"stderr {result.standard_error:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Bout environments for training agents in place of Fencer.choose_action.
+
+The agent fences as fencer 1 against a rule-based opponent. Every step is one
+agent decision: the agent's attack resolves, the opponent plays its round,
+and the distance update of the agent's next round happens before the next
+observation, so the agent always sees the distance it will attack from.
+
+Actions are indices into ``ACTIONS`` (every ActionType). An action that is
+not executable at the current distance wastes the turn; ``action_mask`` in
+the info dict marks the executable ones. The reward is +1 for winning the
+bout, -1 for losing it and 0 otherwise.
+
+``FencingEnv`` runs one bout on the reference engine objects. ``VectorEnv``
+runs thousands on NumPy arrays with the vectorized engine's tables and
+resets finished bouts automatically.
+"""
+import random
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from sim import (ACTION_ORDINALS, BLADE_ORDINALS, DISTANCE_ORDINALS,
+                 ActionType, BladePosition, BoutStreams, DistanceManager,
+                 DistanceType, Fencer, FencerSpec, FencingAction, FencingBout,
+                 derive_seed)
+from vectorized import VectorizedBoutEngine
+
+ACTIONS = list(ActionType)
+DISTANCES = list(DistanceType)
+BLADES = list(BladePosition)
+
+OBSERVATION_FIELDS = ("distance", "own_blade", "opponent_blade", "own_score",
+                      "opponent_score", "has_priority", "has_preparation",
+                      "opponent_has_priority", "opponent_has_preparation")
+
+
+def _is_executable(fencer: Fencer, action_type: ActionType,
+                   distance: DistanceType) -> bool:
+    return (action_type in DistanceManager.get_candidate_actions()[distance]
+            and FencingAction(action_type, fencer, distance).can_execute())
+
+
+class FencingEnv:
+    """Single bout with a reset/step interface"""
+
+    action_count = len(ACTIONS)
+    observation_size = len(OBSERVATION_FIELDS)
+
+    def __init__(self,
+                 agent: FencerSpec,
+                 opponent: FencerSpec,
+                 points_to_win: int = 5):
+        self.agent_spec = agent
+        self.opponent_spec = opponent
+        self.points_to_win = points_to_win
+        self.bout: Optional[FencingBout] = None
+        self.terminated = False
+        self._seed_source = random.Random()
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
+        if seed is None:
+            seed = self._seed_source.getrandbits(64)
+        self.bout = FencingBout(self.agent_spec.build(),
+                                self.opponent_spec.build(),
+                                self.points_to_win,
+                                sinks=[],
+                                streams=BoutStreams.from_seed(seed))
+        self.terminated = False
+        self._start_agent_round()
+        return self._observation(), self._info()
+
+    def step(self,
+             action: int) -> Tuple[np.ndarray, float, bool, bool, Dict]:
+        """Returns (observation, reward, terminated, truncated, info).
+
+        Unlike VectorEnv, a finished bout is not restarted: stepping it
+        again raises until reset() is called.
+        """
+        if self.bout is None or self.terminated:
+            raise RuntimeError("call reset() before stepping a new bout")
+        if not 0 <= action < self.action_count:
+            raise ValueError(
+                f"action {action} is outside [0, {self.action_count})")
+        bout = self.bout
+        agent, opponent = bout.fencer1, bout.fencer2
+
+        action_type = ACTIONS[action]
+        if _is_executable(agent, action_type, bout.distance):
+            self._resolve(FencingAction(action_type, agent, bout.distance))
+
+        if not self._finished():
+            # Opponent round, played by the rule-based policy
+            bout.current_fencer, bout.opponent_fencer = opponent, agent
+            bout.rounds += 1
+            bout._update_distance()
+            choice = opponent.choose_action(bout.distance,
+                                            agent.blade_position,
+                                            bout.streams.choice)
+            if choice:
+                self._resolve(choice)
+
+        terminated = self.terminated = self._finished()
+        if not terminated:
+            self._start_agent_round()
+
+        reward = 0.0
+        if terminated:
+            reward = 1.0 if agent.score >= self.points_to_win else -1.0
+        return self._observation(), reward, terminated, False, self._info()
+
+    def action_mask(self) -> np.ndarray:
+        agent = self.bout.fencer1
+        return np.array([
+            _is_executable(agent, action_type, self.bout.distance)
+            for action_type in ACTIONS
+        ])
+
+    def _start_agent_round(self):
+        bout = self.bout
+        bout.current_fencer, bout.opponent_fencer = bout.fencer1, bout.fencer2
+        bout.rounds += 1
+        bout._update_distance()
+
+    def _resolve(self, action: FencingAction):
+        bout = self.bout
+        probability = bout._calculate_modified_success_probability(action)
+        if bout.streams.roll.random() <= probability:
+            bout.current_fencer.score += 1
+
+    def _finished(self) -> bool:
+        return max(self.bout.fencer1.score,
+                   self.bout.fencer2.score) >= self.points_to_win
+
+    def _observation(self) -> np.ndarray:
+        agent, opponent = self.bout.fencer1, self.bout.fencer2
+        return np.array([
+            DISTANCE_ORDINALS[self.bout.distance],
+            BLADE_ORDINALS[agent.blade_position],
+            BLADE_ORDINALS[opponent.blade_position], agent.score,
+            opponent.score, agent.has_priority, agent.has_preparation,
+            opponent.has_priority, opponent.has_preparation
+        ],
+                        dtype=np.int16)
+
+    def _info(self) -> Dict:
+        return {"action_mask": self.action_mask(), "rounds": self.bout.rounds}
+
+
+def _compile_agent_tables(agent: Fencer) -> Tuple[np.ndarray, np.ndarray]:
+    """Executable mask and modified success probability of every action.
+
+    Both are shaped (distance, own blade, opponent blade, action).
+    """
+    shape = (len(DISTANCES), len(BLADES), len(BLADES), len(ACTIONS))
+    executable = np.zeros(shape, dtype=bool)
+    success = np.zeros(shape)
+    probe = agent.__class__(agent.name, agent.skill_level, agent.weights)
+    for distance in DISTANCES:
+        for own_blade in BLADES:
+            probe.blade_position = own_blade
+            for opponent_blade in BLADES:
+                for action_type in ACTIONS:
+                    if not _is_executable(probe, action_type, distance):
+                        continue
+                    index = (DISTANCE_ORDINALS[distance],
+                             BLADE_ORDINALS[own_blade],
+                             BLADE_ORDINALS[opponent_blade],
+                             ACTION_ORDINALS[action_type])
+                    executable[index] = True
+                    success[index] = min(
+                        FencingAction(action_type, probe,
+                                      distance).get_success_probability(
+                                          opponent_blade) *
+                        FencingBout.DISTANCE_MODIFIERS[distance], 1.0)
+    return executable, success
+
+
+class VectorEnv:
+    """n independent bouts stepped together, with automatic reset.
+
+    When a bout ends, its final observation is returned in
+    ``info["final_observation"]`` (rows where ``terminated`` is set) and the
+    returned observation already belongs to the fresh bout in that row.
+    """
+
+    action_count = len(ACTIONS)
+    observation_size = len(OBSERVATION_FIELDS)
+
+    def __init__(self,
+                 n: int,
+                 agent: FencerSpec,
+                 opponent: FencerSpec,
+                 points_to_win: int = 5,
+                 seed: Optional[int] = None):
+        self.n = n
+        self.points_to_win = points_to_win
+        agent_fencer = agent.build()
+        opponent_fencer = opponent.build()
+        self.engine = VectorizedBoutEngine(agent_fencer, opponent_fencer,
+                                           points_to_win)
+        self.executable, self.success = _compile_agent_tables(agent_fencer)
+        self.flags = np.array([
+            agent_fencer.has_priority, agent_fencer.has_preparation,
+            opponent_fencer.has_priority, opponent_fencer.has_preparation
+        ],
+                              dtype=np.int16)
+
+        self.rng = np.random.default_rng(seed)
+        self.distance = np.zeros(n, dtype=np.int8)
+        self.scores = np.zeros((n, 2), dtype=np.int16)
+        self.blades = np.zeros((n, 2), dtype=np.int8)
+        self.rounds = np.zeros(n, dtype=np.int32)
+
+    def reset(self,
+              seed: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
+        if seed is not None:
+            self.rng = np.random.default_rng(derive_seed(seed, "vector_env"))
+        self._reset_rows(np.ones(self.n, dtype=bool))
+        self._start_agent_round(np.arange(self.n))
+        return self._observation(), self._info()
+
+    def step(self, actions: np.ndarray
+             ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """Returns (observations, rewards, terminated, truncated, info)"""
+        rows = np.arange(self.n)
+        actions = np.asarray(actions)
+        if actions.shape != (self.n, ) or not np.issubdtype(
+                actions.dtype, np.integer):
+            raise ValueError(f"expected {self.n} integer actions")
+        if ((actions < 0) | (actions >= self.action_count)).any():
+            raise ValueError(f"actions must be in [0, {self.action_count})")
+        own_blade, opponent_blade = self.blades[:, 0], self.blades[:, 1]
+
+        # Agent attack
+        key = (self.distance, own_blade, opponent_blade, actions)
+        hits = (self.rng.random(self.n) <= self.success[key]) & (
+            self.executable[key])
+        self.scores[hits, 0] += 1
+
+        # Opponent round for the bouts still going
+        live = rows[self.scores[:, 0] < self.points_to_win]
+        if len(live):
+            self.rounds[live] += 1
+            distance = self.distance[live]
+            self.engine.move_distance(distance, self.rng)
+            self.distance[live] = distance
+            chosen, probability, has_action = self.engine.choose_actions(
+                np.ones(len(live), dtype=np.int8), distance,
+                opponent_blade[live], own_blade[live], self.rng)
+            hits = (self.rng.random(len(live)) <= probability) & has_action
+            self.scores[live[hits], 1] += 1
+
+        won = self.scores[:, 0] >= self.points_to_win
+        terminated = won | (self.scores[:, 1] >= self.points_to_win)
+        rewards = np.where(terminated, np.where(won, 1.0, -1.0), 0.0)
+
+        info = {}
+        if terminated.any():
+            info["final_observation"] = self._observation()
+            self._reset_rows(terminated)
+        self._start_agent_round(rows)
+
+        info.update(self._info())
+        return (self._observation(), rewards, terminated,
+                np.zeros(self.n, dtype=bool), info)
+
+    def action_mask(self) -> np.ndarray:
+        return self.executable[self.distance, self.blades[:, 0],
+                               self.blades[:, 1]]
+
+    def _reset_rows(self, mask: np.ndarray):
+        self.distance[mask] = DISTANCE_ORDINALS[DistanceType.MEDIUM]
+        self.scores[mask] = 0
+        self.blades[mask] = self.engine.start_blades
+        self.rounds[mask] = 0
+
+    def _start_agent_round(self, rows: np.ndarray):
+        self.rounds[rows] += 1
+        distance = self.distance[rows]
+        self.engine.move_distance(distance, self.rng)
+        self.distance[rows] = distance
+
+    def _observation(self) -> np.ndarray:
+        return np.column_stack([
+            self.distance, self.blades, self.scores,
+            np.broadcast_to(self.flags, (self.n, len(self.flags)))
+        ]).astype(np.int16)
+
+    def _info(self) -> Dict:
+        return {"action_mask": self.action_mask(), "rounds": self.rounds.copy()}
@@ -0,0 +1,198 @@
+"""Event sinks that write bout events to disk.
+
+Both writers buffer in memory up to a fixed size and flush in large writes,
+so batch runs can stream millions of events with bounded memory and no
+per-event string formatting in the binary case.
+"""
+import json
+import struct
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Tuple
+
+from sim import (ACTION_ORDINALS, DEFENSE_ORDINALS, DISTANCE_ORDINALS,
+                 ActionChosen, ActionRolled, ActionType, BoutCompleted,
+                 BoutStarted, DefenseType, DistanceChanged, DistanceType,
+                 EventSink, FencingBout, ParryAttempted, RoundCompleted,
+                 RoundStarted, ScoreChanged)
+
+ACTIONS = list(ActionType)
+DEFENSES = list(DefenseType)
+DISTANCES = list(DistanceType)
+
+# One record per event: bout, kind, round, fencer, three integer fields and
+# two float32s. Field meaning depends on the kind; the integer fields carry
+# scores and points_to_win, so they are as wide as the round counter.
+RECORD = struct.Struct("<IBIBIIIff")
+NO_ACTION = 0xFF
+
+# New kinds go at the end so existing files keep their codes
+EVENT_KINDS = (BoutStarted, RoundStarted, DistanceChanged, ActionChosen,
+               ActionRolled, ScoreChanged, RoundCompleted, BoutCompleted,
+               ParryAttempted)
+KIND_CODES = {event_type: code for code, event_type in enumerate(EVENT_KINDS)}
+
+
+# Each encoder packs an event into (round, fencer, a, b, c, x, y)
+_ENCODERS = {
+    BoutStarted:
+    lambda e: (0, 0, e.points_to_win, 0, 0, 0.0, 0.0),
+    RoundStarted:
+    lambda e: (e.round, e.fencer, 0, 0, 0, 0.0, 0.0),
+    DistanceChanged:
+    lambda e: (e.round, 0, DISTANCE_ORDINALS[e.old_distance],
+               DISTANCE_ORDINALS[e.new_distance], 0, 0.0, 0.0),
+    ActionChosen:
+    lambda e: (e.round, e.fencer, NO_ACTION if e.action_type is None else
+               ACTION_ORDINALS[e.action_type], DISTANCE_ORDINALS[e.distance],
+               0, 0.0, 0.0),
+    ActionRolled:
+    lambda e: (e.round, e.fencer, ACTION_ORDINALS[e.action_type], e.success,
+               e.parried, e.probability, e.roll),
+    ScoreChanged:
+    lambda e: (e.round, e.fencer, e.score1, e.score2, 0, 0.0, 0.0),
+    RoundCompleted:
+    lambda e: (e.round, 0, DISTANCE_ORDINALS[e.distance], e.score1, e.score2,
+               0.0, 0.0),
+    BoutCompleted:
+    lambda e: (e.rounds, e.winner, e.score1, e.score2, 0, 0.0, 0.0),
+    ParryAttempted:
+    lambda e: (e.round, e.fencer, DEFENSE_ORDINALS[e.defense_type], e.success,
+               0, e.probability, e.roll),
+}
+
+
+def _decode(kind: int, round_: int, fencer: int, a: int, b: int, c: int,
+            x: float, y: float):
+    event_type = EVENT_KINDS[kind]
+    if event_type is ActionRolled:
+        return ActionRolled(round_, fencer, ACTIONS[a], x, y, bool(b),
+                            bool(c))
+    if event_type is ActionChosen:
+        return ActionChosen(round_, fencer,
+                            None if a == NO_ACTION else ACTIONS[a],
+                            DISTANCES[b])
+    if event_type is RoundStarted:
+        return RoundStarted(round_, fencer)
+    if event_type is DistanceChanged:
+        return DistanceChanged(round_, DISTANCES[a], DISTANCES[b])
+    if event_type is ScoreChanged:
+        return ScoreChanged(round_, fencer, a, b)
+    if event_type is RoundCompleted:
+        return RoundCompleted(round_, DISTANCES[a], b, c)
+    if event_type is BoutCompleted:
+        return BoutCompleted(round_, fencer, a, b)
+    if event_type is ParryAttempted:
+        return ParryAttempted(round_, fencer, DEFENSES[a], x, y, bool(b))
+    return BoutStarted(a)
+
+
+def _event_to_dict(event) -> dict:
+    record = {"event": type(event).__name__}
+    for field in event.__slots__:
+        value = getattr(event, field)
+        if isinstance(value, (ActionType, DefenseType, DistanceType)):
+            value = value.name
+        record[field] = value
+    return record
+
+
+class _BufferedWriter(EventSink):
+    """Counts bouts and owns the output file"""
+
+    def __init__(self, path: str, mode: str, buffer_size: int):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, mode)
+        self.bout = -1  # incremented by BoutStarted
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def handle(self, bout: FencingBout, event):
+        if isinstance(event, BoutStarted):
+            self.bout += 1
+        self._write(event)
+
+    def _write(self, event):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class JsonlEventWriter(_BufferedWriter):
+    """Writes one JSON object per event, flushing every buffer_size events"""
+
+    def __init__(self, path: str, buffer_size: int = 10_000):
+        super().__init__(path, "w", buffer_size)
+        self.file: TextIO
+        self._lines: List[str] = []
+
+    def _write(self, event):
+        record = _event_to_dict(event)
+        record["bout"] = self.bout
+        self._lines.append(json.dumps(record))
+        if len(self._lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self.file.write("\n".join(self._lines) + "\n")
+            self._lines.clear()
+
+
+class BinaryEventWriter(_BufferedWriter):
+    """Writes fixed-size RECORD structs, flushing every buffer_size events"""
+
+    def __init__(self, path: str, buffer_size: int = 65_536):
+        super().__init__(path, "wb", buffer_size)
+        self.file: BinaryIO
+        self._buffer = bytearray(RECORD.size * buffer_size)
+        self._count = 0
+
+    def _write(self, event):
+        event_type = type(event)
+        RECORD.pack_into(self._buffer, self._count * RECORD.size,
+                         max(self.bout, 0), KIND_CODES[event_type],
+                         *_ENCODERS[event_type](event))
+        self._count += 1
+        if self._count == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._count:
+            self.file.write(
+                memoryview(self._buffer)[:self._count * RECORD.size])
+            self._count = 0
+
+
+def read_binary_events(
+        path: str,
+        bout: Optional[int] = None) -> Iterator[Tuple[int, object]]:
+    """Yields (bout index, event) from a BinaryEventWriter file.
+
+    Records are fixed size, so reading one bout only decodes its records.
+    """
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(RECORD.size * 4096)
+            if not chunk:
+                break
+            for fields in RECORD.iter_unpack(chunk):
+                bout_index, kind, round_ = fields[:3]
+                if bout is not None and bout_index != bout:
+                    continue
+                yield bout_index, _decode(kind, round_, *fields[3:])
+
+
+def read_jsonl_events(path: str) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
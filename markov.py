@@ -0,0 +1,246 @@
+"""Exact win probabilities for the bout model.
+
+Blade positions and tactical flags never change during a bout, so a bout is
+a Markov chain over (fencer 1 score, fencer 2 score, fencer on turn,
+distance). Within one score pair the turn/distance states can cycle, so each
+score pair is a small linear system; score pairs are solved from the end of
+the bout backwards.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+from sim import (DISTANCE_ORDINALS, DistanceType, Fencer, FencingAction,
+                 FencingBout)
+
+DISTANCES = list(DistanceType)
+
+# Gauss-Legendre nodes per jitter dimension
+QUADRATURE_NODES = 8
+
+
+@dataclass(frozen=True)
+class BoutSolution:
+    """Value tables of a solved bout.
+
+    Both arrays are indexed by (fencer 1 score, fencer 2 score, fencer on
+    turn (0 or 1), distance ordinal) and describe the state at the start of a
+    round, before the distance update.
+    """
+    points_to_win: int
+    win_probability: np.ndarray  # P(fencer 1 wins)
+    expected_rounds: np.ndarray  # rounds still to play
+
+    def state(self, score1: int, score2: int, turn: int,
+              distance: DistanceType) -> Tuple[float, float]:
+        """Returns (P(fencer 1 wins), expected remaining rounds)"""
+        if score1 >= self.points_to_win:
+            return 1.0, 0.0
+        if score2 >= self.points_to_win:
+            return 0.0, 0.0
+        index = (score1, score2, turn, DISTANCE_ORDINALS[distance])
+        return (float(self.win_probability[index]),
+                float(self.expected_rounds[index]))
+
+    @property
+    def start(self) -> Tuple[float, float]:
+        """Value of a fresh bout as FencingBout starts it"""
+        return self.state(0, 0, 0, DistanceType.MEDIUM)
+
+
+def distance_transition_matrix() -> np.ndarray:
+    """Row-stochastic matrix of FencingBout._update_distance"""
+    move = FencingBout.DISTANCE_CHANGE_PROBABILITY
+    matrix = np.eye(len(DISTANCES)) * (1 - move)
+    for distance, targets in FencingBout.DISTANCE_TRANSITIONS.items():
+        for target in targets:
+            matrix[DISTANCE_ORDINALS[distance],
+                   DISTANCE_ORDINALS[target]] += move / len(targets)
+    return matrix
+
+
+@lru_cache(maxsize=4096)
+def choice_probabilities(weights: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Probability that choose_action picks each candidate.
+
+    Integrates the uniform weight jitter with a Gauss-Legendre product rule,
+    including the top-3 cut when more candidates are in contention.
+    """
+    count = len(weights)
+    if count == 1:
+        return (1.0, )
+
+    nodes, node_weights = np.polynomial.legendre.leggauss(QUADRATURE_NODES)
+    factors = 1 + Fencer.WEIGHT_JITTER * nodes
+    grids = np.meshgrid(*([factors] * count), indexing="ij")
+    jittered = np.stack([grid.ravel() for grid in grids], axis=1) * weights
+
+    # Averaging over [-1, 1] in every dimension
+    mass = node_weights / 2
+    mass_grids = np.meshgrid(*([mass] * count), indexing="ij")
+    mass = np.prod(np.stack([grid.ravel() for grid in mass_grids], axis=1),
+                   axis=1)
+
+    if count > Fencer.TOP_ACTIONS:
+        cutoff = -np.sort(-jittered, axis=1)[:, Fencer.TOP_ACTIONS - 1:
+                                              Fencer.TOP_ACTIONS]
+        jittered = np.where(jittered >= cutoff, jittered, 0.0)
+
+    shares = jittered / jittered.sum(axis=1, keepdims=True)
+    return tuple(float(p) for p in mass @ shares)
+
+
+def scoring_probabilities(
+        fencer: Fencer,
+        opponent: Fencer,
+        modifiers: Optional[Mapping[DistanceType, float]] = None
+) -> np.ndarray:
+    """P(fencer scores) on its turn, per distance after the distance update.
+
+    ``modifiers`` overrides FencingBout.DISTANCE_MODIFIERS.
+    """
+    if modifiers is None:
+        modifiers = FencingBout.DISTANCE_MODIFIERS
+    probabilities = np.zeros(len(DISTANCES))
+    for distance in DISTANCES:
+        action_types, weights = fencer._get_policy(distance,
+                                                   opponent.blade_position)
+        if not action_types:
+            continue
+        modifier = modifiers[distance]
+        for action_type, chosen in zip(action_types,
+                                       choice_probabilities(weights)):
+            success = FencingAction(action_type, fencer,
+                                    distance).get_success_probability(
+                                        opponent.blade_position)
+            probabilities[DISTANCE_ORDINALS[distance]] += chosen * min(
+                success * modifier, 1.0)
+    return probabilities
+
+
+def solve_chain(
+        scoring1: np.ndarray,
+        scoring2: np.ndarray,
+        points_to_win: int,
+        transitions: Optional[np.ndarray] = None,
+        countering: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> BoutSolution:
+    """Solves the bout chain for per-distance scoring probabilities.
+
+    ``countering`` optionally gives, per fencer, the probability that the
+    opponent scores during that fencer's turn (a riposte to a parried
+    attack), per distance.
+    """
+    if transitions is None:
+        transitions = distance_transition_matrix()
+
+    size = len(DISTANCES)
+    scoring = (np.asarray(scoring1), np.asarray(scoring2))
+    if countering is None:
+        countering = (np.zeros(size), np.zeros(size))
+    countering = tuple(np.asarray(counter) for counter in countering)
+    shape = (points_to_win, points_to_win, 2, size)
+    win = np.zeros(shape)
+    rounds = np.zeros(shape)
+
+    def value(table, score1, score2, terminal_win):
+        if score1 >= points_to_win or score2 >= points_to_win:
+            return np.full((2, size), terminal_win)
+        return table[score1, score2]
+
+    # Unknowns are ordered (turn, distance). A round moves the distance,
+    # lets the fencer on turn attack, then hands the turn over.
+    system = np.eye(2 * size)
+    for turn in (0, 1):
+        rows = slice(turn * size, (turn + 1) * size)
+        other = slice((1 - turn) * size, (2 - turn) * size)
+        system[rows, other] -= transitions * (1 - scoring[turn] -
+                                              countering[turn])
+    # The miss/turn-over structure is the same for every score pair
+    factorised = np.linalg.inv(system)
+
+    for total in range(2 * points_to_win - 2, -1, -1):
+        for score1 in range(max(0, total - points_to_win + 1),
+                            min(total, points_to_win - 1) + 1):
+            score2 = total - score1
+            win_rhs = np.zeros(2 * size)
+            rounds_rhs = np.ones(2 * size)
+            for turn in (0, 1):
+                rows = slice(turn * size, (turn + 1) * size)
+                up1, up2 = (score1 + 1, score2) if turn == 0 else (score1,
+                                                                   score2 + 1)
+                hit = transitions * scoring[turn]
+                terminal_win = 1.0 if up1 >= points_to_win else 0.0
+                win_rhs[rows] = hit @ value(win, up1, up2,
+                                            terminal_win)[1 - turn]
+                rounds_rhs[rows] += hit @ value(rounds, up1, up2,
+                                                0.0)[1 - turn]
+                if countering[turn].any():
+                    # A riposte scores for the fencer not on turn
+                    down1, down2 = (score1, score2 + 1) if turn == 0 else (
+                        score1 + 1, score2)
+                    counter = transitions * countering[turn]
+                    terminal_win = 1.0 if down1 >= points_to_win else 0.0
+                    win_rhs[rows] += counter @ value(
+                        win, down1, down2, terminal_win)[1 - turn]
+                    rounds_rhs[rows] += counter @ value(
+                        rounds, down1, down2, 0.0)[1 - turn]
+            win[score1, score2] = (factorised @ win_rhs).reshape(2, size)
+            rounds[score1, score2] = (factorised @ rounds_rhs).reshape(2, size)
+
+    # Solutions are shared through the memo cache
+    win.setflags(write=False)
+    rounds.setflags(write=False)
+    return BoutSolution(points_to_win=points_to_win,
+                        win_probability=win,
+                        expected_rounds=rounds)
+
+
+@lru_cache(maxsize=1024)
+def _solve_cached(scoring1: Tuple[float, ...], scoring2: Tuple[float, ...],
+                  points_to_win: int) -> BoutSolution:
+    return solve_chain(np.array(scoring1), np.array(scoring2), points_to_win)
+
+
+def solve_bout(fencer1: Fencer,
+               fencer2: Fencer,
+               points_to_win: int = 5) -> BoutSolution:
+    """Exact solution of a bout between two fencers.
+
+    Solutions are memoized on the fencers' per-distance scoring
+    probabilities, so any pair of fencers that behave identically shares one.
+    """
+    return _solve_cached(tuple(scoring_probabilities(fencer1, fencer2)),
+                         tuple(scoring_probabilities(fencer2, fencer1)),
+                         points_to_win)
+
+
+def win_probability(fencer1: Fencer,
+                    fencer2: Fencer,
+                    points_to_win: int = 5) -> float:
+    """P(fencer1 wins) for a fresh bout"""
+    return solve_bout(fencer1, fencer2, points_to_win).start[0]
+
+
+def summarize(fencer1: Fencer,
+              fencer2: Fencer,
+              points_to_win: int = 5) -> Dict[str, float]:
+    probability, rounds = solve_bout(fencer1, fencer2, points_to_win).start
+    return {
+        f"{fencer1.name} wins": probability,
+        f"{fencer2.name} wins": 1 - probability,
+        "expected rounds": rounds,
+    }
+
+
+def main():
+    fencer1 = Fencer("Alice", skill_level=0.7)
+    fencer2 = Fencer("Bob", skill_level=0.6)
+    for name, value in summarize(fencer1, fencer2).items():
+        print(f"{name:16}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
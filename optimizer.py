@@ -0,0 +1,211 @@
+"""Evolution-strategy search over a fencer's action weight multipliers.
+
+Candidates are ActionWeights vectors sampled around a mean in log space (so
+multipliers stay positive) with a per-parameter step size. Each generation
+is scored in parallel with the vectorized engine against a pool of
+opponents. The mean moves to a rank-weighted average of the best candidates
+and the step sizes adapt to the spread of those candidates, as in the
+diagonal (separable) form of CMA-ES. The optimizer state is checkpointed
+after every generation, so a long search can be stopped and resumed.
+"""
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from sim import ActionWeights, Fencer, FencerSpec, derive_seed
+from vectorized import VectorizedBoutEngine
+
+PARAMETERS = ("priority", "preparation", "distance", "blade")
+
+
+def evaluate_weights(weights: Sequence[float], skill_level: float,
+                     opponents: Sequence[FencerSpec], bouts: int,
+                     points_to_win: int, seed: int) -> float:
+    """Win rate of a candidate against the pool, starting half the bouts"""
+    candidate = Fencer("Candidate", skill_level, ActionWeights(*weights))
+    wins = 0
+    for index, spec in enumerate(opponents):
+        opponent = spec.build()
+        first = VectorizedBoutEngine(candidate, opponent, points_to_win).run(
+            bouts // 2, derive_seed(seed, index, 1))
+        second = VectorizedBoutEngine(opponent, candidate, points_to_win).run(
+            bouts - bouts // 2, derive_seed(seed, index, 2))
+        wins += int(np.count_nonzero(first.winners == 1))
+        wins += int(np.count_nonzero(second.winners == 2))
+    return wins / (bouts * len(opponents))
+
+
+@dataclass
+class OptimizerState:
+    """Everything needed to resume a search, stored as JSON"""
+    generation: int
+    mean: List[float]  # log multipliers
+    sigma: List[float]
+    best_weights: List[float]
+    best_fitness: float
+    rng_state: Dict
+    history: List[Dict] = field(default_factory=list)
+
+
+class StrategyOptimizer:
+    """Searches ActionWeights for one skill level against an opponent pool"""
+
+    def __init__(self,
+                 skill_level: float,
+                 opponents: Sequence[FencerSpec],
+                 population: int = 16,
+                 bouts: int = 20_000,
+                 points_to_win: int = 5,
+                 sigma: float = 0.3,
+                 seed: int = 0,
+                 workers: Optional[int] = None,
+                 checkpoint: Optional[str] = None):
+        self.skill_level = skill_level
+        self.opponents = list(opponents)
+        self.population = population
+        self.elite = max(2, population // 4)
+        self.bouts = bouts
+        self.points_to_win = points_to_win
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint = checkpoint
+
+        # Log-rank recombination weights of the elite, as in CMA-ES
+        ranks = np.log(self.elite + 0.5) - np.log(np.arange(1, self.elite + 1))
+        self.recombination = ranks / ranks.sum()
+
+        self.rng = np.random.default_rng(seed)
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self.state = OptimizerState(**json.load(f))
+            self.rng.bit_generator.state = self.state.rng_state
+        else:
+            start = ActionWeights().as_tuple()
+            self.state = OptimizerState(generation=0,
+                                        mean=[math.log(w) for w in start],
+                                        sigma=[sigma] * len(PARAMETERS),
+                                        best_weights=list(start),
+                                        best_fitness=-1.0,
+                                        rng_state={})
+
+    @property
+    def best(self) -> ActionWeights:
+        return ActionWeights(*self.state.best_weights)
+
+    def run(self, generations: int) -> ActionWeights:
+        """Runs until ``generations`` generations are done in total"""
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while self.state.generation < generations:
+                self.step(executor)
+        return self.best
+
+    def step(self, executor: ProcessPoolExecutor):
+        state = self.state
+        mean = np.array(state.mean)
+        sigma = np.array(state.sigma)
+
+        # The current mean is always evaluated alongside the samples
+        steps = self.rng.standard_normal((self.population, len(PARAMETERS)))
+        steps[0] = 0.0
+        candidates = mean + sigma * steps
+        weights = np.exp(candidates)
+
+        # Common random numbers: every candidate of a generation plays the
+        # same seeds, so rankings reflect the weights rather than luck
+        generation_seed = derive_seed(self.seed, state.generation)
+        fitness = np.array(
+            list(
+                executor.map(evaluate_weights, weights.tolist(),
+                             [self.skill_level] * self.population,
+                             [self.opponents] * self.population,
+                             [self.bouts] * self.population,
+                             [self.points_to_win] * self.population,
+                             [generation_seed] * self.population)))
+
+        order = np.argsort(-fitness)[:self.elite]
+        if fitness[order[0]] > state.best_fitness:
+            state.best_fitness = float(fitness[order[0]])
+            state.best_weights = weights[order[0]].tolist()
+
+        # Move the mean and adapt each step size to the elite's spread
+        elite_steps = steps[order]
+        new_mean = mean + sigma * (self.recombination @ elite_steps)
+        spread = np.sqrt(self.recombination @ elite_steps**2)
+        new_sigma = np.clip(sigma * spread**0.5, 0.01, 1.0)
+
+        state.history.append({
+            "generation": state.generation,
+            "mean_fitness": float(fitness[0]),
+            "best_fitness": float(fitness[order[0]]),
+            "weights": weights[0].tolist(),
+        })
+        state.mean = new_mean.tolist()
+        state.sigma = new_sigma.tolist()
+        state.generation += 1
+        state.rng_state = self.rng.bit_generator.state
+        self._save()
+
+    def _save(self):
+        if not self.checkpoint:
+            return
+        staging = f"{self.checkpoint}.tmp"
+        with open(staging, "w") as f:
+            json.dump(asdict(self.state), f, indent=1)
+        os.replace(staging, self.checkpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search action weight multipliers for a fencer")
+    parser.add_argument("--skill", type=float, default=0.6)
+    parser.add_argument("--opponents",
+                        type=float,
+                        nargs="+",
+                        default=[0.5, 0.6, 0.7],
+                        help="skill levels of the opponent pool")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--bouts",
+                        type=int,
+                        default=20_000,
+                        help="bouts per candidate and opponent")
+    parser.add_argument("--points", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--checkpoint", default="optimizer_checkpoint.json")
+    args = parser.parse_args()
+
+    opponents = [
+        FencerSpec(f"Opponent {index + 1}", skill)
+        for index, skill in enumerate(args.opponents)
+    ]
+    optimizer = StrategyOptimizer(args.skill,
+                                  opponents,
+                                  population=args.population,
+                                  bouts=args.bouts,
+                                  points_to_win=args.points,
+                                  seed=args.seed,
+                                  workers=args.workers,
+                                  checkpoint=args.checkpoint)
+
+    with ProcessPoolExecutor(max_workers=optimizer.workers) as executor:
+        while optimizer.state.generation < args.generations:
+            optimizer.step(executor)
+            entry = optimizer.state.history[-1]
+            print(f"generation {entry['generation']:3}: "
+                  f"mean {entry['mean_fitness']:.4f} "
+                  f"best {entry['best_fitness']:.4f}")
+
+    print(f"\nBest win rate {optimizer.state.best_fitness:.4f} with")
+    for name, value in zip(PARAMETERS, optimizer.best.as_tuple()):
+        print(f"  {name:12}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Planning fencer that searches the bout model instead of sampling weights.
+
+PlanningFencer picks its action by depth-limited expectimax over the bout
+chain: chance nodes for the distance update and the success rolls, a max
+node for its own action and the opponent's scoring probability for the
+opponent's turn. Leaves are valued with the exact solution of the bout under
+the fencer's ordinary policy (``markov``), so each extra ply improves on that
+policy. Searches deepen iteratively until the per-move time budget runs out.
+
+In a bout with the defense phase an attack that lands can still be parried
+and answered with a riposte, so each action has three outcomes: a point for
+the attacker, a point for the defender, or neither. Actions differ in which
+parries they are open to, so the action most likely to land is not always
+the best one; the search weighs all three outcomes. The defender's choice of
+parry follows its jittered defense policy, whose sixteen candidates are too
+many for the quadrature of ``markov.choice_probabilities``, so those choice
+probabilities are estimated once per policy from sampled jitter.
+
+Values are memoized in a transposition table keyed on the compact bout state
+(own score, opponent score, fencer on turn, distance) and bounded with LRU
+eviction.
+"""
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from markov import (choice_probabilities, distance_transition_matrix,
+                    scoring_probabilities, solve_bout, solve_chain)
+from sim import (ACTION_ORDINALS, DEFENSE_ORDINALS, DISTANCE_ORDINALS,
+                 ActionType, ActionWeights, BladePosition, DefenseDatabase,
+                 DistanceManager, DistanceType, Fencer, FencingAction,
+                 FencingBout)
+
+DISTANCES = list(DistanceType)
+
+# Compact bout state: (own score, opponent score, turn, distance ordinal)
+StateKey = Tuple[int, int, int, int]
+
+# (action, P(attacker scores), P(defender scores with a riposte))
+Option = Tuple[ActionType, float, float]
+
+# Jitter draws behind the estimated defense choice probabilities
+DEFENSE_CHOICE_SAMPLES = 200_000
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class PlannerStats:
+    """Search counters, accumulated over every decision"""
+    decisions: int = 0
+    nodes: int = 0
+    lookups: int = 0
+    hits: int = 0
+    search_time: float = 0.0
+    last_depth: int = 0  # deepest completed search of the last decision
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.search_time if self.search_time else 0.0
+
+
+@lru_cache(maxsize=64)
+def sampled_choice_probabilities(
+        weights: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Estimate of choice_probabilities for many candidates.
+
+    Draws the uniform weight jitter DEFENSE_CHOICE_SAMPLES times with a
+    fixed seed, so the estimate is reproducible. Candidates of equal weight
+    are exchangeable and share the mean of their estimates.
+    """
+    count = len(weights)
+    if count <= Fencer.TOP_ACTIONS:
+        return choice_probabilities(weights)
+
+    rng = np.random.default_rng(0)
+    jitter = Fencer.WEIGHT_JITTER
+    jittered = np.asarray(weights) * rng.uniform(
+        1 - jitter, 1 + jitter, (DEFENSE_CHOICE_SAMPLES, count))
+    cutoff = np.partition(jittered, count - Fencer.TOP_ACTIONS,
+                          axis=1)[:, count - Fencer.TOP_ACTIONS:count -
+                                  Fencer.TOP_ACTIONS + 1]
+    jittered = np.where(jittered >= cutoff, jittered, 0.0)
+    shares = (jittered / jittered.sum(axis=1, keepdims=True)).mean(axis=0)
+
+    groups: Dict[float, List[int]] = {}
+    for index, weight in enumerate(weights):
+        groups.setdefault(weight, []).append(index)
+    for members in groups.values():
+        shares[members] = shares[members].mean()
+    return tuple(float(p) for p in shares)
+
+
+def _parry_outcomes(attacker: Fencer, defender: Fencer,
+                    distance: DistanceType) -> Tuple[np.ndarray, np.ndarray]:
+    """Per attacker action ordinal, P(parried) and P(parried, riposte lands).
+
+    Both are conditional on the attack landing, which is when FencingBout
+    lets the defender parry.
+    """
+    defense_types, weights = defender._get_defense_policy()
+    masks = DefenseDatabase.get_parry_masks()
+    modifier = FencingBout.DISTANCE_MODIFIERS[distance]
+    parried = np.zeros(len(ACTION_ORDINALS))
+    countered = np.zeros(len(ACTION_ORDINALS))
+    if not defense_types:
+        return parried, countered
+
+    for defense_type, chosen in zip(defense_types,
+                                    sampled_choice_probabilities(weights)):
+        parry = chosen * defender.get_parry_probability(defense_type)
+        riposte = defender.choose_riposte(defense_type, distance,
+                                          attacker.blade_position)
+        landing = 0.0 if riposte is None else min(
+            riposte.get_success_probability(attacker.blade_position) *
+            modifier, 1.0)
+        bit = DEFENSE_ORDINALS[defense_type]
+        for action_type, ordinal in ACTION_ORDINALS.items():
+            if masks[ordinal] >> bit & 1:
+                parried[ordinal] += parry
+                countered[ordinal] += parry * landing
+    return parried, countered
+
+
+def turn_outcomes(attacker: Fencer, defender: Fencer,
+                  defenses: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Per distance, P(attacker scores) and P(defender scores) on its turn.
+
+    The attacker plays its ordinary sampled policy. Without the defense
+    phase the second array is zero and the first is scoring_probabilities.
+    """
+    if not defenses:
+        return (scoring_probabilities(attacker, defender),
+                np.zeros(len(DISTANCES)))
+    scoring = np.zeros(len(DISTANCES))
+    countering = np.zeros(len(DISTANCES))
+    for distance in DISTANCES:
+        action_types, weights = attacker._get_policy(distance,
+                                                     defender.blade_position)
+        if not action_types:
+            continue
+        parried, countered = _parry_outcomes(attacker, defender, distance)
+        modifier = FencingBout.DISTANCE_MODIFIERS[distance]
+        ordinal = DISTANCE_ORDINALS[distance]
+        for action_type, chosen in zip(action_types,
+                                       choice_probabilities(weights)):
+            success = min(
+                FencingAction(action_type, attacker,
+                              distance).get_success_probability(
+                                  defender.blade_position) * modifier, 1.0)
+            index = ACTION_ORDINALS[action_type]
+            scoring[ordinal] += chosen * success * (1 - parried[index])
+            countering[ordinal] += chosen * success * countered[index]
+    return scoring, countering
+
+
+class PlanningFencer(Fencer):
+    """Fencer that chooses actions by expectimax within a time budget.
+
+    The opponent is modelled by its own policy, so the planner needs the
+    opponent's Fencer (its live score is read at every decision). Pass
+    ``defenses=True`` when the bout has the defense phase, so parries and
+    ripostes are part of the model.
+    """
+
+    def __init__(self,
+                 name: str,
+                 skill_level: float = 0.5,
+                 weights: Optional[ActionWeights] = None,
+                 opponent: Optional[Fencer] = None,
+                 points_to_win: int = 5,
+                 time_budget: float = 0.05,
+                 max_depth: int = 64,
+                 table_size: int = 100_000,
+                 defenses: bool = False):
+        super().__init__(name, skill_level, weights)
+        self.points_to_win = points_to_win
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.defenses = defenses
+        self.stats = PlannerStats()
+        self._table: "OrderedDict[StateKey, Tuple[int, float]]" = OrderedDict()
+        self._transitions = distance_transition_matrix()
+        self._options_cache: Dict[tuple, List[Option]] = {}
+        self._deadline = float("inf")
+        self._model = None
+        self._model_key = None
+        self.opponent = opponent
+
+    def choose_action(
+            self,
+            distance: DistanceType,
+            opponent_blade: BladePosition,
+            rng: Optional[random.Random] = None) -> Optional[FencingAction]:
+        opponent = self._opponent_model()
+        options = self._options(distance, opponent_blade)
+        if not options:
+            return None
+        if len(options) == 1:
+            return FencingAction(options[0][0], self, distance)
+
+        score, opponent_score = self.score, opponent.score
+        ordinal = DISTANCE_ORDINALS[distance]
+
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget
+        # Without a completed search, play the best expected point balance
+        best = max(options, key=lambda option: option[1] - option[2])[0]
+        try:
+            for depth in range(1, self.max_depth + 1):
+                best = self._best_option(depth, score, opponent_score,
+                                         ordinal, options)[1]
+                self.stats.last_depth = depth
+        except _SearchTimeout:
+            pass
+        finally:
+            self._deadline = float("inf")
+            self.stats.decisions += 1
+            self.stats.search_time += time.perf_counter() - start
+        return FencingAction(best, self, distance)
+
+    def clear_table(self):
+        self._table.clear()
+
+    def _opponent_model(self) -> Fencer:
+        if self.opponent is None:
+            # Without a known opponent, plan against an equal, plain fencer
+            self.opponent = Fencer("Opponent", self.skill_level)
+        opponent = self.opponent
+
+        # Stored values are only valid for the fencers they were computed for
+        key = (self.defenses, self.skill_level, self.weights,
+               self.blade_position, self.has_priority, self.has_preparation,
+               opponent.skill_level, opponent.weights,
+               opponent.blade_position, opponent.has_priority,
+               opponent.has_preparation)
+        if key != self._model_key:
+            if self.defenses:
+                own = turn_outcomes(self, opponent, True)
+                theirs = turn_outcomes(opponent, self, True)
+                solution = solve_chain(own[0],
+                                       theirs[0],
+                                       self.points_to_win,
+                                       self._transitions,
+                                       countering=(own[1], theirs[1]))
+            else:
+                solution = solve_bout(self, opponent, self.points_to_win)
+                theirs = turn_outcomes(opponent, self, False)
+            self._model = (solution, theirs)
+            self._model_key = key
+            self._options_cache.clear()
+            self._table.clear()
+        return opponent
+
+    def _options(self, distance: DistanceType,
+                 opponent_blade: BladePosition) -> List[Option]:
+        """Executable actions and the chances of either side scoring"""
+        key = (distance, opponent_blade, self.blade_position,
+               self.has_priority, self.has_preparation)
+        options = self._options_cache.get(key)
+        if options is not None:
+            return options
+
+        if self.defenses:
+            parried, countered = _parry_outcomes(self, self.opponent,
+                                                 distance)
+        options = []
+        modifier = FencingBout.DISTANCE_MODIFIERS[distance]
+        for action_type in DistanceManager.get_candidate_actions()[distance]:
+            if action_type not in self.available_actions:
+                continue
+            action = FencingAction(action_type, self, distance)
+            if not action.can_execute():
+                continue
+            success = min(
+                action.get_success_probability(opponent_blade) * modifier,
+                1.0)
+            if self.defenses:
+                index = ACTION_ORDINALS[action_type]
+                options.append((action_type, success * (1 - parried[index]),
+                                success * countered[index]))
+            else:
+                options.append((action_type, success, 0.0))
+        self._options_cache[key] = options
+        return options
+
+    def _best_option(self, depth: int, score: int, opponent_score: int,
+                     distance: int,
+                     options: List[Option]) -> Tuple[float, ActionType]:
+        """Value and action of the best option at depth plies"""
+        miss = self._after(depth - 1, score, opponent_score, 1, distance)
+        hit = self._after(depth - 1, score + 1, opponent_score, 1, distance)
+        countered = miss
+        if any(option[2] for option in options):
+            countered = self._after(depth - 1, score, opponent_score + 1, 1,
+                                    distance)
+        # Ties keep database order
+        return max(((scored * hit + counter * countered +
+                     (1 - scored - counter) * miss, action_type)
+                    for action_type, scored, counter in options),
+                   key=lambda item: item[0])
+
+    def _after(self, depth: int, score: int, opponent_score: int, turn: int,
+               distance: int) -> float:
+        """Value at the start of a round, before its distance update"""
+        if score >= self.points_to_win:
+            return 1.0
+        if opponent_score >= self.points_to_win:
+            return 0.0
+        if depth <= 0:
+            return float(self._model[0].win_probability[score, opponent_score,
+                                                        turn, distance])
+
+        key = (score, opponent_score, turn, distance)
+        self.stats.lookups += 1
+        entry = self._table.get(key)
+        if entry is not None and entry[0] >= depth:
+            self.stats.hits += 1
+            self._table.move_to_end(key)
+            return entry[1]
+
+        self.stats.nodes += 1
+        if not self.stats.nodes & 1023 and time.perf_counter() > self._deadline:
+            raise _SearchTimeout
+
+        value = 0.0
+        for target, chance in enumerate(self._transitions[distance]):
+            if chance:
+                value += chance * self._turn_value(depth, score,
+                                                   opponent_score, turn,
+                                                   target)
+
+        self._table[key] = (depth, value)
+        self._table.move_to_end(key)
+        if len(self._table) > self.table_size:
+            self._table.popitem(last=False)
+        return value
+
+    def _turn_value(self, depth: int, score: int, opponent_score: int,
+                    turn: int, distance: int) -> float:
+        """Value once the distance of the round is known"""
+        if turn == 1:
+            scoring, countering = self._model[1]
+            hit, counter = scoring[distance], countering[distance]
+            value = (hit * self._after(depth - 1, score, opponent_score + 1,
+                                       0, distance) +
+                     (1 - hit - counter) * self._after(
+                         depth - 1, score, opponent_score, 0, distance))
+            if counter:
+                value += counter * self._after(depth - 1, score + 1,
+                                               opponent_score, 0, distance)
+            return value
+
+        options = self._options(DISTANCES[distance],
+                                self.opponent.blade_position)
+        if not options:
+            return self._after(depth - 1, score, opponent_score, 1, distance)
+        return self._best_option(depth, score, opponent_score, distance,
+                                 options)[0]
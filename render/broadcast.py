@@ -0,0 +1,144 @@
+"""Fan-out of server messages to WebSocket clients.
+
+Every client gets a ClientChannel: a bounded outbound queue drained by its
+own sender task, so a slow client only ever delays itself. A broadcast
+serializes the message once and appends the same text to every queue
+without awaiting, so its cost is a constant per client however slow the
+clients are.
+
+When a client's queue is full the overflow policy decides what goes:
+
+- ``DROP_OLDEST`` drops the oldest queued message to make room;
+- ``COALESCE`` replaces everything queued with the new message, for streams
+  where the latest state supersedes what came before.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Any, Optional, Set
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE)
+
+
+def serialize(message: Any) -> str:
+    """JSON text as Starlette's send_json would produce it"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class ClientChannel:
+    """Bounded outbound queue and sender task for one WebSocket"""
+
+    def __init__(self,
+                 websocket,
+                 queue_size: int = 256,
+                 overflow: str = DROP_OLDEST,
+                 on_close=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.websocket = websocket
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._on_close = on_close
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, text: str):
+        """Queues serialized text without waiting; never blocks"""
+        if self.closed:
+            return
+        queue = self._queue
+        if len(queue) >= self.queue_size:
+            if self.overflow == COALESCE:
+                self.dropped += len(queue)
+                queue.clear()
+            else:
+                queue.popleft()
+                self.dropped += 1
+        queue.append(text)
+        self._ready.set()
+
+    def send(self, message: Any):
+        self.put(serialize(message))
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def _run(self):
+        queue = self._queue
+        try:
+            while True:
+                if not queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                await self.websocket.send_text(queue.popleft())
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The client went away mid-send; the receive side notices too
+            pass
+        finally:
+            self.closed = True
+            queue.clear()
+            if self._on_close is not None:
+                self._on_close(self)
+
+    async def close(self):
+        """Stops the sender task, discarding anything still queued"""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class Broadcaster:
+    """Set of client channels sharing one queue size and overflow policy"""
+
+    def __init__(self, queue_size: int = 256, overflow: str = DROP_OLDEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.channels: Set[ClientChannel] = set()
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def connect(self,
+                websocket,
+                overflow: Optional[str] = None) -> ClientChannel:
+        channel = ClientChannel(websocket, self.queue_size, overflow
+                                or self.overflow, self.channels.discard)
+        self.channels.add(channel)
+        return channel
+
+    async def disconnect(self, channel: ClientChannel):
+        self.channels.discard(channel)
+        await channel.close()
+
+    def broadcast(self, message: Any) -> int:
+        """Serializes once and queues for every client; returns the count"""
+        text = serialize(message)
+        channels = list(self.channels)
+        for channel in channels:
+            channel.put(text)
+        return len(channels)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.channels),
+            "pending": sum(c.pending for c in self.channels),
+            "sent": sum(c.sent for c in self.channels),
+            "dropped": sum(c.dropped for c in self.channels),
+        }
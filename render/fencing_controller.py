@@ -1,8 +1,10 @@
 import asyncio
-import aiohttp
 import logging
-from typing import List, Tuple
-import json
+from typing import List, Optional, Tuple
+
+import aiohttp
+
+from input_client import InputClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -10,52 +12,106 @@ logger = logging.getLogger(__name__)
 
 class FencingStrategy:
 
-    def __init__(self):
-        self.base_url = "http://localhost:8000/action"
+    def __init__(self, server: str = "localhost:8000", room: str = "main"):
+        self.room_url = f"http://{server}/rooms/{room}"
+        self.input_url = f"ws://{server}/rooms/{room}/input"
         self.session = None
+        self.input = None
 
     async def __aenter__(self):
         self.session = aiohttp.ClientSession()
+        self.input = InputClient(self.input_url)
+        await self.input.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.input:
+            await self.input.drain()
+            logger.info(f"Input latency: {self.input.latency()}")
+            await self.input.__aexit__(exc_type, exc_val, exc_tb)
         if self.session:
             await self.session.close()
 
     async def execute_action(self, fencer: str, action: str) -> bool:
         """Execute a single fencing action"""
-        if not self.session:
+        if not self.input:
             raise RuntimeError(
-                "Session not initialized. Use 'async with' context manager.")
+                "Input not connected. Use 'async with' context manager.")
 
         try:
-            url = f"{self.base_url}/{fencer}/{action}"
-            async with self.session.post(url) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    logger.info(f"Success: {result}")
-                    return True
-                else:
-                    text = await response.text()
-                    logger.error(
-                        f"Failed to execute action ({response.status}): {text}"
-                    )
-                    return False
+            if not self.input.send(fencer, action):
+                logger.error(f"Action over the input rate: {fencer} {action}")
+                return False
+            # Scripted actions go out at once instead of waiting a frame
+            await self.input.flush()
+            return True
         except Exception as e:
             logger.error(f"Error executing action: {str(e)}")
             return False
 
-    async def execute_sequence(self, actions: List[Tuple[str, str, float]]):
-        """Execute a sequence of actions with delays"""
+    @staticmethod
+    def _timeline(actions: List[Tuple[str, str, float]]) -> List[dict]:
+        """(fencer, action, delay after it) steps as timestamped actions"""
+        timeline = []
+        at = 0.0
         for fencer, action, delay in actions:
-            logger.info(f"Executing: {fencer} {action}")
-            success = await self.execute_action(fencer, action)
-            if not success:
+            timeline.append({"fencer": fencer, "action": action, "at": at})
+            at += delay
+        return timeline
+
+    async def _sequence_request(self, method: str, url: str,
+                                **kwargs) -> Optional[dict]:
+        if not self.session:
+            raise RuntimeError(
+                "Session not initialized. Use 'async with' context manager.")
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                if response.status == 200:
+                    return await response.json()
+                text = await response.text()
                 logger.error(
-                    f"Sequence stopped due to failed action: {fencer} {action}"
-                )
-                break
-            await asyncio.sleep(delay)
+                    f"Sequence request failed ({response.status}): {text}")
+        except Exception as e:
+            logger.error(f"Error sending sequence request: {str(e)}")
+        return None
+
+    async def start_sequence(self,
+                             actions: List[Tuple[str, str, float]],
+                             delay: float = 0.0) -> Optional[dict]:
+        """Send a whole sequence for the server to play on its own clock"""
+        return await self._sequence_request(
+            "POST",
+            f"{self.room_url}/sequences",
+            json={"actions": self._timeline(actions), "delay": delay})
+
+    async def replace_sequence(self,
+                               sequence_id: str,
+                               actions: List[Tuple[str, str, float]],
+                               delay: float = 0.0) -> Optional[dict]:
+        """Drop what is left of a sequence and play new actions from now"""
+        return await self._sequence_request(
+            "PUT",
+            f"{self.room_url}/sequences/{sequence_id}",
+            json={"actions": self._timeline(actions), "delay": delay})
+
+    async def cancel_sequence(self, sequence_id: str) -> Optional[dict]:
+        return await self._sequence_request(
+            "DELETE", f"{self.room_url}/sequences/{sequence_id}")
+
+    async def execute_sequence(
+            self, actions: List[Tuple[str, str, float]]) -> Optional[dict]:
+        """Execute a sequence of actions with delays.
+
+        The sequence is sent once and timed by the server; this waits until
+        it has played out.
+        """
+        logger.info(f"Executing: {actions}")
+        sequence = await self.start_sequence(actions)
+        if sequence is None:
+            logger.error("Sequence was not accepted")
+            return None
+        await asyncio.sleep(sum(delay for _, _, delay in actions))
+        return sequence
 
     async def run_attack_sequence(self):
         """Example of an attack sequence"""
@@ -1,11 +1,182 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Dict, List, Optional
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
+from pydantic import BaseModel
 import uvicorn
 
+# The simulation model lives in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from broadcast import OVERFLOW_POLICIES  # noqa: E402
+from live_bout import BoutParams  # noqa: E402
+from markov import BoutSolution, solve_bout  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+from rooms import RoomRouter  # noqa: E402
+from sim import DistanceType, Fencer  # noqa: E402
+
 app = FastAPI()
 
-# Store active websocket connections
-connections = set()
+# Outbound queue per client; a full queue sheds messages by the overflow
+# policy instead of stalling the broadcast
+QUEUE_SIZE = int(os.environ.get("FENCING_QUEUE_SIZE", 256))
+OVERFLOW_POLICY = os.environ.get("FENCING_OVERFLOW", "drop_oldest")
+
+# Live bouts run in shard processes (0 runs them on the server loop);
+# planning bots search in threads of their shard, off its event loop
+SHARDS = int(os.environ.get("FENCING_SHARDS", 2))
+BOT_WORKERS = int(os.environ.get("FENCING_BOT_WORKERS", 4))
+
+# Per-connection limit on controller inputs, in actions per second
+INPUT_RATE = float(os.environ.get("FENCING_INPUT_RATE", 30))
+INPUT_BURST = int(os.environ.get("FENCING_INPUT_BURST", 10))
+
+# Rooms of websocket connections; /ws and /action use the default room,
+# which always exists
+DEFAULT_ROOM = "main"
+router = RoomRouter(SHARDS,
+                    QUEUE_SIZE,
+                    OVERFLOW_POLICY,
+                    bot_workers=BOT_WORKERS,
+                    permanent=[DEFAULT_ROOM])
+
+# Fencers used for odds when a client does not specify skills
+DEFAULT_SKILLS = {"left": 0.7, "right": 0.6}
+DEFAULT_POINTS_TO_WIN = 5
+# Largest bout the odds endpoints solve, which bounds a table's size
+MAX_POINTS_TO_WIN = 50
+# Solved value tables kept, most recently used last
+VALUE_TABLES = 256
+
+_value_tables: "OrderedDict[tuple, BoutSolution]" = OrderedDict()
+_solving: Dict[tuple, asyncio.Future] = {}
+
+
+def solve_value_table(left_skill: float, right_skill: float,
+                      points_to_win: int) -> BoutSolution:
+    """Solved value table for a pairing; the left fencer is fencer 1"""
+    return solve_bout(Fencer("left", skill_level=left_skill),
+                      Fencer("right", skill_level=right_skill),
+                      points_to_win)
+
+
+async def get_value_table(left_skill: float, right_skill: float,
+                          points_to_win: int) -> BoutSolution:
+    """Cached value table; a miss is solved in a thread, off the loop.
+
+    Concurrent requests for the same table share one solve.
+    """
+    key = (left_skill, right_skill, points_to_win)
+    table = _value_tables.get(key)
+    if table is not None:
+        _value_tables.move_to_end(key)
+        return table
+
+    solving = _solving.get(key)
+    if solving is None:
+        solving = asyncio.get_running_loop().run_in_executor(
+            None, solve_value_table, *key)
+        _solving[key] = solving
+        solving.add_done_callback(partial(_store_value_table, key))
+    # A client that goes away must not cancel the solve for the others
+    return await asyncio.shield(solving)
+
+
+def _store_value_table(key: tuple, solving: asyncio.Future):
+    del _solving[key]
+    if solving.cancelled() or solving.exception() is not None:
+        return
+    _value_tables[key] = solving.result()
+    while len(_value_tables) > VALUE_TABLES:
+        _value_tables.popitem(last=False)
+
+
+def _require_int(name: str, value) -> int:
+    # bool is an int subclass, and a float score would index the table
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer, not {value!r}")
+    return value
+
+
+def _require_number(name: str, value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number, not {value!r}")
+    return value
+
+
+async def compute_odds(score_left: int = 0,
+                       score_right: int = 0,
+                       turn: str = "left",
+                       distance: str = "MEDIUM",
+                       left_skill: float = DEFAULT_SKILLS["left"],
+                       right_skill: float = DEFAULT_SKILLS["right"],
+                       points_to_win: int = DEFAULT_POINTS_TO_WIN) -> dict:
+    """Looks up P(win) for a mid-bout state in the cached value table.
+
+    Raises ValueError for any malformed argument, as the WebSocket query
+    passes client JSON straight through.
+    """
+    if turn not in ("left", "right"):
+        raise ValueError(f"turn must be 'left' or 'right', not {turn!r}")
+    if not isinstance(distance, str):
+        raise ValueError(f"distance must be a string, not {distance!r}")
+    try:
+        distance_type = DistanceType[distance.upper()]
+    except KeyError:
+        raise ValueError(f"unknown distance {distance!r}") from None
+    for name, value in (("score_left", score_left),
+                        ("score_right", score_right),
+                        ("points_to_win", points_to_win)):
+        _require_int(name, value)
+    for name, value in (("left_skill", left_skill),
+                        ("right_skill", right_skill)):
+        _require_number(name, value)
+    if not 0 < left_skill <= 1 or not 0 < right_skill <= 1:
+        raise ValueError("skills must be in (0, 1]")
+    if not 1 <= points_to_win <= MAX_POINTS_TO_WIN:
+        raise ValueError(
+            f"points_to_win must be between 1 and {MAX_POINTS_TO_WIN}")
+    if score_left < 0 or score_right < 0:
+        raise ValueError("scores must be non-negative")
+
+    # Rounding keeps the table cache bounded for near-identical requests
+    table = await get_value_table(round(left_skill, 3), round(right_skill, 3),
+                                  points_to_win)
+    probability, rounds = table.state(score_left, score_right,
+                                      0 if turn == "left" else 1,
+                                      distance_type)
+    return {
+        "score": {"left": score_left, "right": score_right},
+        "turn": turn,
+        "distance": distance_type.name,
+        "left": probability,
+        "right": 1 - probability,
+        "expected_rounds": rounds,
+    }
+
+
+@app.on_event("startup")
+async def warm_odds_cache():
+    await get_value_table(DEFAULT_SKILLS["left"], DEFAULT_SKILLS["right"],
+                          DEFAULT_POINTS_TO_WIN)
+
+
+@app.on_event("startup")
+async def start_shards():
+    router.start()
+
+
+@app.on_event("shutdown")
+async def stop_shards():
+    await router.close()
 
 
 @app.get("/")
@@ -14,42 +185,315 @@ async def get():
         return HTMLResponse(f.read())
 
 
+@app.get("/odds")
+async def get_odds(score_left: int = 0,
+                   score_right: int = 0,
+                   turn: str = "left",
+                   distance: str = "MEDIUM",
+                   left_skill: float = DEFAULT_SKILLS["left"],
+                   right_skill: float = DEFAULT_SKILLS["right"],
+                   points_to_win: int = DEFAULT_POINTS_TO_WIN):
+    try:
+        return await compute_odds(score_left, score_right, turn, distance,
+                                  left_skill, right_skill, points_to_win)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    await serve_client(websocket, DEFAULT_ROOM)
+
+
+@app.websocket("/rooms/{room_id}/ws")
+async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
+    await serve_client(websocket, room_id)
+
+
+async def serve_client(websocket: WebSocket, room_id: str):
     await websocket.accept()
-    connections.add(websocket)
-    print(f"Client connected. Total connections: {len(connections)}")
+    room = router.room(room_id)
+    channel = room.join(websocket)
+    print(f"Client connected to {room_id}. "
+          f"Room connections: {len(room.clients)}")
 
     try:
         while True:
             data = await websocket.receive_json()
+
+            if isinstance(data, dict) and data.get("type") == "ack":
+                # Live bout stream: {"type": "ack", "tick": n,
+                # "generation": g} per applied tick, so deltas can be
+                # computed against it
+                tick, generation = data.get("tick"), data.get("generation")
+                if isinstance(tick, int) and isinstance(generation, int):
+                    room.stream.acknowledge(channel, tick, generation)
+                continue
+
+            if isinstance(data, dict) and data.get("type") == "odds":
+                # Live odds query: {"type": "odds", "score_left": 2, ...}
+                query = {k: v for k, v in data.items() if k != "type"}
+                try:
+                    odds = await compute_odds(**query)
+                    channel.send({"type": "odds", **odds})
+                except (TypeError, ValueError) as e:
+                    channel.send({
+                        "type": "error",
+                        "request": "odds",
+                        "detail": str(e)
+                    })
+                continue
+
             print(f"Received: {data}")
             # Echo back
-            await websocket.send_json({"received": data})
+            channel.send({"received": data})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await room.leave(channel)
+        print(f"Client disconnected from {room_id}. "
+              f"Room connections: {len(room.clients)}")
+        router.reap(room_id)
+
+
+@app.websocket("/input")
+async def input_endpoint(websocket: WebSocket):
+    await serve_inputs(websocket, DEFAULT_ROOM)
+
+
+@app.websocket("/rooms/{room_id}/input")
+async def room_input_endpoint(websocket: WebSocket, room_id: str):
+    await serve_inputs(websocket, room_id)
+
+
+def valid_inputs(actions) -> bool:
+    return isinstance(actions, list) and all(
+        isinstance(entry, list) and len(entry) == 2
+        and all(isinstance(part, str) for part in entry)
+        for entry in actions)
+
+
+async def serve_inputs(websocket: WebSocket, room_id: str):
+    """Controller input channel.
+
+    Takes frames of {"type": "input", "seq": n, "actions": [[fencer,
+    action], ...]}, broadcasts every action to the room and acknowledges
+    each frame with {"type": "ack", "seq": n, "received": t0, "broadcast":
+    t1, "accepted": k, "dropped": m}. The times are the server's monotonic
+    clock when the frame arrived and once its actions were queued for every
+    spectator. Actions over the connection's rate limit are dropped.
+    Malformed frames, and frames for a missing room (inputs do not create
+    rooms), get an error frame instead of an ack.
+    """
+    await websocket.accept()
+    bucket = TokenBucket(INPUT_RATE, INPUT_BURST)
+    try:
+        while True:
+            data = await websocket.receive_json()
+            received = time.monotonic()
+            if not isinstance(data, dict) or data.get("type") != "input":
+                await websocket.send_json({
+                    "type": "error",
+                    "request": "input",
+                    "detail": "expected an input frame"
+                })
+                continue
+            room = router.rooms.get(room_id)
+            if room is None:
+                await websocket.send_json({
+                    "type": "error",
+                    "request": "input",
+                    "detail": f"unknown room {room_id!r}"
+                })
+                continue
+
+            actions = data.get("actions")
+            if not valid_inputs(actions):
+                await websocket.send_json({
+                    "type": "error",
+                    "request": "input",
+                    "seq": data.get("seq"),
+                    "detail": "actions must be a list of [fencer, action] "
+                              "string pairs"
+                })
+                continue
+
+            accepted = dropped = 0
+            for fencer, action in actions:
+                if not bucket.take():
+                    dropped += 1
+                    continue
+                room.clients.broadcast({"fencer": fencer, "action": action})
+                accepted += 1
+
+            await websocket.send_json({
+                "type": "ack",
+                "seq": data.get("seq"),
+                "received": received,
+                "broadcast": time.monotonic(),
+                "accepted": accepted,
+                "dropped": dropped
+            })
     except WebSocketDisconnect:
-        connections.remove(websocket)
-        print(f"Client disconnected. Total connections: {len(connections)}")
+        pass
 
 
 @app.post("/action/{fencer}/{action}")
 async def send_action(fencer: str, action: str):
-    print(f"Action received: {fencer} - {action}")
+    return relay_action(DEFAULT_ROOM, fencer, action)
+
+
+@app.post("/rooms/{room_id}/action/{fencer}/{action}")
+async def send_room_action(room_id: str, fencer: str, action: str):
+    return relay_action(room_id, fencer, action)
+
+
+def relay_action(room_id: str, fencer: str, action: str) -> dict:
+    print(f"Action received in {room_id}: {fencer} - {action}")
     message = {"fencer": fencer, "action": action}
+    try:
+        room = router.room(room_id, create=False)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+    # Queued for every client's sender task; nothing here waits on a client
+    count = room.clients.broadcast(message)
+    return {"status": "sent", "room": room_id, "connections": count}
+
+
+@app.get("/rooms")
+async def list_rooms():
+    return [room.summary() for room in router.rooms.values()]
+
+
+@app.get("/rooms/{room_id}")
+async def get_room(room_id: str):
+    try:
+        room = router.room(room_id, create=False)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return {**room.summary(), "keyframe": room.stream.keyframe()}
+
+
+@app.delete("/rooms/{room_id}")
+async def delete_room(room_id: str):
+    try:
+        await router.remove(room_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return {"status": "removed", "room": room_id}
 
-    # Broadcast to all connected clients
-    dead_connections = set()
-    for websocket in connections:
-        try:
-            await websocket.send_json(message)
-        except:
-            dead_connections.add(websocket)
 
-    # Clean up dead connections
-    for dead in dead_connections:
-        connections.remove(dead)
+@app.post("/rooms/{room_id}/bout")
+async def start_bout(room_id: str,
+                     left_skill: float = DEFAULT_SKILLS["left"],
+                     right_skill: float = DEFAULT_SKILLS["right"],
+                     points_to_win: int = DEFAULT_POINTS_TO_WIN,
+                     tick_rate: float = 10.0,
+                     seed: Optional[int] = None,
+                     left_planner: bool = False,
+                     right_planner: bool = False,
+                     defenses: bool = False):
+    """Starts, or restarts, the live bout streamed to the room"""
+    try:
+        params = BoutParams(left_skill, right_skill, points_to_win,
+                            tick_rate, seed, left_planner, right_planner,
+                            defenses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return router.start_bout(room_id, params).summary()
+
+
+@app.delete("/rooms/{room_id}/bout")
+async def stop_bout(room_id: str):
+    try:
+        router.stop_bout(room_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return {"status": "stopped", "room": room_id}
+
+
+class SequenceAction(BaseModel):
+    fencer: str
+    action: str
+    at: float  # seconds after the start of the sequence
+
+
+class SequenceRequest(BaseModel):
+    actions: List[SequenceAction]
+    delay: float = 0.0  # seconds from now to the start of the sequence
+
+
+def sequence_response(room_id: str, sequence) -> dict:
+    # "now" is on the clock of the sequence's "start", for client timing
+    return {
+        "room": room_id,
+        "now": asyncio.get_running_loop().time(),
+        **sequence.summary()
+    }
+
+
+def schedule_sequence(room_id: str,
+                      request: SequenceRequest,
+                      sequence_id: Optional[str] = None) -> dict:
+    actions = [(a.at, a.fencer, a.action) for a in request.actions]
+    try:
+        sequence = router.room(room_id, create=False).sequences.schedule(
+            actions, request.delay, sequence_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return sequence_response(room_id, sequence)
+
+
+@app.post("/rooms/{room_id}/sequences")
+async def post_sequence(room_id: str, request: SequenceRequest):
+    """Plays a timed action sequence to the room on the server's clock"""
+    return schedule_sequence(room_id, request)
+
+
+@app.put("/rooms/{room_id}/sequences/{sequence_id}")
+async def replace_sequence(room_id: str, sequence_id: str,
+                           request: SequenceRequest):
+    """Cancels what is left of a sequence and plays a new one from now"""
+    return schedule_sequence(room_id, request, sequence_id)
+
+
+@app.get("/rooms/{room_id}/sequences/{sequence_id}")
+async def get_sequence(room_id: str, sequence_id: str):
+    try:
+        sequence = router.room(room_id,
+                               create=False).sequences.get(sequence_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return sequence_response(room_id, sequence)
+
+
+@app.delete("/rooms/{room_id}/sequences/{sequence_id}")
+async def cancel_sequence(room_id: str, sequence_id: str):
+    try:
+        sequence = router.room(room_id,
+                               create=False).sequences.cancel(sequence_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return sequence_response(room_id, sequence)
+
 
-    return {"status": "sent", "connections": len(connections)}
+@app.get("/stats")
+async def get_stats():
+    return router.stats()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fencing viewer server")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--overflow",
+                        choices=OVERFLOW_POLICIES,
+                        default=OVERFLOW_POLICY)
+    parser.add_argument("--shards", type=int, default=SHARDS)
+    args = parser.parse_args()
+    router.queue_size = args.queue_size
+    router.overflow = args.overflow
+    router.shards = args.shards
     uvicorn.run(app, host="127.0.0.1", port=8000)
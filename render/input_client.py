@@ -0,0 +1,177 @@
+"""Client side of the server's input WebSocket.
+
+Controllers call ``InputClient.send`` for every input. Inputs are collected
+for one frame, repeats of the same (fencer, action) within the frame are
+coalesced, and the frame goes out as one message tagged with a sequence
+number. The server acknowledges every frame with its own timestamps, from
+which the client tracks round-trip and input-to-broadcast latency. The
+latter runs from the moment ``send`` was called, so it includes the time an
+input waited for its frame.
+
+Each fencer's inputs are rate-limited with a token bucket, which allows
+short bursts (a quick double advance) where a fixed per-key delay would
+drop them.
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class InputClient:
+    """Persistent input WebSocket with frame batching and rate control"""
+
+    def __init__(self,
+                 url: str = "ws://127.0.0.1:8000/input",
+                 frame_time: float = 1 / 60,
+                 rate: float = 10.0,
+                 burst: int = 4,
+                 history: int = 1000):
+        self.url = url
+        self.frame_time = frame_time
+        self.rate = rate
+        self.burst = burst
+        self.sequence = 0
+        self.sent = 0  # inputs sent
+        self.limited = 0  # inputs dropped by the client's rate limit
+        self.rejected = 0  # inputs dropped by the server's rate limit
+        # Round trip of recently acknowledged frames, and input-to-broadcast
+        # latency of their inputs
+        self.round_trips = deque(maxlen=history)
+        self.broadcast_latencies = deque(maxlen=history)
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._socket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Inputs of the current frame and when each was sent
+        self._pending: Dict[Tuple[str, str], float] = {}
+        # Send time of each frame awaiting its ack, and of its inputs
+        self._in_flight: Dict[int, Tuple[float, List[float]]] = {}
+        self._acked = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession()
+        self._socket = await self._session.ws_connect(self.url)
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._read_loop())
+        ]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._socket.close()
+        await self._session.close()
+
+    def send(self, fencer: str, action: str) -> bool:
+        """Queues an input for the current frame; never blocks.
+
+        Returns False if the fencer is over its input rate.
+        """
+        if (fencer, action) in self._pending:
+            return True  # coalesced with the same, earlier input
+        bucket = self._buckets.get(fencer)
+        if bucket is None:
+            bucket = self._buckets[fencer] = TokenBucket(
+                self.rate, self.burst)
+        if not bucket.take():
+            self.limited += 1
+            return False
+        self._pending[fencer, action] = time.monotonic()
+        return True
+
+    async def flush(self):
+        """Sends the inputs of the current frame now"""
+        if not self._pending or self._socket is None:
+            return
+        pending, self._pending = self._pending, {}
+        actions = list(pending)
+        self.sequence += 1
+        self._in_flight[self.sequence] = (time.monotonic(),
+                                          list(pending.values()))
+        await self._socket.send_json({
+            "type": "input",
+            "seq": self.sequence,
+            "actions": actions
+        })
+        self.sent += len(actions)
+
+    async def drain(self, timeout: float = 5.0):
+        """Sends pending inputs and waits until every frame is acknowledged"""
+        await self.flush()
+        deadline = time.monotonic() + timeout
+        while self._in_flight and time.monotonic() < deadline:
+            self._acked.clear()
+            try:
+                await asyncio.wait_for(self._acked.wait(),
+                                       deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+
+    def latency(self) -> dict:
+        """Median and 95th percentile latencies in milliseconds.
+
+        Input to broadcast is estimated per input as its wait for the frame,
+        plus the one-way trip (half the round trip without the server's
+        time), plus the time the server took from receiving the frame to
+        queueing it for every spectator.
+        """
+        if not self.round_trips:
+            return {}
+        round_trips = sorted(self.round_trips)
+        broadcast = sorted(self.broadcast_latencies)
+
+        def percentile(values, q):
+            return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+        return {
+            "frames": len(round_trips),
+            "round_trip_ms": 1000 * statistics.median(round_trips),
+            "round_trip_p95_ms": percentile(round_trips, 0.95),
+            "input_to_broadcast_ms": 1000 * statistics.median(broadcast),
+            "input_to_broadcast_p95_ms": percentile(broadcast, 0.95),
+        }
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.frame_time)
+            try:
+                await self.flush()
+            except (aiohttp.ClientError, ConnectionError) as e:
+                logger.error(f"Error sending inputs: {e}")
+
+    async def _read_loop(self):
+        async for message in self._socket:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            data = message.json()
+            if data.get("type") == "error":
+                logger.error(f"Input rejected: {data.get('detail')}")
+                self._in_flight.pop(data.get("seq"), None)
+                self._acked.set()
+                continue
+            if data.get("type") != "ack":
+                continue
+            entry = self._in_flight.pop(data["seq"], None)
+            if entry is not None:
+                sent, inputs = entry
+                round_trip = time.monotonic() - sent
+                server = data["broadcast"] - data["received"]
+                self.round_trips.append(round_trip)
+                broadcast = sent + (round_trip - server) / 2 + server
+                self.broadcast_latencies.extend(broadcast - t
+                                                for t in inputs)
+            self.rejected += data.get("dropped", 0)
+            self._acked.set()
@@ -1,10 +1,8 @@
 import asyncio
-import aiohttp
-import time
 import logging
 from pynput import keyboard
-from typing import Dict
-from asyncio import Queue
+
+from input_client import InputClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,13 +10,11 @@ logger = logging.getLogger(__name__)
 
 class FencingController:
 
-    def __init__(self, server_url="http://127.0.0.1:8000"):
+    def __init__(self, server_url="ws://127.0.0.1:8000/input"):
         self.server_url = server_url
-        self.session = None
+        self.input = None
+        self.loop = None
         self.running = False
-        self.last_action_time: Dict[str, float] = {}
-        self.throttle_delay = 0.1
-        self.action_queue = Queue()
 
         # Action mapping for arrow keys (Player 2)
         self.action_map = {
@@ -47,30 +43,16 @@ class FencingController:
             '/': ('right', 'disengage'),  # Tactical move
         }
 
-    async def send_action(self, fencer: str, action: str):
-        """Send action to the server"""
-        if not self.session:
+    def send_action(self, fencer: str, action: str):
+        """Queue an action for the next input frame"""
+        if not self.input:
             return
+        if self.input.send(fencer, action):
+            logger.info(f"Sent: {fencer} - {action}")
 
-        # Throttle check
-        action_key = f"{fencer}_{action}"
-        current_time = time.time()
-        if action_key in self.last_action_time:
-            if current_time - self.last_action_time[
-                    action_key] < self.throttle_delay:
-                return
-
-        self.last_action_time[action_key] = current_time
-
-        url = f"{self.server_url}/action/{fencer}/{action}"
-        try:
-            async with self.session.post(url) as response:
-                if response.status == 200:
-                    logger.info(f"Sent: {fencer} - {action}")
-                else:
-                    logger.error(f"Failed to send action: {response.status}")
-        except Exception as e:
-            logger.error(f"Error sending action: {e}")
+    def queue_action(self, fencer: str, action: str):
+        """Hand an action from the listener thread to the event loop"""
+        self.loop.call_soon_threadsafe(self.send_action, fencer, action)
 
     def on_press(self, key):
         """Handle key press events"""
@@ -80,7 +62,7 @@ class FencingController:
         # Check if it's a special key (arrow keys, etc.)
         if key in self.action_map:
             fencer, action = self.action_map[key]
-            self.action_queue.put_nowait((fencer, action))
+            self.queue_action(fencer, action)
             return
 
         # Check if it's a character key
@@ -88,7 +70,7 @@ class FencingController:
             char = key.char
             if char in self.char_action_map:
                 fencer, action = self.char_action_map[char]
-                self.action_queue.put_nowait((fencer, action))
+                self.queue_action(fencer, action)
         except AttributeError:
             pass
 
@@ -98,18 +80,6 @@ class FencingController:
             self.running = False
             return False
 
-    async def process_action_queue(self):
-        """Process queued actions"""
-        while self.running:
-            try:
-                fencer, action = await self.action_queue.get()
-                await self.send_action(fencer, action)
-                self.action_queue.task_done()
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error processing action: {e}")
-
     async def run(self):
         """Main run loop"""
         self.running = True
@@ -139,27 +109,24 @@ class FencingController:
         print("\nPress ESC to quit\n")
 
         try:
-            # Set up aiohttp session
-            async with aiohttp.ClientSession() as session:
-                self.session = session
+            # Persistent input connection, batched per frame
+            async with InputClient(self.server_url) as client:
+                self.input = client
+                self.loop = asyncio.get_running_loop()
 
                 # Start keyboard listener
                 listener = keyboard.Listener(on_press=self.on_press,
                                              on_release=self.on_release)
                 listener.start()
 
-                # Start action queue processor
-                queue_processor = asyncio.create_task(
-                    self.process_action_queue())
-
                 # Keep running until ESC is pressed
                 while self.running:
                     await asyncio.sleep(0.01)
 
                 # Cleanup
-                queue_processor.cancel()
-                await queue_processor
                 listener.stop()
+                await client.drain()
+                logger.info(f"Input latency: {client.latency()}")
 
         except Exception as e:
             logger.error(f"Error in run loop: {e}")
@@ -0,0 +1,308 @@
+"""Server-hosted bouts stepped at a fixed tick rate.
+
+A LiveBout plays one round of a HeadlessBout per tick and hands the
+resulting state, a flat dict, to its ``on_state`` callback. It knows
+nothing about clients, so it can run in a shard process as well as on the
+server's own loop (see ``rooms``).
+
+A StateStream turns those states into client messages. The state is flat,
+so a delta is just the keys whose values changed. Each client acknowledges
+the ticks it has applied, and gets a delta against its last acknowledged
+state; a client without a usable acknowledgement (new, or too far behind)
+gets a keyframe, and every ``keyframe_interval`` ticks everyone does.
+Because deltas are relative to what the client confirmed, messages shed by
+a full client queue never corrupt its state. Every message carries the
+bout's generation, which acknowledgements must echo, so a late ack for a
+tick of a previous bout is never taken as a base for the new one. Messages
+are serialized once per distinct base tick, not once per client.
+
+Rounds of plain fencers take microseconds and run on the event loop.
+Bouts with a PlanningFencer run their rounds in an executor so the search
+never blocks the loop.
+
+Expects the repository root on sys.path, as set up by fencing_server.
+"""
+import asyncio
+import random
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from broadcast import ClientChannel, serialize
+from planner import PlanningFencer
+from sim import (ActionChosen, ActionRolled, BoutStreams, EventSink, Fencer,
+                 HeadlessBout, ParryAttempted)
+
+SIDES = ("left", "right")
+
+# Load of a bout with planning fencers relative to a plain one
+PLANNER_WEIGHT = 10
+
+
+class _RoundRecorder(EventSink):
+    """Keeps the events of the latest round for the published state"""
+
+    def __init__(self):
+        self.events = []
+
+    def handle(self, bout, event):
+        self.events.append(event)
+
+
+class LiveBout:
+    """One bout played live at ``tick_rate`` rounds per second"""
+
+    def __init__(self,
+                 bout_id: str,
+                 fencer1: Fencer,
+                 fencer2: Fencer,
+                 points_to_win: int = 5,
+                 tick_rate: float = 10.0,
+                 seed: Optional[int] = None,
+                 defenses: bool = False,
+                 executor: Optional[Executor] = None,
+                 on_state: Optional[Callable[[int, dict], None]] = None):
+        if tick_rate <= 0:
+            raise ValueError("tick_rate must be positive")
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.bout_id = bout_id
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.executor = executor
+        self.on_state = on_state
+        self._recorder = _RoundRecorder()
+        self.bout = HeadlessBout(fencer1,
+                                 fencer2,
+                                 points_to_win, [self._recorder],
+                                 streams=BoutStreams.from_seed(seed),
+                                 defenses=defenses)
+        # Searching fencers are too slow for the event loop
+        self.offload = any(
+            isinstance(f, PlanningFencer) for f in (fencer1, fencer2))
+
+        self.tick = 0
+        self.state = self._state()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        bout = self.bout
+        return max(bout.fencer1.score,
+                   bout.fencer2.score) >= bout.points_to_win
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        """Steps the bout until it is won, one round per tick"""
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.tick_rate
+        deadline = loop.time()
+        if self.on_state:
+            self.on_state(self.tick, self.state)
+        while not self.finished:
+            self._recorder.events.clear()
+            if self.offload:
+                await loop.run_in_executor(self.executor,
+                                           self.bout.simulate_round)
+            else:
+                self.bout.simulate_round()
+            self.tick += 1
+            self.state = self._state()
+            if self.on_state:
+                self.on_state(self.tick, self.state)
+
+            # Fixed rate on the monotonic clock; a late tick is not made up
+            deadline += period
+            delay = deadline - loop.time()
+            if delay < 0:
+                deadline = loop.time()
+                delay = 0.0
+            await asyncio.sleep(delay)
+
+    def _state(self) -> dict:
+        bout = self.bout
+        fencers = (bout.fencer1, bout.fencer2)
+        state = {
+            "round": bout.rounds,
+            "distance": bout.distance.name,
+            "turn": SIDES[0 if bout.current_fencer is bout.fencer1 else 1],
+            "action": None,
+            "action_fencer": None,
+            "hit": None,
+            "defense": None,
+            "parried": None,
+            "finished": self.finished,
+            "winner": None,
+        }
+        for side, fencer in zip(SIDES, fencers):
+            state[f"name_{side}"] = fencer.name
+            state[f"score_{side}"] = fencer.score
+            state[f"blade_{side}"] = fencer.blade_position.name
+
+        for event in self._recorder.events:
+            if isinstance(event, ActionChosen) and event.action_type:
+                state["action"] = event.action_type.value
+                state["action_fencer"] = SIDES[event.fencer - 1]
+            elif isinstance(event, ActionRolled) and state["hit"] is None:
+                state["hit"] = event.success
+            elif isinstance(event, ParryAttempted):
+                state["defense"] = event.defense_type.value
+                state["parried"] = event.success
+
+        if state["finished"]:
+            state["winner"] = SIDES[0 if bout.fencer1.score >=
+                                    bout.points_to_win else 1]
+        return state
+
+
+@dataclass(frozen=True)
+class BoutParams:
+    """Picklable description of a live bout, validated on creation"""
+    left_skill: float = 0.7
+    right_skill: float = 0.6
+    points_to_win: int = 5
+    tick_rate: float = 10.0
+    seed: Optional[int] = None
+    left_planner: bool = False
+    right_planner: bool = False
+    defenses: bool = False
+
+    def __post_init__(self):
+        if not 0 < self.left_skill <= 1 or not 0 < self.right_skill <= 1:
+            raise ValueError("skills must be in (0, 1]")
+        if self.points_to_win < 1:
+            raise ValueError("points_to_win must be at least 1")
+        if self.tick_rate <= 0:
+            raise ValueError("tick_rate must be positive")
+
+    @property
+    def weight(self) -> int:
+        if self.left_planner or self.right_planner:
+            return PLANNER_WEIGHT
+        return 1
+
+    def build(self,
+              bout_id: str,
+              executor: Optional[Executor] = None,
+              on_state: Optional[Callable[[int, dict], None]] = None
+              ) -> LiveBout:
+        # A planner may think for half a tick, leaving the rest for its
+        # opponent and the broadcast
+        budget = 0.5 / self.tick_rate
+        left = Fencer("left", self.left_skill)
+        right = Fencer("right", self.right_skill)
+        if self.left_planner:
+            left = PlanningFencer("left",
+                                  self.left_skill,
+                                  opponent=right,
+                                  points_to_win=self.points_to_win,
+                                  time_budget=budget,
+                                  defenses=self.defenses)
+        if self.right_planner:
+            right = PlanningFencer("right",
+                                   self.right_skill,
+                                   opponent=left,
+                                   points_to_win=self.points_to_win,
+                                   time_budget=budget,
+                                   defenses=self.defenses)
+            if self.left_planner:
+                left.opponent = right
+        return LiveBout(bout_id, left, right, self.points_to_win,
+                        self.tick_rate, self.seed, self.defenses, executor,
+                        on_state)
+
+
+class StateStream:
+    """Delta and keyframe messages of one bout for a set of clients"""
+
+    def __init__(self, stream_id: str, keyframe_interval: int = 50):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.stream_id = stream_id
+        self.keyframe_interval = keyframe_interval
+        self.generation = 0  # of the bout being streamed
+        self.tick: Optional[int] = None
+        self.state: Optional[dict] = None
+        # Acknowledged tick per client; clients without one get keyframes
+        self.acks: Dict[ClientChannel, int] = {}
+        # Recent states by tick, the possible bases of a delta
+        self._history: "OrderedDict[int, dict]" = OrderedDict()
+
+    def reset(self, generation: int):
+        """Forgets the previous bout's states when a new one starts"""
+        self.generation = generation
+        self.tick = self.state = None
+        self.acks.clear()
+        self._history.clear()
+
+    def acknowledge(self, channel: ClientChannel, tick: int,
+                    generation: int):
+        if generation != self.generation:
+            return  # applied from a previous bout's stream
+        if self.tick is None or not 0 <= tick <= self.tick:
+            return
+        if tick > self.acks.get(channel, -1):
+            self.acks[channel] = tick
+
+    def forget(self, channel: ClientChannel):
+        self.acks.pop(channel, None)
+
+    def keyframe(self) -> Optional[dict]:
+        if self.state is None:
+            return None
+        return {
+            "type": "keyframe",
+            "bout": self.stream_id,
+            "generation": self.generation,
+            "tick": self.tick,
+            "state": self.state
+        }
+
+    def publish(self, tick: int, state: dict,
+                channels: Iterable[ClientChannel]):
+        self.tick, self.state = tick, state
+        history = self._history
+        history[tick] = state
+        while len(history) > self.keyframe_interval:
+            history.popitem(last=False)
+
+        # Group clients by the base their message is computed against
+        periodic = tick % self.keyframe_interval == 0
+        groups: Dict[Optional[int], List[ClientChannel]] = {}
+        for channel in channels:
+            acked = self.acks.get(channel)
+            base = None if periodic or acked not in history else acked
+            groups.setdefault(base, []).append(channel)
+
+        for base, members in groups.items():
+            if base is None:
+                message = self.keyframe()
+            else:
+                previous = history[base]
+                message = {
+                    "type": "delta",
+                    "bout": self.stream_id,
+                    "generation": self.generation,
+                    "tick": tick,
+                    "base": base,
+                    "changes": {
+                        key: value
+                        for key, value in state.items()
+                        if previous.get(key) != value
+                    }
+                }
+            text = serialize(message)
+            for channel in members:
+                channel.put(text)
@@ -0,0 +1,30 @@
+"""Token bucket used to rate-limit controller inputs on both ends"""
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """Allows ``rate`` events per second on average, ``burst`` at once"""
+
+    def __init__(self,
+                 rate: float,
+                 burst: float,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def take(self, count: int = 1) -> bool:
+        """Spends ``count`` tokens if available; False means over the rate"""
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < count:
+            return False
+        self.tokens -= count
+        return True
@@ -0,0 +1,309 @@
+"""Rooms of clients, with their live bouts sharded across processes.
+
+Every room has its own set of client channels and its own StateStream, so a
+broadcast or a bout tick in one room only touches that room's clients.
+
+The RoomRouter lives in the server process and owns every WebSocket. Live
+bouts are simulated in shard processes, each running the bouts of many
+rooms on its own event loop. Rooms go to the least loaded shard, a bout
+with planning fencers weighing PLANNER_WEIGHT plain ones. Shards report
+each tick's state over one shared queue; a reader thread drains it in
+batches and hands them to the server loop, where the room's StateStream
+turns them into deltas and keyframes. With ``shards=0`` bouts run on the
+server loop instead, which is handy for development.
+
+Rooms are created by joining clients and by starting a bout, never by a
+relayed action or a sequence. A room without clients, running bout or
+pending sequences is removed, except the router's permanent rooms.
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from broadcast import DROP_OLDEST, Broadcaster, ClientChannel
+from live_bout import BoutParams, LiveBout, StateStream
+from sequences import SequenceScheduler
+
+# Most states handed to the server loop in one call
+BATCH_SIZE = 1024
+
+
+class Room:
+    """Clients and live bout state of one room"""
+
+    def __init__(self,
+                 room_id: str,
+                 queue_size: int = 256,
+                 overflow: str = DROP_OLDEST,
+                 keyframe_interval: int = 50,
+                 on_idle: Optional[Callable[[], None]] = None):
+        self.room_id = room_id
+        self.clients = Broadcaster(queue_size, overflow)
+        self.stream = StateStream(room_id, keyframe_interval)
+        self.sequences = SequenceScheduler(self.clients, on_idle)
+        self.params: Optional[BoutParams] = None
+        self.shard: Optional[int] = None
+        self.running = False  # counted in its shard's load
+        self.generation = 0  # bumped per bout, to drop states of old ones
+
+    def join(self, websocket) -> ClientChannel:
+        channel = self.clients.connect(websocket)
+        keyframe = self.stream.keyframe()
+        if keyframe is not None:
+            channel.send(keyframe)
+        return channel
+
+    async def leave(self, channel: ClientChannel):
+        self.stream.forget(channel)
+        await self.clients.disconnect(channel)
+
+    @property
+    def idle(self) -> bool:
+        return not (len(self.clients) or self.running
+                    or self.sequences.pending)
+
+    def summary(self) -> dict:
+        state = self.stream.state or {}
+        return {
+            "room": self.room_id,
+            "clients": len(self.clients),
+            "shard": self.shard,
+            "bout": None if self.params is None else asdict(self.params),
+            "tick": self.stream.tick,
+            "finished": state.get("finished"),
+            "score_left": state.get("score_left"),
+            "score_right": state.get("score_right"),
+        }
+
+
+def _shard_main(commands, states, bot_workers: int):
+    asyncio.run(_serve_shard(commands, states, bot_workers))
+
+
+async def _serve_shard(commands, states, bot_workers: int):
+    """Runs the live bouts of one shard until it receives None"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=bot_workers)
+    bouts: Dict[str, LiveBout] = {}
+    try:
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command is None:
+                break
+            op, room_id, generation, params = command
+            if room_id in bouts:
+                await bouts.pop(room_id).stop()
+            if op != "start":
+                continue
+
+            def report(tick, state, room_id=room_id, generation=generation):
+                states.put((room_id, generation, tick, state))
+
+            bout = params.build(room_id, executor, report)
+            bouts[room_id] = bout
+
+            def finished(_, room_id=room_id, bout=bout):
+                if bouts.get(room_id) is bout:
+                    del bouts[room_id]
+
+            bout.start().add_done_callback(finished)
+    finally:
+        for bout in list(bouts.values()):
+            await bout.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RoomRouter:
+    """Routes clients to rooms and room bouts to shard processes"""
+
+    def __init__(self,
+                 shards: int = 2,
+                 queue_size: int = 256,
+                 overflow: str = DROP_OLDEST,
+                 keyframe_interval: int = 50,
+                 bot_workers: int = 4,
+                 permanent: Iterable[str] = ()):
+        self.shards = shards
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.keyframe_interval = keyframe_interval
+        self.bot_workers = bot_workers
+        self.rooms: Dict[str, Room] = {}
+        self.permanent = frozenset(permanent)  # never reaped
+        for room_id in self.permanent:
+            self.room(room_id)
+        self.load = [0] * shards
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._processes: List[multiprocessing.Process] = []
+        self._commands: list = []
+        self._states = None
+        self._reader: Optional[threading.Thread] = None
+        # Bouts on the server loop when there are no shards
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local: Dict[str, LiveBout] = {}
+
+    def start(self):
+        """Starts the shard processes; call from the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self.load = [0] * self.shards
+        if not self.shards:
+            self._executor = ThreadPoolExecutor(max_workers=self.bot_workers)
+            return
+
+        # Spawned, not forked: the server process has threads and a loop
+        context = multiprocessing.get_context("spawn")
+        self._states = context.Queue()
+        for index in range(self.shards):
+            commands = context.Queue()
+            process = context.Process(target=_shard_main,
+                                      args=(commands, self._states,
+                                            self.bot_workers),
+                                      name=f"fencing-shard-{index}",
+                                      daemon=True)
+            process.start()
+            self._commands.append(commands)
+            self._processes.append(process)
+        self._reader = threading.Thread(target=self._read_states,
+                                        name="fencing-shard-reader",
+                                        daemon=True)
+        self._reader.start()
+
+    async def close(self):
+        for bout in self._local.values():
+            await bout.stop()
+        self._local.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            await asyncio.get_running_loop().run_in_executor(
+                None, process.join, 5)
+            if process.is_alive():
+                process.terminate()
+        if self._states is not None:
+            self._states.put(None)
+            self._reader.join()
+        self._commands.clear()
+        self._processes.clear()
+
+    def room(self, room_id: str, create: bool = True) -> Room:
+        room = self.rooms.get(room_id)
+        if room is None:
+            if not create:
+                raise KeyError(f"unknown room {room_id!r}")
+            room = Room(room_id, self.queue_size, self.overflow,
+                        self.keyframe_interval,
+                        lambda: self.reap(room_id))
+            self.rooms[room_id] = room
+        return room
+
+    def reap(self, room_id: str):
+        """Removes the room if nothing is left in it"""
+        room = self.rooms.get(room_id)
+        if room is not None and room.idle and room_id not in self.permanent:
+            self.stop_bout(room_id)  # a finished bout may still be set
+            del self.rooms[room_id]
+
+    async def remove(self, room_id: str):
+        room = self.room(room_id, create=False)
+        self.stop_bout(room_id)
+        room.sequences.cancel_all()
+        for channel in list(room.clients.channels):
+            await room.leave(channel)
+        del self.rooms[room_id]
+
+    def start_bout(self, room_id: str, params: BoutParams) -> Room:
+        """Starts (or restarts) the live bout of a room"""
+        room = self.room(room_id)
+        self.stop_bout(room_id)
+        room.generation += 1
+        room.params = params
+        room.running = True
+        room.stream.reset(room.generation)
+
+        if not self.shards:
+            def report(tick, state, generation=room.generation):
+                self._deliver(room_id, generation, tick, state)
+
+            bout = params.build(room_id, self._executor, report)
+            self._local[room_id] = bout
+            bout.start()
+            return room
+
+        room.shard = min(range(self.shards), key=self.load.__getitem__)
+        self.load[room.shard] += params.weight
+        self._commands[room.shard].put(
+            ("start", room_id, room.generation, params))
+        return room
+
+    def stop_bout(self, room_id: str):
+        room = self.room(room_id, create=False)
+        if room.params is None:
+            return
+        self._release(room)
+        if room.shard is not None:
+            self._commands[room.shard].put(
+                ("stop", room_id, room.generation, None))
+        else:
+            bout = self._local.pop(room_id, None)
+            if bout is not None:
+                bout.task.cancel()
+        room.params = room.shard = None
+        room.generation += 1
+
+    def _release(self, room: Room):
+        """Takes a room's bout out of its shard's load, once"""
+        if room.running and room.shard is not None:
+            self.load[room.shard] -= room.params.weight
+        room.running = False
+
+    def _read_states(self):
+        """Reader thread: moves shard states to the loop in batches"""
+        states = self._states
+        while True:
+            batch = [states.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(states.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._loop.call_soon_threadsafe(self._deliver_batch, batch)
+            if stop:
+                return
+
+    def _deliver_batch(self, batch: list):
+        for item in batch:
+            self._deliver(*item)
+
+    def _deliver(self, room_id: str, generation: int, tick: int,
+                 state: dict):
+        room = self.rooms.get(room_id)
+        if room is None or room.generation != generation:
+            return  # the room or its bout is gone
+        if state["finished"]:
+            self._release(room)
+        room.stream.publish(tick, state, room.clients.channels)
+        if state["finished"]:
+            self.reap(room_id)
+
+    def stats(self) -> dict:
+        rooms = [room.clients.stats() for room in self.rooms.values()]
+        return {
+            "rooms": len(self.rooms),
+            "shards": self.shards,
+            "shard_load": list(self.load),
+            **{
+                key: sum(r[key] for r in rooms)
+                for key in ("connections", "pending", "sent", "dropped")
+            }
+        }
@@ -0,0 +1,151 @@
+"""Scripted action sequences played back on the server's clock.
+
+A client posts a whole sequence of timestamped actions once. Each action is
+scheduled with ``loop.call_at`` on the server's monotonic clock, relative
+to the moment the sequence was accepted, so playback timing does not depend
+on request round trips and every spectator of the room sees the same
+timeline. A sequence can be cancelled, or replaced by a new one under the
+same id, at any point; actions already played stay played.
+"""
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from broadcast import Broadcaster
+
+# Bounds on what one request may schedule
+MAX_ACTIONS = 1000
+MAX_DURATION = 600.0  # seconds
+
+# (offset in seconds from the start, fencer, action)
+TimedAction = Tuple[float, str, str]
+
+
+@dataclass
+class ScheduledSequence:
+    """A sequence whose actions are waiting in the event loop"""
+    sequence_id: str
+    start: float  # loop.time() of offset 0
+    actions: List[TimedAction]
+    played: int = 0
+    cancelled: bool = False
+    _handles: list = field(default_factory=list, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or self.played == len(self.actions)
+
+    def cancel(self):
+        for handle in self._handles:
+            handle.cancel()
+        self.cancelled = True
+
+    def summary(self) -> dict:
+        return {
+            "sequence": self.sequence_id,
+            "start": self.start,
+            "duration": self.actions[-1][0] if self.actions else 0.0,
+            "actions": len(self.actions),
+            "played": self.played,
+            "cancelled": self.cancelled,
+            "done": self.done,
+        }
+
+
+def validate_actions(actions: Sequence[TimedAction]) -> List[TimedAction]:
+    """Checks bounds and returns the actions ordered by time"""
+    if len(actions) > MAX_ACTIONS:
+        raise ValueError(f"at most {MAX_ACTIONS} actions per sequence")
+    for at, _, _ in actions:
+        if not 0 <= at <= MAX_DURATION:
+            raise ValueError(
+                f"action times must be within [0, {MAX_DURATION}] seconds")
+    # Stable, so simultaneous actions keep their order
+    return sorted(actions, key=lambda action: action[0])
+
+
+class SequenceScheduler:
+    """Scheduled sequences of one room"""
+
+    def __init__(self,
+                 clients: Broadcaster,
+                 on_idle: Optional[Callable[[], None]] = None):
+        self.clients = clients
+        self.on_idle = on_idle  # called when the last pending sequence ends
+        self.sequences: Dict[str, ScheduledSequence] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def pending(self) -> int:
+        return sum(not sequence.done for sequence in self.sequences.values())
+
+    def schedule(self,
+                 actions: Sequence[TimedAction],
+                 delay: float = 0.0,
+                 sequence_id: Optional[str] = None) -> ScheduledSequence:
+        """Schedules actions ``delay`` seconds from now.
+
+        Passing the id of an existing sequence replaces it: its unplayed
+        actions are cancelled and the new ones start from now.
+        """
+        actions = validate_actions(actions)
+        if not 0 <= delay <= MAX_DURATION:
+            raise ValueError(f"delay must be within [0, {MAX_DURATION}]")
+        if sequence_id is None:
+            sequence_id = str(next(self._ids))
+        else:
+            # Not self.cancel: the room must not look idle in between
+            self.get(sequence_id).cancel()
+
+        loop = asyncio.get_running_loop()
+        sequence = ScheduledSequence(sequence_id, loop.time() + delay,
+                                     actions)
+        for index, (at, fencer, action) in enumerate(actions):
+            sequence._handles.append(
+                loop.call_at(sequence.start + at, self._play, sequence,
+                             index, fencer, action))
+        self.sequences[sequence_id] = sequence
+        self._forget_finished()
+        if sequence.done:
+            # No actions, so no _play will ever check for idleness
+            self._check_idle()
+        return sequence
+
+    def get(self, sequence_id: str) -> ScheduledSequence:
+        try:
+            return self.sequences[sequence_id]
+        except KeyError:
+            raise KeyError(f"unknown sequence {sequence_id!r}") from None
+
+    def cancel(self, sequence_id: str) -> ScheduledSequence:
+        sequence = self.get(sequence_id)
+        sequence.cancel()
+        self._check_idle()
+        return sequence
+
+    def cancel_all(self):
+        for sequence in self.sequences.values():
+            sequence.cancel()
+
+    def _play(self, sequence: ScheduledSequence, index: int, fencer: str,
+              action: str):
+        sequence.played += 1
+        self.clients.broadcast({
+            "fencer": fencer,
+            "action": action,
+            "sequence": sequence.sequence_id,
+            "index": index
+        })
+        if sequence.done:
+            self._check_idle()
+
+    def _check_idle(self):
+        if self.on_idle is not None and not self.pending:
+            self.on_idle()
+
+    def _forget_finished(self):
+        """Keeps finished sequences only while there are few of them"""
+        finished = [k for k, s in self.sequences.items() if s.done]
+        for key in finished[:max(0, len(finished) - 100)]:
+            del self.sequences[key]
@@ -1,22 +1,21 @@
-import aiohttp
 import asyncio
 
+from input_client import InputClient
+
 
 async def test_actions():
-    async with aiohttp.ClientSession() as session:
+    async with InputClient("ws://127.0.0.1:8000/input") as client:
         # Test sequence
         actions = [("left", "advance"), ("left", "lunge"),
                    ("right", "parry_4"), ("right", "retreat")]
 
         for fencer, action in actions:
-            url = f"http://127.0.0.1:8000/action/{fencer}/{action}"
-            try:
-                async with session.post(url) as response:
-                    result = await response.json()
-                    print(f"Sent {action} for {fencer}: {result}")
-                await asyncio.sleep(1)  # Wait between actions
-            except Exception as e:
-                print(f"Error sending {action}: {e}")
+            sent = client.send(fencer, action)
+            print(f"Sent {action} for {fencer}: {sent}")
+            await asyncio.sleep(1)  # Wait between actions
+
+        await client.drain()
+        print(f"Latency: {client.latency()}")
 
 
 if __name__ == "__main__":
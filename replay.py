@@ -0,0 +1,119 @@
+"""Deterministic replay of single bouts from (seed, config).
+
+A bout only depends on its seed and the two fencer configurations, so any
+bout of a batch can be rebuilt without storing its events. BoutReplay keeps
+periodic snapshots while it plays, so seeking to round K restores the
+nearest earlier snapshot and only plays the rounds in between.
+"""
+import bisect
+import random
+from typing import List, Optional
+
+from sim import (BoutResult, BoutSnapshot, EventSink, FencerSpec, FencingBout,
+                 derive_seed)
+
+
+class _EventCollector(EventSink):
+
+    def __init__(self):
+        self.events = []
+
+    def handle(self, bout: FencingBout, event):
+        self.events.append(event)
+
+
+class BoutReplay:
+    """Rebuilds one bout and seeks to any round"""
+
+    def __init__(self,
+                 seed: int,
+                 fencer1_spec: FencerSpec,
+                 fencer2_spec: FencerSpec,
+                 points_to_win: int = 5,
+                 snapshot_interval: int = 32,
+                 defenses: bool = False):
+        self.seed = seed
+        self.points_to_win = points_to_win
+        self.snapshot_interval = snapshot_interval
+        self.bout = FencingBout(fencer1_spec.build(),
+                                fencer2_spec.build(),
+                                points_to_win,
+                                sinks=[],
+                                rng=random.Random(seed),
+                                defenses=defenses)
+
+        # Snapshots taken after every snapshot_interval rounds, in order
+        self._snapshots: List[BoutSnapshot] = [self.bout.snapshot()]
+        self._snapshot_rounds: List[int] = [0]
+
+    @classmethod
+    def from_batch(cls,
+                   batch_seed: int,
+                   index: int,
+                   fencer1_spec: FencerSpec,
+                   fencer2_spec: FencerSpec,
+                   points_to_win: int = 5,
+                   snapshot_interval: int = 32,
+                   defenses: bool = False) -> "BoutReplay":
+        """Replays bout ``index`` of a replayable batch.
+
+        The batch is ``simulate_many(..., seed=batch_seed, replayable=True)``,
+        or one run with sinks.
+
+        ``defenses`` must match the batch's, or the bout diverges at its
+        first landing attack.
+        """
+        return cls(derive_seed(batch_seed, index), fencer1_spec, fencer2_spec,
+                   points_to_win, snapshot_interval, defenses)
+
+    @property
+    def finished(self) -> bool:
+        return max(self.bout.fencer1.score,
+                   self.bout.fencer2.score) >= self.points_to_win
+
+    def seek(self, round_number: int) -> FencingBout:
+        """Returns the bout as it stood after ``round_number`` rounds.
+
+        Seeking past the end of the bout stops at its last round.
+        """
+        index = bisect.bisect_right(self._snapshot_rounds, round_number) - 1
+        # Keep playing from the live state if it is closer than the snapshot
+        if not self._snapshot_rounds[index] <= self.bout.rounds <= round_number:
+            self.bout.restore(self._snapshots[index])
+
+        while self.bout.rounds < round_number and not self.finished:
+            self._step()
+        return self.bout
+
+    def _step(self):
+        self.bout.simulate_round()
+        if (self.bout.rounds % self.snapshot_interval == 0
+                and self.bout.rounds > self._snapshot_rounds[-1]):
+            self._snapshots.append(self.bout.snapshot())
+            self._snapshot_rounds.append(self.bout.rounds)
+
+    def events(self, first_round: int, last_round: Optional[int] = None):
+        """Regenerates the events of rounds first_round..last_round"""
+        self.seek(first_round - 1)
+        collector = _EventCollector()
+        self.bout.sinks = [collector]
+        try:
+            while not self.finished and (last_round is None
+                                         or self.bout.rounds < last_round):
+                self._step()
+        finally:
+            self.bout.sinks = []
+        return collector.events
+
+    def run_to_end(self) -> BoutResult:
+        """Plays the bout out and returns its result"""
+        while not self.finished:
+            self._step()
+        bout = self.bout
+        return BoutResult(
+            winner=1 if bout.fencer1.score >= self.points_to_win else 2,
+            score=(bout.fencer1.score, bout.fencer2.score),
+            rounds=bout.rounds,
+            action_attempts=dict(bout.action_attempts),
+            action_successes=dict(bout.action_successes),
+            seed=self.seed)
@@ -0,0 +1,244 @@
+"""Columnar on-disk store for bout outcomes.
+
+Results are appended to in-memory column buffers and flushed as chunks, one
+``.npy`` file per column per chunk. Reading memory-maps the chunk files, so
+aggregations over hundreds of millions of rows only ever touch NumPy arrays
+and never build per-bout Python objects.
+
+Layout of a store directory::
+
+    fencers.json            registered fencer specs, id = list index
+    chunk_000000/winner.npy
+    chunk_000000/attempts.npy   (rows, len(ACTIONS))
+    ...
+"""
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sim import (ACTION_ORDINALS, ActionType, ActionWeights, BoutResult,
+                 FencerSpec)
+
+ACTIONS = list(ActionType)
+
+# Column name -> (dtype, width). Width 0 is a scalar column.
+COLUMNS = {
+    "fencer1": (np.uint32, 0),
+    "fencer2": (np.uint32, 0),
+    "seed": (np.uint64, 0),
+    "winner": (np.uint8, 0),
+    "score1": (np.uint16, 0),
+    "score2": (np.uint16, 0),
+    "rounds": (np.uint32, 0),
+    "attempts": (np.uint32, len(ACTIONS)),
+    "successes": (np.uint32, len(ACTIONS)),
+}
+
+NO_SEED = np.iinfo(np.uint64).max
+
+
+class ResultsStore:
+    """Appends bout outcomes as fixed-width columns in chunked .npy files"""
+
+    # Buffers start this small and double up to chunk_rows as rows arrive
+    INITIAL_ROWS = 1024
+
+    def __init__(self, path: str, chunk_rows: int = 1_000_000):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        os.makedirs(path, exist_ok=True)
+
+        self._fencers_path = os.path.join(path, "fencers.json")
+        self.fencers: List[FencerSpec] = []
+        if os.path.exists(self._fencers_path):
+            with open(self._fencers_path) as f:
+                self.fencers = [
+                    FencerSpec(spec["name"], spec["skill_level"],
+                               spec.get("weights") and
+                               ActionWeights(*spec["weights"]))
+                    for spec in json.load(f)
+                ]
+
+        self._chunks = sorted(name for name in os.listdir(path)
+                              if name.startswith("chunk_"))
+        self._buffer = self._empty_buffer(min(self.INITIAL_ROWS, chunk_rows))
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(len(chunk["winner"])
+                   for chunk in self.iter_chunks(("winner", ))) + self._buffered
+
+    def _empty_buffer(self, rows: int) -> Dict[str, np.ndarray]:
+        return {
+            name: np.zeros((rows, width) if width else rows, dtype=dtype)
+            for name, (dtype, width) in COLUMNS.items()
+        }
+
+    def _grow(self):
+        """Doubles the buffers, up to chunk_rows"""
+        grown = self._empty_buffer(
+            min(2 * len(self._buffer["winner"]), self.chunk_rows))
+        for column, values in self._buffer.items():
+            grown[column][:self._buffered] = values[:self._buffered]
+        self._buffer = grown
+
+    def fencer_id(self, spec: FencerSpec) -> int:
+        """Returns the id of spec, registering it on first use"""
+        if spec in self.fencers:
+            return self.fencers.index(spec)
+        self.fencers.append(spec)
+        with open(self._fencers_path, "w") as f:
+            json.dump([{
+                "name": known.name,
+                "skill_level": known.skill_level,
+                "weights": known.weights and known.weights.as_tuple()
+            } for known in self.fencers], f)
+        return len(self.fencers) - 1
+
+    def append(self, fencer1_spec: FencerSpec, fencer2_spec: FencerSpec,
+               results: Iterable[BoutResult]):
+        """Appends results of bouts between two fencer specs"""
+        fencer1 = self.fencer_id(fencer1_spec)
+        fencer2 = self.fencer_id(fencer2_spec)
+        buffer = self._buffer
+        for result in results:
+            row = self._buffered
+            if row == len(buffer["winner"]):
+                self._grow()
+                buffer = self._buffer
+            buffer["fencer1"][row] = fencer1
+            buffer["fencer2"][row] = fencer2
+            buffer["seed"][row] = NO_SEED if result.seed is None else result.seed
+            buffer["winner"][row] = result.winner
+            buffer["score1"][row], buffer["score2"][row] = result.score
+            buffer["rounds"][row] = result.rounds
+            for action, count in result.action_attempts.items():
+                buffer["attempts"][row, ACTION_ORDINALS[action]] = count
+            for action, count in result.action_successes.items():
+                buffer["successes"][row, ACTION_ORDINALS[action]] = count
+
+            self._buffered += 1
+            if self._buffered == self.chunk_rows:
+                self.flush()
+                buffer = self._buffer
+
+    def flush(self):
+        """Writes buffered rows out as a new chunk"""
+        if not self._buffered:
+            return
+        name = f"chunk_{len(self._chunks):06d}"
+        # Written under a temporary name so readers never see half a chunk
+        staging = os.path.join(self.path, f".{name}")
+        os.makedirs(staging, exist_ok=True)
+        for column, values in self._buffer.items():
+            np.save(os.path.join(staging, f"{column}.npy"),
+                    values[:self._buffered])
+        os.replace(staging, os.path.join(self.path, name))
+
+        self._chunks.append(name)
+        self._buffer = self._empty_buffer(
+            min(self.INITIAL_ROWS, self.chunk_rows))
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def iter_chunks(
+        self,
+        columns: Sequence[str] = tuple(COLUMNS)
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Yields {column: memory-mapped array} for every flushed chunk"""
+        for name in self._chunks:
+            yield {
+                column: np.load(os.path.join(self.path, name,
+                                             f"{column}.npy"),
+                                mmap_mode="r")
+                for column in columns
+            }
+
+    def column(self, name: str) -> np.ndarray:
+        """Loads one column of the whole store into memory"""
+        parts = [chunk[name] for chunk in self.iter_chunks((name, ))]
+        if not parts:
+            dtype, width = COLUMNS[name]
+            return np.zeros((0, width) if width else 0, dtype=dtype)
+        return np.concatenate(parts)
+
+    def _selected_chunks(
+        self, columns: Sequence[str], fencer1: Optional[FencerSpec],
+        fencer2: Optional[FencerSpec]
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        if any(spec is not None and spec not in self.fencers
+               for spec in (fencer1, fencer2)):
+            return
+        ids = [
+            None if spec is None else self.fencers.index(spec)
+            for spec in (fencer1, fencer2)
+        ]
+        for chunk in self.iter_chunks(tuple(columns) +
+                                      ("fencer1", "fencer2")):
+            mask = np.ones(len(chunk["fencer1"]), dtype=bool)
+            for key, fencer in zip(("fencer1", "fencer2"), ids):
+                if fencer is not None:
+                    mask &= chunk[key] == fencer
+            if mask.all():
+                yield chunk
+            elif mask.any():
+                yield {column: chunk[column][mask] for column in columns}
+
+    def action_statistics(
+            self,
+            fencer1: Optional[FencerSpec] = None,
+            fencer2: Optional[FencerSpec] = None
+    ) -> Dict[ActionType, Tuple[int, int]]:
+        """(successes, attempts) per action, as in the bout summary.
+
+        Restricted to bouts between the given specs when they are passed.
+        """
+        attempts = np.zeros(len(ACTIONS), dtype=np.int64)
+        successes = np.zeros(len(ACTIONS), dtype=np.int64)
+        for chunk in self._selected_chunks(("attempts", "successes"), fencer1,
+                                           fencer2):
+            attempts += chunk["attempts"].sum(axis=0, dtype=np.int64)
+            successes += chunk["successes"].sum(axis=0, dtype=np.int64)
+        return {
+            action: (int(successes[index]), int(attempts[index]))
+            for index, action in enumerate(ACTIONS) if attempts[index]
+        }
+
+    def summary(self,
+                fencer1: Optional[FencerSpec] = None,
+                fencer2: Optional[FencerSpec] = None) -> Dict[str, float]:
+        """Bout count, win rate of fencer 1 and round statistics"""
+        bouts = wins = total_rounds = longest = 0
+        for chunk in self._selected_chunks(("winner", "rounds"), fencer1,
+                                           fencer2):
+            bouts += len(chunk["winner"])
+            wins += int(np.count_nonzero(chunk["winner"] == 1))
+            total_rounds += int(chunk["rounds"].sum(dtype=np.int64))
+            if len(chunk["rounds"]):
+                longest = max(longest, int(chunk["rounds"].max()))
+        return {
+            "bouts": bouts,
+            "fencer1 win rate": wins / bouts if bouts else 0.0,
+            "mean rounds": total_rounds / bouts if bouts else 0.0,
+            "max rounds": longest,
+        }
+
+
+def format_action_statistics(
+        statistics: Dict[ActionType, Tuple[int, int]]) -> List[str]:
+    """Formats action statistics the way BoutPresenter.show_bout_summary does"""
+    return [
+        f"{action.value:20}: {success}/{total} "
+        f"({success / total * 100:.1f}% success)"
+        for action, (success, total) in statistics.items()
+    ]
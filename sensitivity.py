@@ -0,0 +1,124 @@
+"""Sensitivity of the win probability to the balancing parameters.
+
+Derivatives are central finite differences of the exact chain solution
+(``markov``), so they carry no sampling noise and one call evaluates every
+parameter in milliseconds. Parameters are the shared tables, so a perturbation
+applies to both fencers, exactly as editing ActionDatabase would.
+"""
+import argparse
+import copy
+import dataclasses
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+
+from markov import scoring_probabilities, solve_chain
+from sim import (ActionDatabase, ActionProperties, ActionType, DistanceType,
+                 Fencer, FencingBout)
+
+
+@dataclass(frozen=True)
+class Sensitivity:
+    """d P(fencer 1 wins) / d parameter at the current table values"""
+    parameter: str
+    value: float
+    derivative: float
+    elasticity: float  # relative change of P per relative change of value
+
+
+def _with_actions(fencer: Fencer,
+                  actions: Mapping[ActionType, ActionProperties]) -> Fencer:
+    probe = copy.copy(fencer)
+    probe.available_actions = actions
+    probe._policy_cache = {}
+    return probe
+
+
+def _win_probability(fencer1: Fencer, fencer2: Fencer, points_to_win: int,
+                     actions: Mapping[ActionType, ActionProperties],
+                     modifiers: Mapping[DistanceType, float]) -> float:
+    fencer1 = _with_actions(fencer1, actions)
+    fencer2 = _with_actions(fencer2, actions)
+    return solve_chain(scoring_probabilities(fencer1, fencer2, modifiers),
+                       scoring_probabilities(fencer2, fencer1, modifiers),
+                       points_to_win).start[0]
+
+
+def win_probability_sensitivities(fencer1: Fencer,
+                                  fencer2: Fencer,
+                                  points_to_win: int = 5,
+                                  step: float = 1e-4,
+                                  actions: Optional[Mapping[
+                                      ActionType, ActionProperties]] = None,
+                                  modifiers: Optional[Mapping[
+                                      DistanceType, float]] = None
+                                  ) -> List[Sensitivity]:
+    """Derivatives for every base_success_rate and distance modifier.
+
+    Results are sorted by absolute elasticity, most influential first.
+    Parameters that no reachable bout state uses come out as zero. The model
+    clips probabilities at 1 and prunes candidate actions at fixed weight
+    ratios, so a derivative is one-sided in effect when the current value
+    sits exactly on such a kink.
+    """
+    actions = dict(ActionDatabase.get_all_actions()
+                   if actions is None else actions)
+    modifiers = dict(FencingBout.DISTANCE_MODIFIERS
+                     if modifiers is None else modifiers)
+    base = _win_probability(fencer1, fencer2, points_to_win,
+                            MappingProxyType(actions), modifiers)
+
+    def sensitivity(name: str, value: float, evaluate) -> Sensitivity:
+        derivative = (evaluate(value + step) -
+                      evaluate(value - step)) / (2 * step)
+        elasticity = derivative * value / base if base else 0.0
+        return Sensitivity(name, value, derivative, elasticity)
+
+    results = []
+    for action_type, properties in actions.items():
+
+        def evaluate(rate, action_type=action_type, properties=properties):
+            perturbed = dict(actions)
+            perturbed[action_type] = dataclasses.replace(
+                properties, base_success_rate=rate)
+            return _win_probability(fencer1, fencer2, points_to_win,
+                                    MappingProxyType(perturbed), modifiers)
+
+        results.append(
+            sensitivity(f"base_success_rate[{action_type.value}]",
+                        properties.base_success_rate, evaluate))
+
+    for distance, modifier in modifiers.items():
+
+        def evaluate(value, distance=distance):
+            perturbed = dict(modifiers)
+            perturbed[distance] = value
+            return _win_probability(fencer1, fencer2, points_to_win,
+                                    MappingProxyType(actions), perturbed)
+
+        results.append(
+            sensitivity(f"distance_modifier[{distance.value}]", modifier,
+                        evaluate))
+
+    results.sort(key=lambda s: abs(s.elasticity), reverse=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank table parameters by their effect on P(win)")
+    parser.add_argument("--skill1", type=float, default=0.7)
+    parser.add_argument("--skill2", type=float, default=0.6)
+    parser.add_argument("--points", type=int, default=5)
+    args = parser.parse_args()
+
+    fencer1 = Fencer("Fencer 1", args.skill1)
+    fencer2 = Fencer("Fencer 2", args.skill2)
+    print(f"{'parameter':42} {'value':>7} {'dP/dx':>9} {'elasticity':>11}")
+    for s in win_probability_sensitivities(fencer1, fencer2, args.points):
+        print(f"{s.parameter:42} {s.value:7.3f} {s.derivative:+9.4f} "
+              f"{s.elasticity:+11.4f}")
+
+
+if __name__ == "__main__":
+    main()
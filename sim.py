@@ -4,7 +4,10 @@ import time
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum, auto
-from typing import Dict, List, Optional, Set, Tuple
+from operator import itemgetter
+from types import MappingProxyType
+from typing import (Dict, FrozenSet, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple)
 
 from colorama import Back, Fore, Style, init
 
@@ -89,34 +92,72 @@ class BladePosition(Enum):
     QUINTE = "Quinte"
 
 
-@dataclass
+# Enum ordinals used to index the compiled tables
+DISTANCE_ORDINALS = {distance: i for i, distance in enumerate(DistanceType)}
+ACTION_ORDINALS = {action: i for i, action in enumerate(ActionType)}
+DEFENSE_ORDINALS = {defense: i for i, defense in enumerate(DefenseType)}
+BLADE_ORDINALS = {blade: i for i, blade in enumerate(BladePosition)}
+
+
+def _freeze_sets(properties, *fields: str):
+    for field in fields:
+        object.__setattr__(properties, field,
+                           frozenset(getattr(properties, field)))
+
+
+@dataclass(frozen=True, slots=True)
 class ActionProperties:
     name: str
     execution_time: float
     base_success_rate: float
-    valid_distances: Set[DistanceType]
-    vulnerable_to: Set[DefenseType]
-    effective_against: Set[DefenseType]
+    valid_distances: FrozenSet[DistanceType]
+    vulnerable_to: FrozenSet[DefenseType]
+    effective_against: FrozenSet[DefenseType]
     preparation_required: bool
     priority: bool
     description: str
 
+    def __post_init__(self):
+        _freeze_sets(self, "valid_distances", "vulnerable_to",
+                     "effective_against")
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class DefenseProperties:
     name: str
     execution_time: float
     base_success_rate: float
-    effective_against: Set[ActionType]
-    follow_up_actions: Set[ActionType]
+    effective_against: FrozenSet[ActionType]
+    follow_up_actions: FrozenSet[ActionType]
     description: str
 
+    def __post_init__(self):
+        _freeze_sets(self, "effective_against", "follow_up_actions")
+
 
 class ActionDatabase:
     """Central repository for all action definitions and their properties"""
 
+    _actions: Optional[Mapping[ActionType, ActionProperties]] = None
+    _table: Optional[Tuple[Optional[ActionProperties], ...]] = None
+
+    @classmethod
+    def get_all_actions(cls) -> Mapping[ActionType, ActionProperties]:
+        """Returns the shared read-only action table, built on first use"""
+        if cls._actions is None:
+            cls._actions = MappingProxyType(cls._build_actions())
+        return cls._actions
+
+    @classmethod
+    def get_action_table(cls) -> Tuple[Optional[ActionProperties], ...]:
+        """Action properties indexed by ActionType ordinal, None if undefined"""
+        if cls._table is None:
+            actions = cls.get_all_actions()
+            cls._table = tuple(actions.get(action) for action in ActionType)
+        return cls._table
+
     @staticmethod
-    def get_all_actions() -> Dict[ActionType, ActionProperties]:
+    def _build_actions() -> Dict[ActionType, ActionProperties]:
         actions = {}
 
         # Simple Attacks
@@ -318,8 +359,68 @@ class ActionDatabase:
 class DefenseDatabase:
     """Central repository for all defense definitions and their properties"""
 
+    _defenses: Optional[Mapping[DefenseType, DefenseProperties]] = None
+    _table: Optional[Tuple[Optional[DefenseProperties], ...]] = None
+    _parry_masks: Optional[Tuple[int, ...]] = None
+    _follow_up_masks: Optional[Tuple[int, ...]] = None
+
+    @classmethod
+    def get_all_defenses(cls) -> Mapping[DefenseType, DefenseProperties]:
+        """Returns the shared read-only defense table, built on first use"""
+        if cls._defenses is None:
+            cls._defenses = MappingProxyType(cls._build_defenses())
+        return cls._defenses
+
+    @classmethod
+    def get_defense_table(cls) -> Tuple[Optional[DefenseProperties], ...]:
+        """Defense properties indexed by DefenseType ordinal, None if undefined"""
+        if cls._table is None:
+            defenses = cls.get_all_defenses()
+            cls._table = tuple(
+                defenses.get(defense) for defense in DefenseType)
+        return cls._table
+
+    @classmethod
+    def get_parry_masks(cls) -> Tuple[int, ...]:
+        """Per action ordinal, a bitmask of the defenses that can parry it.
+
+        Bit i stands for the defense with ordinal i. A defense parries an
+        action if the action is vulnerable to it or the defense is effective
+        against the action, unless the action is effective against it.
+        """
+        if cls._parry_masks is None:
+            actions = ActionDatabase.get_all_actions()
+            defenses = cls.get_all_defenses()
+            masks = []
+            for action_type in ActionType:
+                properties = actions.get(action_type)
+                mask = 0
+                if properties is not None:
+                    for defense_type, defense in defenses.items():
+                        bit = 1 << DEFENSE_ORDINALS[defense_type]
+                        if (defense_type in properties.vulnerable_to
+                                or action_type in defense.effective_against):
+                            mask |= bit
+                        if defense_type in properties.effective_against:
+                            mask &= ~bit
+                masks.append(mask)
+            cls._parry_masks = tuple(masks)
+        return cls._parry_masks
+
+    @classmethod
+    def get_follow_up_masks(cls) -> Tuple[int, ...]:
+        """Per defense ordinal, a bitmask of its riposte actions"""
+        if cls._follow_up_masks is None:
+            defenses = cls.get_all_defenses()
+            cls._follow_up_masks = tuple(
+                sum(1 << ACTION_ORDINALS[action_type]
+                    for action_type in defenses[defense_type].follow_up_actions)
+                if defense_type in defenses else 0
+                for defense_type in DefenseType)
+        return cls._follow_up_masks
+
     @staticmethod
-    def get_all_defenses() -> Dict[DefenseType, DefenseProperties]:
+    def _build_defenses() -> Dict[DefenseType, DefenseProperties]:
         defenses = {}
 
         # Simple Parries
@@ -483,8 +584,54 @@ class DefenseDatabase:
 class DistanceManager:
     """Manages distance relationships and valid actions"""
 
+    _properties: Optional[Mapping[DistanceType, Mapping]] = None
+    _candidates: Optional[Mapping[DistanceType, Tuple[ActionType, ...]]] = None
+    _action_masks: Optional[Tuple[int, ...]] = None
+
+    @classmethod
+    def get_distance_properties(cls) -> Mapping[DistanceType, Mapping]:
+        """Returns the shared read-only distance table, built on first use"""
+        if cls._properties is None:
+            cls._properties = MappingProxyType({
+                distance: MappingProxyType({
+                    key: frozenset(value) if isinstance(value, set) else value
+                    for key, value in properties.items()
+                })
+                for distance, properties in
+                cls._build_distance_properties().items()
+            })
+        return cls._properties
+
+    @classmethod
+    def get_candidate_actions(
+            cls) -> Mapping[DistanceType, Tuple[ActionType, ...]]:
+        """Valid actions per distance that are defined in the ActionDatabase.
+
+        Tuples follow the database order, so iterating them is deterministic
+        across processes (unlike iterating the valid_actions sets).
+        """
+        if cls._candidates is None:
+            actions = ActionDatabase.get_all_actions()
+            properties = cls.get_distance_properties()
+            cls._candidates = MappingProxyType({
+                distance: tuple(
+                    action for action in actions
+                    if action in properties[distance]["valid_actions"])
+                for distance in DistanceType
+            })
+        return cls._candidates
+
+    @classmethod
+    def get_action_masks(cls) -> Tuple[int, ...]:
+        """Per distance ordinal, a bitmask of the candidate actions there"""
+        if cls._action_masks is None:
+            cls._action_masks = tuple(
+                sum(1 << ACTION_ORDINALS[action] for action in actions)
+                for actions in cls.get_candidate_actions().values())
+        return cls._action_masks
+
     @staticmethod
-    def get_distance_properties() -> Dict[DistanceType, Dict]:
+    def _build_distance_properties() -> Dict[DistanceType, Dict]:
         return {
             DistanceType.OUT_OF_DISTANCE: {
                 "range": (3.0, float('inf')),
@@ -541,11 +688,13 @@ class DistanceManager:
 class FencingAction:
     """Represents a specific fencing action being executed"""
 
+    __slots__ = ("action_type", "fencer", "properties", "distance")
+
     def __init__(self, action_type: ActionType, fencer,
                  distance: DistanceType):
         self.action_type = action_type
         self.fencer = fencer
-        self.properties = ActionDatabase.get_all_actions()[action_type]
+        self.properties = fencer.available_actions[action_type]
         self.distance = distance
 
     def can_execute(self) -> bool:
@@ -567,160 +716,667 @@ class FencingAction:
         return min(base_prob, 1.0)
 
 
+@dataclass(frozen=True, slots=True)
+class ActionWeights:
+    """Tactical multipliers applied to an action's weight"""
+    priority: float = 1.2  # action has priority and the fencer lacks it
+    preparation: float = 1.1  # prepared fencer, action needs preparation
+    distance: float = 1.1  # distance allows preparation
+    blade: float = 1.2  # disengage/cut over from quarte or sixte
+
+    def as_tuple(self) -> Tuple[float, float, float, float]:
+        return (self.priority, self.preparation, self.distance, self.blade)
+
+
 class Fencer:
 
-    def __init__(self, name: str, skill_level: float = 0.5):
+    TOP_ACTIONS = 3  # Consider top 3 actions
+    WEIGHT_JITTER = 0.05  # Slightly reduced randomness
+
+    def __init__(self,
+                 name: str,
+                 skill_level: float = 0.5,
+                 weights: Optional[ActionWeights] = None):
+        # Policy table: (distance, opponent blade, own blade, priority,
+        # preparation) -> ranked candidate actions and their base weights
+        self._policy_cache: Dict[tuple, Tuple[Tuple[ActionType, ...],
+                                              Tuple[float, ...]]] = {}
+        # Defense policy under None, ripostes under (defense, distance, ...)
+        self._defense_cache: Dict[Optional[tuple], object] = {}
+
         self.name = name
         self.skill_level = skill_level
+        self.weights = ActionWeights() if weights is None else weights
         self.score = 0
         self.blade_position = BladePosition.SIXTE
         self.has_preparation = False
         self.has_priority = False
 
-        # Load action and defense databases
+        # Shared, read-only action and defense tables
         self.available_actions = ActionDatabase.get_all_actions()
         self.available_defenses = DefenseDatabase.get_all_defenses()
         self.distance_properties = DistanceManager.get_distance_properties()
 
-    def choose_action(
-            self, distance: DistanceType,
-            opponent_blade: BladePosition) -> Optional[FencingAction]:
-        # Get valid actions for current distance from DistanceManager
-        distance_props = self.distance_properties[distance]
-        valid_action_types = distance_props["valid_actions"]
+    @property
+    def skill_level(self) -> float:
+        return self._skill_level
+
+    @skill_level.setter
+    def skill_level(self, value: float):
+        # At zero skill every weight is zero and no action is ever chosen,
+        # so a bout between such fencers would never end
+        if not value > 0:
+            raise ValueError("skill_level must be positive")
+        # Every cached weight scales with skill
+        self._skill_level = value
+        self._policy_cache.clear()
+        self._defense_cache.clear()
+
+    @property
+    def weights(self) -> ActionWeights:
+        return self._weights
+
+    @weights.setter
+    def weights(self, value: ActionWeights):
+        # Cached policies were ranked with the old multipliers
+        self._weights = value
+        self._policy_cache.clear()
+        self._defense_cache.clear()
+
+    def reset(self):
+        """Restores the per-bout state so the fencer can start a new bout"""
+        self.score = 0
+        self.blade_position = BladePosition.SIXTE
+        self.has_preparation = False
+        self.has_priority = False
 
-        if not valid_action_types:
-            return None
+    def get_state(self) -> Tuple[int, BladePosition, bool, bool]:
+        """Per-bout state: score, blade position, preparation, priority"""
+        return (self.score, self.blade_position, self.has_preparation,
+                self.has_priority)
+
+    def set_state(self, state: Tuple[int, BladePosition, bool, bool]):
+        (self.score, self.blade_position, self.has_preparation,
+         self.has_priority) = state
 
-        # Weight each action based on situation
+    def choose_action(
+            self,
+            distance: DistanceType,
+            opponent_blade: BladePosition,
+            rng: Optional[random.Random] = None) -> Optional[FencingAction]:
+        # Draws come from the bout's generator, or the module one by default
+        rng = random if rng is None else rng
+        action_types, weights = self._get_policy(distance, opponent_blade)
+
+        if not action_types:
+            return None
+        return FencingAction(self._sample(action_types, weights, rng), self,
+                             distance)
+
+    def _sample(self, options: Sequence, weights: Sequence[float],
+                rng) -> object:
+        """Draws one of a policy's options.
+
+        Adds some randomness to the weights, then chooses randomly from the
+        top TOP_ACTIONS options based on weights.
+        """
+        jittered = [
+            weight * rng.uniform(1 - self.WEIGHT_JITTER,
+                                 1 + self.WEIGHT_JITTER) for weight in weights
+        ]
+        if len(options) > self.TOP_ACTIONS:
+            ranked = sorted(zip(jittered, options),
+                            key=itemgetter(0),
+                            reverse=True)[:self.TOP_ACTIONS]
+            jittered = [weight for weight, _ in ranked]
+            options = [option for _, option in ranked]
+        return rng.choices(options, weights=jittered, k=1)[0]
+
+    @classmethod
+    def _rank(cls, weighted: List[Tuple[float, object]]) -> Tuple[tuple,
+                                                                   tuple]:
+        """Compiles (weight, option) pairs into a policy for _sample.
+
+        Only options that can still reach the top TOP_ACTIONS once the
+        jitter is applied are kept, so sampling from the result matches
+        weighing every option.
+        """
+        # Sort on the weight alone; ties must not fall through to the options
+        weighted = sorted(weighted, key=itemgetter(0), reverse=True)
+        if len(weighted) > cls.TOP_ACTIONS:
+            cutoff = weighted[cls.TOP_ACTIONS - 1][0] * (
+                (1 - cls.WEIGHT_JITTER) / (1 + cls.WEIGHT_JITTER))
+            weighted = [entry for entry in weighted if entry[0] >= cutoff]
+        return (tuple(option for _, option in weighted),
+                tuple(weight for weight, _ in weighted))
+
+    def _get_policy(
+        self, distance: DistanceType, opponent_blade: BladePosition
+    ) -> Tuple[Tuple[ActionType, ...], Tuple[float, ...]]:
+        # Flags and blades are part of the key; skill changes clear the table
+        key = (distance, opponent_blade, self.blade_position,
+               self.has_priority, self.has_preparation)
+        policy = self._policy_cache.get(key)
+        if policy is None:
+            policy = self._compile_policy(distance, opponent_blade)
+            self._policy_cache[key] = policy
+        return policy
+
+    def choose_defense(
+            self,
+            rng: Optional[random.Random] = None) -> Optional[DefenseType]:
+        """Picks a parry the same way choose_action picks an action"""
+        rng = random if rng is None else rng
+        defense_types, weights = self._get_defense_policy()
+        if not defense_types:
+            return None
+        return self._sample(defense_types, weights, rng)
+
+    def get_parry_probability(self, defense_type: DefenseType) -> float:
+        return min(
+            self.available_defenses[defense_type].base_success_rate *
+            self.skill_level, 1.0)
+
+    def choose_riposte(self, defense_type: DefenseType, distance: DistanceType,
+                       opponent_blade: BladePosition
+                       ) -> Optional[FencingAction]:
+        """Best follow-up of a successful parry that can be executed here"""
+        key = (defense_type, distance, opponent_blade, self.blade_position,
+               self.has_priority, self.has_preparation)
+        riposte = self._defense_cache.get(key, False)
+        if riposte is False:
+            riposte = None
+            best = 0.0
+            options = (DefenseDatabase.get_follow_up_masks()[
+                DEFENSE_ORDINALS[defense_type]] &
+                       DistanceManager.get_action_masks()[
+                           DISTANCE_ORDINALS[distance]])
+            for action_type in DistanceManager.get_candidate_actions(
+            )[distance]:
+                if not options >> ACTION_ORDINALS[action_type] & 1:
+                    continue
+                action = FencingAction(action_type, self, distance)
+                probability = action.get_success_probability(opponent_blade)
+                if action.can_execute() and probability > best:
+                    riposte, best = action_type, probability
+            self._defense_cache[key] = riposte
+        return None if riposte is None else FencingAction(
+            riposte, self, distance)
+
+    def _get_defense_policy(
+            self) -> Tuple[Tuple[DefenseType, ...], Tuple[float, ...]]:
+        policy = self._defense_cache.get(None)
+        if policy is None:
+            policy = self._rank([(self.get_parry_probability(defense_type),
+                                  defense_type)
+                                 for defense_type in self.available_defenses])
+            self._defense_cache[None] = policy
+        return policy
+
+    def _compile_policy(
+        self, distance: DistanceType, opponent_blade: BladePosition
+    ) -> Tuple[Tuple[ActionType, ...], Tuple[float, ...]]:
+        """Ranks the executable actions by base weight (see _rank)"""
         weighted_actions = []
-        for action_type in valid_action_types:
-            # Get properties for this action
+        for action_type in DistanceManager.get_candidate_actions()[distance]:
             if action_type not in self.available_actions:
                 continue
 
             action = FencingAction(action_type, self, distance)
             if action.can_execute():
                 success_prob = action.get_success_probability(opponent_blade)
-                weight = self._calculate_action_weight(action, success_prob)
-                weighted_actions.append((weight, action))
-
-        if not weighted_actions:
-            return None
-
-        # Sort by weight and add some randomness to selection
-        weighted_actions.sort(reverse=True)
-        top_actions = weighted_actions[:3]  # Consider top 3 actions
-        weights = [w for w, _ in top_actions]
-        actions = [a for _, a in top_actions]
-
-        # Choose randomly from top actions based on weights
-        if actions:
-            total_weight = sum(weights)
-            normalized_weights = [w / total_weight for w in weights]
-            chosen_action = random.choices(actions,
-                                           weights=normalized_weights,
-                                           k=1)[0]
-            return chosen_action
-
-        return None
-
-    def _calculate_action_weight(self, action: FencingAction,
-                                 base_probability: float) -> float:
+                weight = self._base_action_weight(action, success_prob)
+                if weight > 0:
+                    weighted_actions.append((weight, action_type))
+        return self._rank(weighted_actions)
+
+    def _calculate_action_weight(
+            self,
+            action: FencingAction,
+            base_probability: float,
+            rng: Optional[random.Random] = None) -> float:
+        rng = random if rng is None else rng
+        return self._base_action_weight(action, base_probability) * rng.uniform(
+            1 - self.WEIGHT_JITTER, 1 + self.WEIGHT_JITTER)
+
+    def _base_action_weight(self, action: FencingAction,
+                            base_probability: float) -> float:
+        """Tactical weight of an action before the random jitter"""
         weight = base_probability
+        multipliers = self._weights
 
         # Consider tactical factors
         if not self.has_priority and action.properties.priority:
-            weight *= 1.2
+            weight *= multipliers.priority
         if self.has_preparation and action.properties.preparation_required:
-            weight *= 1.1
+            weight *= multipliers.preparation
 
         # Add distance considerations
         if self.distance_properties[action.distance]["preparation_allowed"]:
-            weight *= 1.1
+            weight *= multipliers.distance
 
         # Add blade position considerations
         if action.action_type in [ActionType.DISENGAGE, ActionType.CUT_OVER] and \
            self.blade_position in [BladePosition.QUARTE, BladePosition.SIXTE]:
-            weight *= 1.2
+            weight *= multipliers.blade
+
+        return weight
+
+
+# Bout events. Fencers are identified by number (1 or 2) so events stay
+# compact and serializable; sinks get the bout alongside each event for names.
+@dataclass(frozen=True, slots=True)
+class BoutStarted:
+    points_to_win: int
+
+
+@dataclass(frozen=True, slots=True)
+class RoundStarted:
+    round: int
+    fencer: int
 
-        return weight * random.uniform(0.95,
-                                       1.05)  # Slightly reduced randomness
+
+@dataclass(frozen=True, slots=True)
+class DistanceChanged:
+    round: int
+    old_distance: DistanceType
+    new_distance: DistanceType
+
+
+@dataclass(frozen=True, slots=True)
+class ActionChosen:
+    round: int
+    fencer: int
+    action_type: Optional[ActionType]  # None if no valid action
+    distance: DistanceType
+
+
+@dataclass(frozen=True, slots=True)
+class ActionRolled:
+    round: int
+    fencer: int
+    action_type: ActionType
+    probability: float
+    roll: float
+    success: bool  # the touch landed: the roll hit and was not parried
+    parried: bool = False  # the roll hit but the defender parried it
+
+
+@dataclass(frozen=True, slots=True)
+class ParryAttempted:
+    round: int
+    fencer: int  # the defender
+    defense_type: DefenseType
+    probability: float
+    roll: float
+    success: bool
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreChanged:
+    round: int
+    fencer: int
+    score1: int
+    score2: int
+
+
+@dataclass(frozen=True, slots=True)
+class RoundCompleted:
+    round: int
+    distance: DistanceType
+    score1: int
+    score2: int
+
+
+@dataclass(frozen=True, slots=True)
+class BoutCompleted:
+    rounds: int
+    winner: int
+    score1: int
+    score2: int
+
+
+@dataclass(frozen=True)
+class BoutSnapshot:
+    """Bout state between two rounds, including the generator state"""
+    rounds: int
+    distance: DistanceType
+    current: int  # fencer on turn, 1 or 2
+    fencers: Tuple[Tuple[int, BladePosition, bool, bool], ...]
+    action_attempts: Tuple[Tuple[ActionType, int], ...]
+    action_successes: Tuple[Tuple[ActionType, int], ...]
+    rng_state: tuple  # states of the bout's streams
+
+
+class AntitheticRandom(random.Random):
+    """Generator whose uniforms mirror those of random.Random(seed).
+
+    Only random() is mirrored. Every draw of a bout is a uniform (the jitter,
+    weighted picks, rolls and distance moves), so the k-th draw of a stream
+    is the antithetic partner of the k-th draw of the plain stream. Integer
+    draws such as choice() are not paired: random.Random takes them from
+    getrandbits, which consumes the state differently.
+    """
+
+    def random(self) -> float:
+        return 1.0 - super().random()
+
+
+class BoutStreams:
+    """Separate named generators for the three kinds of draws in a bout.
+
+    ``distance`` drives _update_distance, ``choice`` the action jitter and
+    pick, and ``roll`` the success roll. Keeping them apart means two bout
+    variants fed the same streams see the same distance path and rolls even
+    when their action choices consume different numbers of draws.
+    """
+    __slots__ = ("distance", "choice", "roll")
+
+    NAMES = ("distance", "choice", "roll")
+
+    def __init__(self, distance, choice, roll):
+        self.distance = distance
+        self.choice = choice
+        self.roll = roll
+
+    @classmethod
+    def shared(cls, rng) -> "BoutStreams":
+        """All draws from one generator, in the order of the original loop"""
+        return cls(rng, rng, rng)
+
+    @classmethod
+    def from_seed(cls, seed: int, antithetic: bool = False) -> "BoutStreams":
+        generator = AntitheticRandom if antithetic else random.Random
+        return cls(*(generator(derive_seed(seed, name)) for name in cls.NAMES))
+
+    def getstate(self) -> tuple:
+        return tuple(stream.getstate() for stream in
+                     (self.distance, self.choice, self.roll))
+
+    def setstate(self, state: tuple):
+        for stream, stream_state in zip(
+            (self.distance, self.choice, self.roll), state):
+            stream.setstate(stream_state)
+
+
+class EventSink:
+    """Consumes the events emitted by a FencingBout"""
+
+    def handle(self, bout: "FencingBout", event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ConsoleSink(EventSink):
+    """Prints the plain-text bout log of FencingBout"""
+
+    def handle(self, bout: "FencingBout", event):
+        fencer = bout.fencer1 if getattr(event, "fencer",
+                                         1) == 1 else bout.fencer2
+
+        if isinstance(event, ActionChosen):
+            if event.action_type is None:
+                print(
+                    f"{fencer.name} unable to find valid action at {event.distance.value}"
+                )
+            else:
+                print(f"{fencer.name} attempts {event.action_type.value}")
+        elif isinstance(event, ActionRolled):
+            status = ("scores" if event.success else
+                      "is parried" if event.parried else "misses")
+            print(
+                f"Success Probability: {event.probability:.2f}, Roll: {event.roll:.2f}"
+            )
+            print(f"{fencer.name} {status} with {event.action_type.value}")
+        elif isinstance(event, ParryAttempted):
+            status = "parries" if event.success else "fails to parry"
+            print(f"{fencer.name} {status} with {event.defense_type.value}")
+        elif isinstance(event, ScoreChanged):
+            # Emitted once the touch is counted, so the score is current
+            print(
+                f"Current Score: {bout.fencer1.name} {event.score1} - {bout.fencer2.name} {event.score2}"
+            )
+        elif isinstance(event, RoundCompleted):
+            print('-' * 40)
+            print(f"\nRound {event.round}")
+            print(f"Distance: {event.distance.value}")
+            print(
+                f"{bout.fencer1.name} {event.score1} - {bout.fencer2.name} {event.score2}"
+            )
+        elif isinstance(event, BoutCompleted):
+            winner = bout.fencer1 if event.winner == 1 else bout.fencer2
+            print(f"\n{'='*40}")
+            print(
+                f"The winner is {winner.name} with a score of {winner.score}")
+            print(f"Bout completed in {event.rounds} rounds")
+            print(f"{'='*40}")
 
 
 class FencingBout:
 
-    def __init__(self, fencer1: Fencer, fencer2: Fencer):
+    # Possible distance transitions
+    DISTANCE_TRANSITIONS = {
+        DistanceType.OUT_OF_DISTANCE: [DistanceType.LONG],
+        DistanceType.LONG: [DistanceType.OUT_OF_DISTANCE, DistanceType.MEDIUM],
+        DistanceType.MEDIUM: [DistanceType.LONG, DistanceType.LUNGE],
+        DistanceType.LUNGE: [DistanceType.MEDIUM, DistanceType.SHORT],
+        DistanceType.SHORT: [DistanceType.LUNGE, DistanceType.INFIGHTING],
+        DistanceType.INFIGHTING: [DistanceType.SHORT]
+    }
+
+    # Chance to change distance each round
+    DISTANCE_CHANGE_PROBABILITY = 0.3
+
+    # Success probability modifiers per distance
+    DISTANCE_MODIFIERS = {
+        DistanceType.OUT_OF_DISTANCE: 0.1,
+        DistanceType.LONG: 0.5,
+        DistanceType.MEDIUM: 1.0,
+        DistanceType.LUNGE: 0.9,
+        DistanceType.SHORT: 0.8,
+        DistanceType.INFIGHTING: 0.7
+    }
+
+    def __init__(self,
+                 fencer1: Fencer,
+                 fencer2: Fencer,
+                 points_to_win: int = 5,
+                 sinks: Optional[List[EventSink]] = None,
+                 rng: Optional[random.Random] = None,
+                 streams: Optional[BoutStreams] = None,
+                 defenses: bool = False):
         self.fencer1 = fencer1
         self.fencer2 = fencer2
         self.distance = DistanceType.MEDIUM  # Start at medium distance instead of out of distance
         self.current_fencer = fencer1
         self.opponent_fencer = fencer2
         self.rounds = 0
+        self.points_to_win = points_to_win
+        self.action_attempts: Dict[ActionType, int] = {}
+        self.action_successes: Dict[ActionType, int] = {}
+
+        # Event consumers; the plain bout prints its log to the console
+        self.sinks = [ConsoleSink()] if sinks is None else list(sinks)
+
+        # Every draw of the bout comes from these streams, so a bout is
+        # reproducible from its seed. A single rng (or, by default, the
+        # module generator) backs all three streams.
+        if streams is None:
+            streams = BoutStreams.shared(random if rng is None else rng)
+        self.streams = streams
+
+        # Defense phase: the defender may parry a landing attack and riposte
+        self.defenses = defenses
+
+    def simulate_bout(self) -> "BoutResult":
+        if self.sinks:
+            self._emit(BoutStarted(self.points_to_win))
 
-    def simulate_bout(self):
-        while self.fencer1.score < 5 and self.fencer2.score < 5:  # Changed to 5 points for quicker bouts
+        while self.fencer1.score < self.points_to_win and self.fencer2.score < self.points_to_win:
             self.simulate_round()
-            self.rounds += 1
-            print(f"\nRound {self.rounds}")
-            print(f"Distance: {self.distance.value}")
-            print(
-                f"{self.fencer1.name} {self.fencer1.score} - {self.fencer2.name} {self.fencer2.score}"
-            )
 
-        winner = self.fencer1 if self.fencer1.score >= 5 else self.fencer2
-        print(f"\n{'='*40}")
-        print(f"The winner is {winner.name} with a score of {winner.score}")
-        print(f"Bout completed in {self.rounds} rounds")
-        print(f"{'='*40}")
+        result = BoutResult(
+            winner=1 if self.fencer1.score >= self.points_to_win else 2,
+            score=(self.fencer1.score, self.fencer2.score),
+            rounds=self.rounds,
+            action_attempts=self.action_attempts,
+            action_successes=self.action_successes)
+
+        if self.sinks:
+            self._emit(
+                BoutCompleted(self.rounds, result.winner, *result.score))
+        return result
 
     def simulate_round(self):
+        # Events are only built when someone is listening
+        emit = self._emit if self.sinks else None
+        self.rounds += 1
+        fencer = 1 if self.current_fencer is self.fencer1 else 2
+        if emit:
+            emit(RoundStarted(self.rounds, fencer))
+
         # Update distance randomly based on current state
+        old_distance = self.distance
         self._update_distance()
+        if emit and self.distance != old_distance:
+            emit(DistanceChanged(self.rounds, old_distance, self.distance))
 
         # Get action from current fencer
         action = self.current_fencer.choose_action(
-            self.distance, self.opponent_fencer.blade_position)
+            self.distance, self.opponent_fencer.blade_position,
+            self.streams.choice)
+        if emit:
+            emit(
+                ActionChosen(self.rounds, fencer,
+                             action.action_type if action else None,
+                             self.distance))
 
         if action:
             # Calculate success probability with distance modifier
             success_prob = self._calculate_modified_success_probability(action)
-            roll = random.random()
-
-            print(
-                f"{self.current_fencer.name} attempts {action.action_type.value}"
-            )
-            print(f"Success Probability: {success_prob:.2f}, Roll: {roll:.2f}")
+            roll = self.streams.roll.random()
+            success = roll <= success_prob
 
-            if roll <= success_prob:
-                self.current_fencer.score += 1
-                self.log_action(success=True, action=action)
-            else:
-                self.log_action(success=False, action=action)
-        else:
-            print(
-                f"{self.current_fencer.name} unable to find valid action at {self.distance.value}"
-            )
+            action_type = action.action_type
+            self._count_attempt(action_type)
+            # A landing attack can still be parried; the roll is reported
+            # once the parry is decided, so its outcome is the real one
+            parry = None
+            if success and self.defenses:
+                parry = self._parry(action, 3 - fencer)
+            parried = parry is not None and parry.success
+            if emit:
+                emit(
+                    ActionRolled(self.rounds, fencer, action_type,
+                                 success_prob, roll, success and not parried,
+                                 parried))
+                if parry is not None:
+                    emit(parry)
+
+            if parried:
+                # A successful parry is answered with a riposte
+                self._riposte(parry.defense_type, 3 - fencer, emit)
+            elif success:
+                self._score(self.current_fencer, fencer, action_type, emit)
+
+        if emit:
+            emit(
+                RoundCompleted(self.rounds, self.distance, self.fencer1.score,
+                               self.fencer2.score))
 
         # Swap fencers
         self.current_fencer, self.opponent_fencer = self.opponent_fencer, self.current_fencer
 
-    def _update_distance(self):
-        # Define possible distance transitions
-        distance_transitions = {
-            DistanceType.OUT_OF_DISTANCE: [DistanceType.LONG],
-            DistanceType.LONG:
-            [DistanceType.OUT_OF_DISTANCE, DistanceType.MEDIUM],
-            DistanceType.MEDIUM: [DistanceType.LONG, DistanceType.LUNGE],
-            DistanceType.LUNGE: [DistanceType.MEDIUM, DistanceType.SHORT],
-            DistanceType.SHORT: [DistanceType.LUNGE, DistanceType.INFIGHTING],
-            DistanceType.INFIGHTING: [DistanceType.SHORT]
-        }
+    def _emit(self, event):
+        for sink in self.sinks:
+            sink.handle(self, event)
+
+    def _count_attempt(self, action_type: ActionType):
+        self.action_attempts[action_type] = self.action_attempts.get(
+            action_type, 0) + 1
+
+    def _score(self, scorer: Fencer, fencer: int, action_type: ActionType,
+               emit):
+        scorer.score += 1
+        self.action_successes[action_type] = self.action_successes.get(
+            action_type, 0) + 1
+        if emit:
+            emit(
+                ScoreChanged(self.rounds, fencer, self.fencer1.score,
+                             self.fencer2.score))
+
+    def _parry(self, attack: FencingAction,
+               defender: int) -> Optional[ParryAttempted]:
+        """Defense against an attack that would otherwise land.
+
+        Returns the parry attempt, or None if the chosen defense cannot
+        parry the attack.
+        """
+        defending = self.opponent_fencer
+        defense_type = defending.choose_defense(self.streams.choice)
+        if defense_type is None or not DefenseDatabase.get_parry_masks()[
+                ACTION_ORDINALS[attack.action_type]] >> DEFENSE_ORDINALS[
+                    defense_type] & 1:
+            return None
+        probability = defending.get_parry_probability(defense_type)
+        roll = self.streams.roll.random()
+        return ParryAttempted(self.rounds, defender, defense_type,
+                              probability, roll, roll <= probability)
+
+    def _riposte(self, defense_type: DefenseType, defender: int, emit):
+        """Follow-up of a successful parry, which scores for the defender"""
+        attacking, defending = self.current_fencer, self.opponent_fencer
+        riposte = defending.choose_riposte(defense_type, self.distance,
+                                           attacking.blade_position)
+        if riposte is None:
+            return
+        probability = min(
+            riposte.get_success_probability(attacking.blade_position) *
+            self.DISTANCE_MODIFIERS[self.distance], 1.0)
+        roll = self.streams.roll.random()
+        self._count_attempt(riposte.action_type)
+        if emit:
+            emit(
+                ActionRolled(self.rounds, defender, riposte.action_type,
+                             probability, roll, roll <= probability))
+        if roll <= probability:
+            self._score(defending, defender, riposte.action_type, emit)
+
+    def snapshot(self) -> "BoutSnapshot":
+        """Captures everything needed to continue the bout identically"""
+        return BoutSnapshot(
+            rounds=self.rounds,
+            distance=self.distance,
+            current=1 if self.current_fencer is self.fencer1 else 2,
+            fencers=(self.fencer1.get_state(), self.fencer2.get_state()),
+            action_attempts=tuple(self.action_attempts.items()),
+            action_successes=tuple(self.action_successes.items()),
+            rng_state=self.streams.getstate())
+
+    def restore(self, snapshot: "BoutSnapshot"):
+        self.rounds = snapshot.rounds
+        self.distance = snapshot.distance
+        if snapshot.current == 1:
+            self.current_fencer, self.opponent_fencer = self.fencer1, self.fencer2
+        else:
+            self.current_fencer, self.opponent_fencer = self.fencer2, self.fencer1
+        self.fencer1.set_state(snapshot.fencers[0])
+        self.fencer2.set_state(snapshot.fencers[1])
+        self.action_attempts = dict(snapshot.action_attempts)
+        self.action_successes = dict(snapshot.action_successes)
+        self.streams.setstate(snapshot.rng_state)
 
+    def _update_distance(self):
         # 30% chance to change distance each round
-        if random.random() < 0.3:
-            possible_distances = distance_transitions[self.distance]
-            self.distance = random.choice(possible_distances)
+        rng = self.streams.distance
+        if rng.random() < self.DISTANCE_CHANGE_PROBABILITY:
+            possible_distances = self.DISTANCE_TRANSITIONS[self.distance]
+            # Not rng.choice, which draws integer bits rather than a uniform
+            # and would put AntitheticRandom streams out of step
+            self.distance = possible_distances[int(
+                rng.random() * len(possible_distances))]
 
     def _calculate_modified_success_probability(
             self, action: FencingAction) -> float:
@@ -728,26 +1384,15 @@ class FencingBout:
             self.opponent_fencer.blade_position)
 
         # Modify based on distance
-        distance_modifiers = {
-            DistanceType.OUT_OF_DISTANCE: 0.1,
-            DistanceType.LONG: 0.5,
-            DistanceType.MEDIUM: 1.0,
-            DistanceType.LUNGE: 0.9,
-            DistanceType.SHORT: 0.8,
-            DistanceType.INFIGHTING: 0.7
-        }
+        return min(base_prob * self.DISTANCE_MODIFIERS[self.distance], 1.0)
 
-        return min(base_prob * distance_modifiers[self.distance], 1.0)
 
-    def log_action(self, success: bool, action: FencingAction):
-        status = "scores" if success else "misses"
-        print(
-            f"{self.current_fencer.name} {status} with {action.action_type.value}"
-        )
-        print(
-            f"Current Score: {self.fencer1.name} {self.fencer1.score} - {self.fencer2.name} {self.fencer2.score}"
-        )
-        print('-' * 40)
+class LogEntry(NamedTuple):
+    time: float
+    fencer: str
+    action_type: ActionType
+    success: bool
+    probability: float
 
 
 class BoutPresenter:
@@ -774,7 +1419,7 @@ class BoutPresenter:
 
     def __init__(self):
         init()  # Initialize colorama
-        self.bout_log = []
+        self.bout_log: List[LogEntry] = []
         self._clear_screen()
 
     def _clear_screen(self):
@@ -841,27 +1486,21 @@ class BoutPresenter:
         )
         print(f"{self.COLORS['reset']}")
 
-    def show_action(self, fencer: Fencer, action: FencingAction, success: bool,
-                    probability: float, roll: float):
+    def show_action(self, fencer: Fencer, action_type: ActionType,
+                    success: bool, probability: float, roll: float):
         """Displays the current action and its result"""
         result_color = self.COLORS['success'] if success else self.COLORS[
             'failure']
         result_text = "SCORES!" if success else "MISSES..."
 
-        print(
-            f"{self.COLORS['info']}{fencer.name} attempts {action.action_type.value}"
-        )
+        print(f"{self.COLORS['info']}{fencer.name} attempts {action_type.value}")
         print(f"Probability: {probability:.2f} | Roll: {roll:.2f}")
         print(f"{result_color}{result_text}{self.COLORS['reset']}")
 
-        # Add to bout log
-        self.bout_log.append({
-            'time': datetime.now().strftime("%H:%M:%S"),
-            'fencer': fencer.name,
-            'action': action.action_type.value,
-            'success': success,
-            'probability': probability
-        })
+        # Add to bout log; formatting is left to the summary
+        self.bout_log.append(
+            LogEntry(time.time(), fencer.name, action_type, success,
+                     probability))
 
     def show_distance_change(self, old_distance: DistanceType,
                              new_distance: DistanceType):
@@ -884,14 +1523,13 @@ class BoutPresenter:
 
         # Calculate statistics
         action_counts = {}
-        success_rates = {}
 
         for entry in self.bout_log:
-            action = entry['action']
+            action = entry.action_type
             if action not in action_counts:
                 action_counts[action] = {'total': 0, 'success': 0}
             action_counts[action]['total'] += 1
-            if entry['success']:
+            if entry.success:
                 action_counts[action]['success'] += 1
 
         print(
@@ -900,12 +1538,65 @@ class BoutPresenter:
         for action, counts in action_counts.items():
             success_rate = (counts['success'] / counts['total']) * 100
             print(
-                f"{action:20}: {counts['success']}/{counts['total']} ({success_rate:.1f}% success)"
+                f"{action.value:20}: {counts['success']}/{counts['total']} ({success_rate:.1f}% success)"
             )
 
         print(f"{self.COLORS['reset']}\n{'='*60}")
 
 
+class PresenterSink(EventSink):
+    """Drives a BoutPresenter from bout events, paced for a human viewer"""
+
+    def __init__(self,
+                 presenter: Optional[BoutPresenter] = None,
+                 pace: bool = True):
+        self.presenter = presenter or BoutPresenter()
+        self.pace = pace
+        self.start_time = time.time()
+
+    def _pause(self, seconds: float):
+        if self.pace:
+            time.sleep(seconds)
+
+    def handle(self, bout: FencingBout, event):
+        presenter = self.presenter
+
+        if isinstance(event, BoutStarted):
+            presenter.show_bout_header(bout.fencer1, bout.fencer2,
+                                       event.points_to_win)
+            self._pause(2)
+        elif isinstance(event, RoundStarted):
+            presenter._clear_screen()
+        elif isinstance(event, DistanceChanged):
+            presenter.show_distance_change(event.old_distance,
+                                           event.new_distance)
+        elif isinstance(event, ActionChosen):
+            presenter.draw_piste(event.distance, bout.current_fencer.name,
+                                 bout.opponent_fencer.name)
+            if event.action_type is None:
+                print(f"{bout.current_fencer.name} repositioning...")
+                self._pause(0.5)
+        elif isinstance(event, ActionRolled):
+            # A riposte is rolled by the defender, not the fencer on turn
+            fencer = bout.fencer1 if event.fencer == 1 else bout.fencer2
+            presenter.show_action(fencer, event.action_type,
+                                  event.success, event.probability,
+                                  event.roll)
+            self._pause(1)
+        elif isinstance(event, ParryAttempted):
+            defender = bout.fencer1 if event.fencer == 1 else bout.fencer2
+            status = "parries" if event.success else "fails to parry"
+            print(f"{defender.name} {status} with {event.defense_type.value}")
+            self._pause(0.5)
+        elif isinstance(event, RoundCompleted):
+            presenter.show_score(bout.fencer1, bout.fencer2)
+            self._pause(1)
+        elif isinstance(event, BoutCompleted):
+            winner = bout.fencer1 if event.winner == 1 else bout.fencer2
+            duration = time.time() - self.start_time
+            presenter.show_bout_summary(winner, event.rounds, duration)
+
+
 class EnhancedFencingBout(FencingBout):
     """Enhanced version of FencingBout with better presentation"""
 
@@ -913,55 +1604,111 @@ class EnhancedFencingBout(FencingBout):
                  fencer1: Fencer,
                  fencer2: Fencer,
                  points_to_win: int = 5):
-        super().__init__(fencer1, fencer2)
-        self.points_to_win = points_to_win
         self.presenter = BoutPresenter()
+        super().__init__(fencer1,
+                         fencer2,
+                         points_to_win,
+                         sinks=[PresenterSink(self.presenter)])
         self.start_time = time.time()
 
-    def simulate_bout(self):
-        self.presenter.show_bout_header(self.fencer1, self.fencer2,
-                                        self.points_to_win)
-        time.sleep(2)
-
-        while self.fencer1.score < self.points_to_win and self.fencer2.score < self.points_to_win:
-            self.presenter._clear_screen()
-            self.simulate_round()
-            self.presenter.show_score(self.fencer1, self.fencer2)
-            time.sleep(1)
 
-        winner = self.fencer1 if self.fencer1.score >= self.points_to_win else self.fencer2
-        duration = time.time() - self.start_time
-        self.presenter.show_bout_summary(winner, self.rounds, duration)
-
-    def simulate_round(self):
-        old_distance = self.distance
-        self._update_distance()
-        self.presenter.show_distance_change(old_distance, self.distance)
-
-        self.presenter.draw_piste(self.distance, self.current_fencer.name,
-                                  self.opponent_fencer.name)
+@dataclass
+class BoutResult:
+    """Compact outcome of a bout"""
+    winner: int  # 1 or 2
+    score: Tuple[int, int]
+    rounds: int
+    action_attempts: Dict[ActionType, int]
+    action_successes: Dict[ActionType, int]
+    seed: Optional[int] = None  # per-bout seed of a replayable simulate_many
 
-        action = self.current_fencer.choose_action(
-            self.distance, self.opponent_fencer.blade_position)
 
-        if action:
-            success_prob = self._calculate_modified_success_probability(action)
-            roll = random.random()
+class HeadlessBout(FencingBout):
+    """Runs the same rules as FencingBout without any printing or sleeping.
 
-            success = roll <= success_prob
-            self.presenter.show_action(self.current_fencer, action, success,
-                                       success_prob, roll)
+    Events are only produced for the sinks passed in explicitly.
+    """
 
-            if success:
-                self.current_fencer.score += 1
+    def __init__(self,
+                 fencer1: Fencer,
+                 fencer2: Fencer,
+                 points_to_win: int = 5,
+                 sinks: Sequence[EventSink] = (),
+                 rng: Optional[random.Random] = None,
+                 streams: Optional[BoutStreams] = None,
+                 defenses: bool = False):
+        super().__init__(fencer1, fencer2, points_to_win, list(sinks), rng,
+                         streams, defenses)
 
-            time.sleep(1)
-        else:
-            print(f"{self.current_fencer.name} repositioning...")
-            time.sleep(0.5)
 
-        self.rounds += 1
-        self.current_fencer, self.opponent_fencer = self.opponent_fencer, self.current_fencer
+@dataclass
+class FencerSpec:
+    """Picklable description of a fencer used to build fresh instances"""
+    name: str
+    skill_level: float = 0.5
+    weights: Optional[ActionWeights] = None
+
+    def build(self) -> Fencer:
+        return Fencer(self.name,
+                      skill_level=self.skill_level,
+                      weights=self.weights)
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """Derives an independent 64-bit seed for a sub-stream (a bout, a pair)"""
+    return random.Random(":".join(map(str, (seed, ) + keys))).getrandbits(64)
+
+
+def simulate_many(n: int,
+                  fencer1_spec: FencerSpec,
+                  fencer2_spec: FencerSpec,
+                  seed: Optional[int] = None,
+                  points_to_win: int = 5,
+                  sinks: Sequence[EventSink] = (),
+                  defenses: bool = False,
+                  replayable: bool = False) -> Sequence[BoutResult]:
+    """Simulates n independent headless bouts between two fencer specs.
+
+    With ``sinks`` or ``replayable`` every bout runs on the per-object
+    engine: bout i runs on its own generator seeded with
+    ``derive_seed(seed, i)``, which is recorded on its result, so any single
+    bout of a batch can be replayed without the rest. Fencers are built once
+    and reset between bouts, and events of every bout go to ``sinks``.
+
+    Otherwise only the outcomes are wanted, and the batch runs on the
+    vectorized engine, which is reproducible for a seed as a whole but
+    records no per-bout seeds. Its results are built as they are accessed.
+
+    Without a seed a random one is drawn. ``defenses`` enables the
+    parry/riposte phase.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+
+    if not sinks and not replayable:
+        # Imported here as the vectorized engine builds on this module
+        from vectorized import BoutResults, VectorizedBoutEngine
+        engine = VectorizedBoutEngine(fencer1_spec.build(),
+                                      fencer2_spec.build(),
+                                      points_to_win,
+                                      defenses=defenses)
+        return BoutResults(
+            engine.run(n, seed, batch_size=50_000, per_bout=True))
+
+    fencer1 = fencer1_spec.build()
+    fencer2 = fencer2_spec.build()
+
+    results = []
+    for index in range(n):
+        fencer1.reset()
+        fencer2.reset()
+        bout_seed = derive_seed(seed, index)
+        result = HeadlessBout(fencer1, fencer2, points_to_win, sinks,
+                              random.Random(bout_seed),
+                              defenses=defenses).simulate_bout()
+        result.seed = bout_seed
+        results.append(result)
+    return results
 
 
 def main():
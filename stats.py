@@ -0,0 +1,143 @@
+"""Streaming statistics over bout events.
+
+Aggregates keep O(1) state per key (count, mean and the Welford sum of
+squared deviations), so they can run over any number of bouts. Two partial
+aggregates merge with the parallel form of Welford's update, which lets
+worker processes report their own aggregates instead of raw event logs.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from sim import (ActionChosen, ActionRolled, ActionType, DistanceType,
+                 EventSink, FencingBout)
+
+# (fencer name, action, distance)
+StatsKey = Tuple[str, ActionType, DistanceType]
+
+
+def wilson_interval(successes: float,
+                    n: float,
+                    z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score interval of a binomial proportion"""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z /
+                               (4 * n * n)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+@dataclass
+class RunningStats:
+    """Count, mean and variance of a stream, updated one value at a time"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0  # sum of squared deviations from the mean
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        """Folds another partial aggregate into this one"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def standard_error(self) -> float:
+        return math.sqrt(self.variance / self.count) if self.count else 0.0
+
+    def confidence_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """Normal-approximation interval of the mean"""
+        half_width = z * self.standard_error
+        return self.mean - half_width, self.mean + half_width
+
+
+class ActionStatistics(EventSink):
+    """Success rates per fencer, action and distance across many bouts.
+
+    Fencers are keyed by name, so statistics of a fencer add up whether it
+    fences as fencer 1 or fencer 2.
+    """
+
+    def __init__(self):
+        self.stats: Dict[StatsKey, RunningStats] = {}
+        self._distance: Optional[DistanceType] = None
+
+    def handle(self, bout: FencingBout, event):
+        # ActionRolled always follows the ActionChosen of the same round
+        if isinstance(event, ActionChosen):
+            self._distance = event.distance
+        elif isinstance(event, ActionRolled):
+            fencer = bout.fencer1 if event.fencer == 1 else bout.fencer2
+            self.add(fencer.name, event.action_type, self._distance,
+                     event.success)
+
+    def add(self, fencer: str, action_type: ActionType,
+            distance: DistanceType, success: bool):
+        key = (fencer, action_type, distance)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = RunningStats()
+        stats.add(1.0 if success else 0.0)
+
+    def merge(self, other: "ActionStatistics") -> "ActionStatistics":
+        for key, stats in other.stats.items():
+            self.stats.setdefault(key, RunningStats()).merge(stats)
+        return self
+
+    @classmethod
+    def merged(cls, parts: Iterable["ActionStatistics"]) -> "ActionStatistics":
+        total = cls()
+        for part in parts:
+            total.merge(part)
+        return total
+
+    def success_rate(self,
+                     fencer: Optional[str] = None,
+                     action_type: Optional[ActionType] = None,
+                     distance: Optional[DistanceType] = None) -> RunningStats:
+        """Merged statistics over every key matching the given fields"""
+        total = RunningStats()
+        for (key_fencer, key_action, key_distance), stats in self.stats.items():
+            if ((fencer is None or key_fencer == fencer)
+                    and (action_type is None or key_action == action_type)
+                    and (distance is None or key_distance == distance)):
+                total.merge(stats)
+        return total
+
+    def confidence_interval(self,
+                            key: StatsKey,
+                            z: float = 1.96) -> Tuple[float, float]:
+        """Wilson interval of the success rate of one key"""
+        stats = self.stats.get(key, RunningStats())
+        return wilson_interval(stats.mean * stats.count, stats.count, z)
+
+    def report(self) -> str:
+        lines = []
+        for (fencer, action_type, distance), stats in sorted(
+                self.stats.items(),
+                key=lambda item: (item[0][0], item[0][1].value,
+                                  item[0][2].value)):
+            low, high = self.confidence_interval(
+                (fencer, action_type, distance))
+            lines.append(f"{fencer:12} {action_type.value:20} "
+                         f"{distance.value:16} {stats.count:>9} "
+                         f"{stats.mean * 100:6.1f}% "
+                         f"[{low * 100:5.1f}, {high * 100:5.1f}]")
+        return "\n".join(lines)
@@ -0,0 +1,259 @@
+"""Parallel win-probability sweeps over skill levels and bout lengths.
+
+A sweep evaluates every (points_to_win, skill 1, skill 2) cell of a grid,
+sharding the cells across a process pool. Each cell result is cached on disk
+under a hash of the model inputs that cell actually depends on: the compiled
+scoring probabilities for the exact solver, or the compiled lookup tables for
+the vectorized engine. Both are derived from the action, defense and distance
+tables, so after a table edit only cells whose inputs changed are recomputed.
+Every key also covers the model constants read outside those tables (distance
+transitions, quadrature, jitter) and CACHE_VERSION, so a change to any of
+them invalidates the whole cache.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from markov import QUADRATURE_NODES, scoring_probabilities, solve_chain
+from sim import Fencer, FencingBout
+from vectorized import VectorizedBoutEngine, estimate_win_probability
+
+# (points index, skill 1 index, skill 2 index)
+Cell = Tuple[int, int, int]
+CellResult = Tuple[Cell, float, float]
+
+
+@dataclass
+class SweepResult:
+    """Dense results of a sweep, indexed (points, skill 1, skill 2)"""
+    skills: np.ndarray
+    points: np.ndarray
+    win_probability: np.ndarray  # P(fencer 1 wins)
+    expected_rounds: np.ndarray  # NaN where the method does not give it
+    computed: int  # cells that missed the cache
+
+    def save(self, path: str):
+        np.savez(path,
+                 skills=self.skills,
+                 points=self.points,
+                 win_probability=self.win_probability,
+                 expected_rounds=self.expected_rounds)
+
+
+class CellCache:
+    """One small JSON file per cell key under a cache directory"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: Dict[str, float]):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers may race on the same key; the rename keeps files whole
+        staging = f"{path}.{os.getpid()}"
+        with open(staging, "w") as f:
+            json.dump(value, f)
+        os.replace(staging, path)
+
+
+# Bump when the solver or the engine changes in a way model_constants() does
+# not capture, to drop every cached cell
+CACHE_VERSION = 2
+
+
+def model_constants() -> tuple:
+    """Model constants the solver and engine read besides the cell's tables"""
+    return (CACHE_VERSION, FencingBout.DISTANCE_TRANSITIONS,
+            FencingBout.DISTANCE_CHANGE_PROBABILITY,
+            FencingBout.DISTANCE_MODIFIERS, QUADRATURE_NODES,
+            Fencer.TOP_ACTIONS, Fencer.WEIGHT_JITTER)
+
+
+def _hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _evaluate(method: str, fencer1: Fencer, fencer2: Fencer,
+              points_to_win: int, target_ci: float, seed: int,
+              cache: Optional[CellCache]) -> Tuple[Dict[str, float], bool]:
+    """Returns the cell value and whether it had to be computed"""
+    if method == "exact":
+        scoring1 = scoring_probabilities(fencer1, fencer2)
+        scoring2 = scoring_probabilities(fencer2, fencer1)
+        key = _hash(model_constants(), method, points_to_win,
+                    scoring1.tobytes(), scoring2.tobytes())
+    else:
+        engine = VectorizedBoutEngine(fencer1, fencer2, points_to_win)
+        key = _hash(model_constants(), method, points_to_win, target_ci,
+                    seed, engine.actions.tobytes(), engine.weights.tobytes(),
+                    engine.success.tobytes(), engine.neighbours.tobytes(),
+                    engine.start_blades)
+
+    value = cache.get(key) if cache else None
+    if value is not None:
+        return value, False
+
+    if method == "exact":
+        probability, rounds = solve_chain(scoring1, scoring2,
+                                          points_to_win).start
+    else:
+        probability = estimate_win_probability(fencer1, fencer2, target_ci,
+                                               points_to_win,
+                                               seed).probability
+        rounds = float("nan")
+    value = {"win_probability": probability, "expected_rounds": rounds}
+    if cache:
+        cache.put(key, value)
+    return value, True
+
+
+def _run_cells(cells: Sequence[Cell], skills: Sequence[float],
+               points: Sequence[int], method: str, target_ci: float,
+               seed: int,
+               cache_dir: Optional[str]) -> Tuple[List[CellResult], int]:
+    cache = CellCache(cache_dir) if cache_dir else None
+    fencers: Dict[Tuple[int, int], Fencer] = {}
+
+    def fencer(position: int, index: int) -> Fencer:
+        # Fencers (and their policy caches) are reused across cells
+        key = (position, index)
+        if key not in fencers:
+            fencers[key] = Fencer(f"Fencer {position}", skills[index])
+        return fencers[key]
+
+    results = []
+    computed = 0
+    for cell in cells:
+        p, i, j = cell
+        value, missed = _evaluate(method, fencer(1, i), fencer(2, j),
+                                  points[p], target_ci, seed, cache)
+        computed += missed
+        results.append(
+            (cell, value["win_probability"], value["expected_rounds"]))
+    return results, computed
+
+
+def run_sweep(skills: Sequence[float],
+              points: Sequence[int] = (5, ),
+              method: str = "exact",
+              cache_dir: Optional[str] = None,
+              workers: Optional[int] = None,
+              chunk_size: Optional[int] = None,
+              target_ci: float = 0.005,
+              seed: int = 0) -> SweepResult:
+    """Evaluates P(fencer 1 wins) for every skill pair and bout length.
+
+    ``method`` is "exact" (Markov solver, also gives expected rounds) or
+    "monte_carlo" (adaptive vectorized estimate to ``target_ci``).
+    ``workers=1`` runs in the current process.
+    """
+    if method not in ("exact", "monte_carlo"):
+        raise ValueError(f"unknown method {method!r}")
+
+    skills = list(skills)
+    points = list(points)
+    workers = workers or os.cpu_count() or 1
+    cells = [(p, i, j) for p in range(len(points))
+             for i in range(len(skills)) for j in range(len(skills))]
+
+    if chunk_size is None:
+        chunk_size = max(1, len(cells) // (workers * 4))
+    chunks = [
+        cells[start:start + chunk_size]
+        for start in range(0, len(cells), chunk_size)
+    ]
+
+    shape = (len(points), len(skills), len(skills))
+    win = np.full(shape, np.nan)
+    rounds = np.full(shape, np.nan)
+    computed = 0
+
+    def merge(chunk_results: List[CellResult], chunk_computed: int):
+        nonlocal computed
+        for cell, probability, expected in chunk_results:
+            win[cell] = probability
+            rounds[cell] = expected
+        computed += chunk_computed
+
+    arguments = (skills, points, method, target_ci, seed, cache_dir)
+    if workers == 1:
+        for chunk in chunks:
+            merge(*_run_cells(chunk, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_run_cells, chunk, *arguments)
+                for chunk in chunks
+            ]
+            for future in futures:
+                merge(*future.result())
+
+    return SweepResult(skills=np.array(skills),
+                       points=np.array(points),
+                       win_probability=win,
+                       expected_rounds=rounds,
+                       computed=computed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Win probability over a grid of skill levels")
+    parser.add_argument("--skills",
+                        type=float,
+                        nargs="+",
+                        default=[round(0.1 * k, 1) for k in range(1, 10)])
+    parser.add_argument("--points", type=int, nargs="+", default=[5])
+    parser.add_argument("--method",
+                        choices=("exact", "monte_carlo"),
+                        default="exact")
+    parser.add_argument("--cache-dir", default=".sweep_cache")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--target-ci", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output",
+                        default=None,
+                        help="write the dense arrays to this .npz file")
+    args = parser.parse_args()
+
+    result = run_sweep(args.skills,
+                       args.points,
+                       method=args.method,
+                       cache_dir=args.cache_dir,
+                       workers=args.workers,
+                       target_ci=args.target_ci,
+                       seed=args.seed)
+    if args.output:
+        result.save(args.output)
+
+    for p, points_to_win in enumerate(result.points):
+        print(f"\nP(fencer 1 wins), first to {points_to_win}")
+        print("      " + "".join(f"{s:>7.2f}" for s in result.skills))
+        for i, skill in enumerate(result.skills):
+            print(f"{skill:6.2f}" + "".join(
+                f"{value:7.3f}" for value in result.win_probability[p, i]))
+    print(f"\n{result.computed} of {result.win_probability.size} cells "
+          f"computed, the rest came from the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The simulator modules live flat in the repository root, and the server
+# modules import each other from render/
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "render"))
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from broadcast import COALESCE, DROP_OLDEST, Broadcaster, ClientChannel
+
+
+class SlowSocket:
+    """WebSocket whose sends wait until the test opens the gate"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.received = []
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.received.append(text)
+
+
+async def _fill(overflow: str):
+    socket = SlowSocket()
+    channel = ClientChannel(socket, queue_size=3, overflow=overflow)
+    channel.put("0")
+    await asyncio.sleep(0)  # the sender takes "0" and blocks on the gate
+    for text in "12345":
+        channel.put(text)
+    pending, dropped = channel.pending, channel.dropped
+
+    socket.gate.set()
+    while channel.pending:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    await channel.close()
+    return socket.received, pending, dropped, channel
+
+
+def test_drop_oldest_keeps_the_newest_messages():
+    received, pending, dropped, channel = asyncio.run(_fill(DROP_OLDEST))
+    assert (pending, dropped) == (3, 2)
+    assert received == ["0", "3", "4", "5"]
+    assert channel.sent == 4
+
+
+def test_coalesce_replaces_the_queue_with_the_latest_message():
+    received, pending, dropped, channel = asyncio.run(_fill(COALESCE))
+    # "4" finds the queue full with 1-3 and replaces them
+    assert (pending, dropped) == (2, 3)
+    assert received == ["0", "4", "5"]
+
+
+def test_closed_channels_ignore_puts_and_leave_the_broadcaster():
+
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=2)
+        socket = SlowSocket()
+        socket.gate.set()
+        channel = broadcaster.connect(socket)
+        assert broadcaster.broadcast({"tick": 1}) == 1
+        await asyncio.sleep(0)
+        await broadcaster.disconnect(channel)
+        channel.put("late")
+        return broadcaster, channel, socket
+
+    broadcaster, channel, socket = asyncio.run(scenario())
+    assert socket.received == ['{"tick":1}']
+    assert channel.closed and channel.pending == 0
+    assert len(broadcaster) == 0
+
+
+@pytest.mark.parametrize("arguments", [{
+    "overflow": "newest"
+}, {
+    "queue_size": 0
+}])
+def test_bad_channel_settings_are_rejected(arguments):
+
+    async def create():
+        ClientChannel(SlowSocket(), **arguments)
+
+    with pytest.raises(ValueError):
+        asyncio.run(create())
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from env import FencingEnv, VectorEnv
+from sim import FencerSpec
+
+AGENT = FencerSpec("Agent", 0.7)
+OPPONENT = FencerSpec("Bob", 0.6)
+
+
+def _first_executable(info) -> int:
+    return int(np.flatnonzero(info["action_mask"])[0]) if info[
+        "action_mask"].any() else 0
+
+
+def test_bout_ends_and_must_be_reset():
+    env = FencingEnv(AGENT, OPPONENT)
+    with pytest.raises(RuntimeError):
+        env.step(0)
+
+    observation, info = env.reset(seed=3)
+    terminated = False
+    while not terminated:
+        observation, reward, terminated, truncated, info = env.step(
+            _first_executable(info))
+    assert reward in (1.0, -1.0)
+    assert max(observation[3], observation[4]) == 5
+    with pytest.raises(RuntimeError):
+        env.step(0)
+
+    env.reset(seed=3)
+    env.step(_first_executable(info))
+
+
+@pytest.mark.parametrize("action", [-1, FencingEnv.action_count])
+def test_out_of_range_action_is_rejected(action):
+    env = FencingEnv(AGENT, OPPONENT)
+    env.reset(seed=1)
+    with pytest.raises(ValueError):
+        env.step(action)
+
+
+def test_vector_env_validates_actions():
+    env = VectorEnv(8, AGENT, OPPONENT, seed=0)
+    env.reset(seed=0)
+    for actions in (np.zeros(7, dtype=int), np.full(8, -1),
+                    np.full(8, VectorEnv.action_count), np.zeros(8)):
+        with pytest.raises(ValueError):
+            env.step(actions)
+    observations, rewards, terminated, truncated, info = env.step(
+        np.zeros(8, dtype=int))
+    assert observations.shape == (8, VectorEnv.observation_size)
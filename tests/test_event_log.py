@@ -0,0 +1,65 @@
+import pytest
+
+from event_log import (BinaryEventWriter, JsonlEventWriter, _event_to_dict,
+                       read_binary_events, read_jsonl_events)
+from sim import BoutStarted, EventSink, FencerSpec, simulate_many
+
+
+class Recorder(EventSink):
+    """Keeps (bout index, event) pairs as the writers number them"""
+
+    def __init__(self):
+        self.events = []
+        self.bout = -1
+
+    def handle(self, bout, event):
+        if isinstance(event, BoutStarted):
+            self.bout += 1
+        self.events.append((self.bout, event))
+
+
+def _fields(event):
+    # Probabilities and rolls are stored as float32
+    return [
+        pytest.approx(value, rel=1e-6) if isinstance(value, float) else value
+        for value in (getattr(event, name) for name in event.__slots__)
+    ]
+
+
+def _record(sink, defenses):
+    recorder = Recorder()
+    simulate_many(5,
+                  FencerSpec("Alice", 0.7),
+                  FencerSpec("Bob", 0.6),
+                  seed=2,
+                  sinks=[sink, recorder],
+                  defenses=defenses)
+    sink.close()
+    return recorder.events
+
+
+@pytest.mark.parametrize("defenses", [False, True])
+def test_binary_log_round_trip(tmp_path, defenses):
+    path = str(tmp_path / "bouts.bin")
+    # A small buffer flushes many times mid-bout
+    expected = _record(BinaryEventWriter(path, buffer_size=7), defenses)
+
+    decoded = list(read_binary_events(path))
+    assert len(decoded) == len(expected)
+    for (bout, event), (expected_bout, expected_event) in zip(
+            decoded, expected):
+        assert bout == expected_bout
+        assert type(event) is type(expected_event)
+        assert _fields(event) == _fields(expected_event)
+
+    one_bout = [event for _, event in read_binary_events(path, bout=3)]
+    assert one_bout == [event for bout, event in decoded if bout == 3]
+
+
+def test_jsonl_log_round_trip(tmp_path):
+    path = str(tmp_path / "bouts.jsonl")
+    expected = _record(JsonlEventWriter(path, buffer_size=7), True)
+
+    assert list(read_jsonl_events(path)) == [
+        dict(_event_to_dict(event), bout=bout) for bout, event in expected
+    ]
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import fencing_server  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Bouts on the test's loop rather than in shard processes
+    monkeypatch.setattr(fencing_server.router, "shards", 0)
+    monkeypatch.setattr(fencing_server, "INPUT_RATE", 0.001)
+    monkeypatch.setattr(fencing_server, "INPUT_BURST", 3)
+    with TestClient(fencing_server.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("frame,detail", [
+    ([1, 2], "expected an input frame"),
+    ({"type": "ping"}, "expected an input frame"),
+    ({"type": "input", "seq": 4, "actions": "lunge"}, "actions must be"),
+    ({"type": "input", "seq": 5, "actions": [["left"]]}, "actions must be"),
+    ({"type": "input", "seq": 6, "actions": [["left", 3]]}, "actions must be"),
+])
+def test_bad_input_frames_get_errors(client, frame, detail):
+    with client.websocket_connect("/input") as inputs:
+        inputs.send_json(frame)
+        reply = inputs.receive_json()
+        assert reply["type"] == "error" and reply["request"] == "input"
+        assert reply["detail"].startswith(detail)
+        # The connection stays usable
+        inputs.send_json({"type": "input", "seq": 7, "actions": []})
+        assert inputs.receive_json()["type"] == "ack"
+
+
+def test_inputs_do_not_create_rooms(client):
+    with client.websocket_connect("/rooms/nowhere/input") as inputs:
+        inputs.send_json({"type": "input", "seq": 1, "actions": []})
+        assert inputs.receive_json()["detail"] == "unknown room 'nowhere'"
+    assert "nowhere" not in fencing_server.router.rooms
+
+
+def test_inputs_over_the_rate_are_dropped(client):
+    with client.websocket_connect("/ws") as spectator, \
+            client.websocket_connect("/input") as inputs:
+        actions = [["left", f"action {i}"] for i in range(5)]
+        inputs.send_json({"type": "input", "seq": 1, "actions": actions})
+        ack = inputs.receive_json()
+        assert ack["type"] == "ack" and ack["seq"] == 1
+        assert (ack["accepted"], ack["dropped"]) == (3, 2)
+        assert ack["received"] <= ack["broadcast"]
+
+        inputs.send_json({"type": "input", "seq": 2, "actions": actions[:1]})
+        assert inputs.receive_json()["dropped"] == 1
+
+        relayed = [spectator.receive_json() for _ in range(3)]
+        assert relayed == [{
+            "fencer": "left",
+            "action": f"action {i}"
+        } for i in range(3)]
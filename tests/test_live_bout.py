@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from live_bout import BoutParams, StateStream
+
+
+class Channel:
+    """Stands in for a ClientChannel, keeping the decoded messages"""
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, text):
+        self.messages.append(json.loads(text))
+
+
+def _state(tick: int) -> dict:
+    return {"round": tick, "score_left": tick // 2, "distance": "MEDIUM"}
+
+
+def test_keyframe_then_deltas_against_the_acknowledged_tick():
+    stream = StateStream("bout", keyframe_interval=4)
+    stream.reset(1)
+    channel = Channel()
+
+    stream.publish(1, _state(1), [channel])
+    keyframe = channel.messages[-1]
+    assert keyframe["type"] == "keyframe"
+    assert (keyframe["generation"], keyframe["tick"]) == (1, 1)
+    assert keyframe["state"] == _state(1)
+
+    # Without an ack the client keeps getting keyframes
+    stream.publish(2, _state(2), [channel])
+    assert channel.messages[-1]["type"] == "keyframe"
+
+    stream.acknowledge(channel, 2, 1)
+    stream.publish(3, _state(3), [channel])
+    delta = channel.messages[-1]
+    assert delta["type"] == "delta" and delta["base"] == 2
+    assert delta["changes"] == {"round": 3}
+
+    # The periodic keyframe goes to everyone
+    stream.acknowledge(channel, 3, 1)
+    stream.publish(4, _state(4), [channel])
+    assert channel.messages[-1]["type"] == "keyframe"
+
+
+def test_acks_are_checked_against_tick_and_generation():
+    stream = StateStream("bout", keyframe_interval=50)
+    stream.reset(1)
+    channel = Channel()
+    stream.publish(1, _state(1), [channel])
+
+    stream.acknowledge(channel, 5, 1)  # not published yet
+    stream.acknowledge(channel, 1, 0)  # from an older bout
+    assert channel not in stream.acks
+
+    stream.acknowledge(channel, 1, 1)
+    stream.acknowledge(channel, 0, 1)  # older than what it confirmed
+    assert stream.acks[channel] == 1
+
+
+def test_too_old_ack_gets_a_keyframe():
+    stream = StateStream("bout", keyframe_interval=3)
+    stream.reset(1)
+    channel = Channel()
+    stream.publish(1, _state(1), [channel])
+    stream.acknowledge(channel, 1, 1)
+    for tick in (2, 4, 5):
+        stream.publish(tick, _state(tick), [])
+    # Tick 1 has left the history, so no delta can be built against it
+    stream.publish(7, _state(7), [channel])
+    assert channel.messages[-1]["type"] == "keyframe"
+
+
+def test_generation_reset_drops_the_previous_bout():
+    stream = StateStream("bout")
+    stream.reset(1)
+    channel = Channel()
+    stream.publish(1, _state(1), [channel])
+    stream.acknowledge(channel, 1, 1)
+
+    stream.reset(2)
+    assert stream.keyframe() is None and not stream.acks
+    stream.acknowledge(channel, 1, 1)  # late ack of the first bout
+    stream.publish(1, _state(1), [channel])
+    message = channel.messages[-1]
+    assert message["type"] == "keyframe" and message["generation"] == 2
+
+    stream.acknowledge(channel, 1, 2)
+    stream.publish(2, _state(2), [channel])
+    assert channel.messages[-1]["type"] == "delta"
+
+
+def test_clients_are_grouped_by_their_base():
+    stream = StateStream("bout")
+    stream.reset(1)
+    channels = [Channel() for _ in range(3)]
+    stream.publish(1, _state(1), channels)
+    for channel in channels[:2]:
+        stream.acknowledge(channel, 1, 1)
+    stream.publish(2, _state(2), channels)
+    kinds = [channel.messages[-1]["type"] for channel in channels]
+    assert kinds == ["delta", "delta", "keyframe"]
+
+
+def test_planner_bouts_are_offloaded_and_weighted():
+    params = BoutParams(left_planner=True, defenses=True, seed=1)
+    bout = params.build("bout")
+    assert bout.offload and bout.bout.fencer1.defenses
+    assert bout.bout.fencer1.opponent is bout.bout.fencer2
+    assert params.weight > BoutParams().weight == 1
+    assert not BoutParams().build("plain").offload
+
+
+def test_bad_stream_settings_are_rejected():
+    with pytest.raises(ValueError):
+        StateStream("bout", keyframe_interval=0)
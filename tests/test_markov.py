@@ -0,0 +1,25 @@
+import math
+
+import pytest
+
+from markov import solve_bout
+from sim import FencerSpec
+from vectorized import simulate_batch
+
+# Deviations beyond this many standard errors are not sampling noise
+Z_LIMIT = 4.0
+
+
+@pytest.mark.parametrize("points_to_win", [3, 5])
+@pytest.mark.parametrize("skills", [(0.7, 0.6), (0.4, 0.5)])
+def test_solver_matches_simulation(skills, points_to_win):
+    spec1, spec2 = FencerSpec("A", skills[0]), FencerSpec("B", skills[1])
+    probability, rounds = solve_bout(spec1.build(), spec2.build(),
+                                     points_to_win).start
+    batch = simulate_batch(100_000, spec1, spec2, seed=7,
+                           points_to_win=points_to_win)
+
+    stderr = math.sqrt(probability * (1 - probability) / batch.n)
+    assert abs(batch.win_probability() - probability) < Z_LIMIT * stderr
+    rounds_stderr = batch.rounds.std(ddof=1) / math.sqrt(batch.n)
+    assert abs(batch.rounds.mean() - rounds) < Z_LIMIT * rounds_stderr
@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+import pytest
+
+from markov import choice_probabilities, scoring_probabilities, solve_chain
+from planner import PlanningFencer, sampled_choice_probabilities, turn_outcomes
+from sim import ActionType, BladePosition, DistanceType, Fencer, FencerSpec
+from vectorized import simulate_batch
+
+# Deviations beyond this many standard errors are not sampling noise
+Z_LIMIT = 4.0
+
+
+def test_sampled_choice_probabilities_match_quadrature():
+    weights = (0.5, 0.45, 0.45, 0.4, 0.3)
+    assert sampled_choice_probabilities(weights) == pytest.approx(
+        choice_probabilities(weights), abs=3e-3)
+
+
+def test_countering_defaults_to_the_parry_free_chain():
+    fencer1, fencer2 = Fencer("A", 0.7), Fencer("B", 0.6)
+    scoring1 = scoring_probabilities(fencer1, fencer2)
+    scoring2 = scoring_probabilities(fencer2, fencer1)
+    zeros = np.zeros(len(scoring1))
+    plain = solve_chain(scoring1, scoring2, 5)
+    countered = solve_chain(scoring1, scoring2, 5, countering=(zeros, zeros))
+    assert countered.start == pytest.approx(plain.start)
+
+
+def test_defense_model_matches_simulation():
+    spec1, spec2 = FencerSpec("A", 0.7), FencerSpec("B", 0.6)
+    fencer1, fencer2 = spec1.build(), spec2.build()
+    own = turn_outcomes(fencer1, fencer2, True)
+    theirs = turn_outcomes(fencer2, fencer1, True)
+    probability, rounds = solve_chain(own[0],
+                                      theirs[0],
+                                      5,
+                                      countering=(own[1], theirs[1])).start
+    batch = simulate_batch(200_000, spec1, spec2, seed=11, defenses=True)
+
+    stderr = math.sqrt(probability * (1 - probability) / batch.n)
+    assert abs(batch.win_probability() - probability) < Z_LIMIT * stderr
+    rounds_stderr = batch.rounds.std(ddof=1) / math.sqrt(batch.n)
+    assert abs(batch.rounds.mean() - rounds) < Z_LIMIT * rounds_stderr
+
+
+def _planner(defenses: bool) -> PlanningFencer:
+    opponent = Fencer("B", 0.6)
+    opponent.blade_position = BladePosition.QUARTE
+    return PlanningFencer("A",
+                          0.5,
+                          opponent=opponent,
+                          time_budget=1.0,
+                          defenses=defenses)
+
+
+def test_defense_phase_changes_the_best_action():
+    # Against quarte the direct thrust lands most often, but it is the
+    # action most exposed to parries and ripostes
+    choices = {}
+    for defenses in (False, True):
+        planner = _planner(defenses)
+        choices[defenses] = planner.choose_action(
+            DistanceType.LUNGE, BladePosition.QUARTE).action_type
+    assert choices[False] is ActionType.DIRECT_THRUST
+    assert choices[True] is ActionType.COUNTER_DISENGAGE
+
+
+def test_search_counts_nodes_and_table_hits():
+    planner = _planner(True)
+    planner.max_depth = 6
+    planner.table_size = 100  # fewer than the bout's states
+    for distance in (DistanceType.LUNGE, DistanceType.SHORT):
+        planner.choose_action(distance, BladePosition.QUARTE)
+
+    stats = planner.stats
+    assert stats.decisions == 2
+    assert stats.last_depth == planner.max_depth
+    assert stats.nodes > 0 and stats.lookups > stats.hits > 0
+    assert 0 < stats.hit_rate < 1
+    assert stats.nodes_per_second > 0
+    assert len(planner._table) <= planner.table_size
+
+
+def test_search_stops_at_its_time_budget():
+    planner = _planner(True)
+    planner.time_budget = 0.0
+    action = planner.choose_action(DistanceType.LUNGE, BladePosition.QUARTE)
+    assert action is not None
+    assert 1 <= planner.stats.last_depth < planner.max_depth
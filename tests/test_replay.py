@@ -0,0 +1,22 @@
+import pytest
+
+from replay import BoutReplay
+from sim import FencerSpec, simulate_many
+
+ALICE = FencerSpec("Alice", 0.7)
+BOB = FencerSpec("Bob", 0.6)
+
+
+@pytest.mark.parametrize("defenses", [False, True])
+def test_replay_matches_batch(defenses):
+    results = simulate_many(20,
+                            ALICE,
+                            BOB,
+                            seed=9,
+                            defenses=defenses,
+                            replayable=True)
+    for index, result in enumerate(results):
+        replay = BoutReplay.from_batch(9, index, ALICE, BOB,
+                                       defenses=defenses)
+        replay.seek(result.rounds // 2)
+        assert replay.run_to_end() == result
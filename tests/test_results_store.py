@@ -0,0 +1,60 @@
+from collections import Counter
+
+import numpy as np
+
+from results_store import ACTIONS, NO_SEED, ResultsStore
+from sim import FencerSpec, simulate_many
+
+ALICE = FencerSpec("Alice", 0.7)
+BOB = FencerSpec("Bob", 0.6)
+CAROL = FencerSpec("Carol", 0.5)
+
+
+def _totals(results, field):
+    totals = Counter()
+    for result in results:
+        totals.update(getattr(result, field))
+    return totals
+
+
+def test_store_round_trip(tmp_path):
+    replayable = simulate_many(300, ALICE, BOB, seed=1, replayable=True)
+    outcomes = list(simulate_many(2500, ALICE, CAROL, seed=2))
+
+    # Buffers grow past INITIAL_ROWS and flush mid-append
+    with ResultsStore(str(tmp_path), chunk_rows=1500) as store:
+        store.append(ALICE, BOB, replayable)
+        store.append(ALICE, CAROL, outcomes)
+        assert len(store) == 2800
+
+    store = ResultsStore(str(tmp_path))
+    assert store.fencers == [ALICE, BOB, CAROL]
+    assert len(store) == 2800
+    results = list(replayable) + outcomes
+    assert list(store.column("winner")) == [r.winner for r in results]
+    assert list(store.column("rounds")) == [r.rounds for r in results]
+    assert list(store.column("score1")) == [r.score[0] for r in results]
+    assert list(store.column("score2")) == [r.score[1] for r in results]
+    assert list(store.column("seed")) == [r.seed for r in replayable
+                                          ] + [NO_SEED] * len(outcomes)
+
+    attempts = store.column("attempts")
+    for row, result in enumerate(results):
+        assert {
+            ACTIONS[index]: int(attempts[row, index])
+            for index in np.flatnonzero(attempts[row])
+        } == result.action_attempts
+
+    statistics = store.action_statistics(ALICE, CAROL)
+    attempted = _totals(outcomes, "action_attempts")
+    succeeded = _totals(outcomes, "action_successes")
+    assert statistics == {
+        action: (succeeded[action], attempted[action])
+        for action in attempted
+    }
+
+    summary = store.summary(ALICE, BOB)
+    assert summary["bouts"] == 300
+    assert summary["fencer1 win rate"] == sum(
+        r.winner == 1 for r in replayable) / 300
+    assert summary["max rounds"] == max(r.rounds for r in replayable)
@@ -0,0 +1,114 @@
+import asyncio
+import queue
+
+import pytest
+
+from live_bout import BoutParams
+from rooms import RoomRouter
+
+
+class Socket:
+
+    def __init__(self):
+        self.received = []
+
+    async def send_text(self, text):
+        self.received.append(text)
+
+
+def test_rooms_are_created_on_demand_and_reaped_when_empty():
+
+    async def scenario():
+        router = RoomRouter(shards=0, permanent=["main"])
+        router.start()
+        with pytest.raises(KeyError):
+            router.room("lobby", create=False)
+
+        room = router.room("lobby")
+        channel = room.join(Socket())
+        router.reap("lobby")
+        assert "lobby" in router.rooms  # still has a client
+
+        await room.leave(channel)
+        router.reap("lobby")
+        router.reap("main")
+        await router.close()
+        return router
+
+    router = asyncio.run(scenario())
+    assert list(router.rooms) == ["main"]
+
+
+def test_finished_bouts_release_their_room():
+
+    async def scenario():
+        router = RoomRouter(shards=0)
+        router.start()
+        watched = router.room("watched")
+        channel = watched.join(Socket())
+        params = BoutParams(points_to_win=1, tick_rate=1000, seed=4)
+        router.start_bout("watched", params)
+        router.start_bout("empty", params)
+        assert {"watched", "empty"} <= set(router.rooms)
+
+        while watched.running or "empty" in router.rooms:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        finished = watched.stream.state["finished"]
+        rooms = set(router.rooms)
+        await watched.leave(channel)
+        await router.close()
+        return finished, rooms, channel
+
+    finished, rooms, channel = asyncio.run(scenario())
+    # The room without clients goes as soon as its bout is over
+    assert finished and rooms == {"watched"}
+    assert channel.sent >= 2  # a keyframe and the final state
+
+
+def test_states_of_a_stopped_bout_are_dropped():
+
+    async def scenario():
+        router = RoomRouter(shards=0)
+        router.start()
+        room = router.room("arena")
+        channel = room.join(Socket())
+        router.start_bout("arena", BoutParams(tick_rate=1, seed=1))
+        old = room.generation
+        router.stop_bout("arena")
+        router._deliver("arena", old, 7, {"finished": False})
+        tick = room.stream.tick
+        await room.leave(channel)
+        await router.close()
+        return room, tick
+
+    room, tick = asyncio.run(scenario())
+    assert tick is None and not room.running and room.params is None
+
+
+def test_bouts_go_to_the_least_loaded_shard():
+    router = RoomRouter(shards=2)
+    # Shard command queues without the processes behind them
+    router._commands = [queue.SimpleQueue() for _ in range(2)]
+
+    planner = BoutParams(left_planner=True)
+    router.start_bout("a", planner)
+    router.start_bout("b", BoutParams())
+    router.start_bout("c", BoutParams())
+    assert [router.rooms[r].shard for r in "abc"] == [0, 1, 1]
+    assert router.load == [planner.weight, 2]
+
+    command = router._commands[0].get_nowait()
+    assert command[:2] == ("start", "a")
+    router._deliver("a", router.rooms["a"].generation, 9, {
+        "finished": True,
+        "round": 9
+    })
+    # A finished bout leaves the load, and its clientless room is reaped
+    assert router.load == [0, 2] and "a" not in router.rooms
+
+    router.stop_bout("b")
+    assert router.load == [0, 1]
+    assert router._commands[1].get_nowait()[:2] == ("start", "b")
+    assert router._commands[1].get_nowait()[:2] == ("start", "c")
+    assert router._commands[1].get_nowait()[:2] == ("stop", "b")
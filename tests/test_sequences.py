@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from broadcast import Broadcaster
+from sequences import MAX_ACTIONS, MAX_DURATION, SequenceScheduler
+
+
+class IdleCounter:
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+
+
+def _run(scenario):
+
+    async def main():
+        idle = IdleCounter()
+        scheduler = SequenceScheduler(Broadcaster(), idle)
+        result = await scenario(scheduler)
+        return scheduler, idle, result
+
+    return asyncio.run(main())
+
+
+def test_replacing_with_an_empty_sequence_goes_idle():
+
+    async def scenario(scheduler):
+        scheduler.schedule([(5.0, "left", "lunge")])
+        return scheduler.schedule([], sequence_id="1")
+
+    scheduler, idle, sequence = _run(scenario)
+    assert sequence.done and scheduler.pending == 0
+    assert idle.calls == 1
+
+
+def test_replacement_cancels_the_old_actions_without_going_idle():
+
+    async def scenario(scheduler):
+        first = scheduler.schedule([(0.0, "left", "lunge"),
+                                    (5.0, "left", "parry")])
+        await asyncio.sleep(0.01)
+        second = scheduler.schedule([(0.01, "right", "riposte")],
+                                    sequence_id=first.sequence_id)
+        calls_after_replace = scheduler.on_idle.calls
+        await asyncio.sleep(0.05)
+        return first, second, calls_after_replace
+
+    scheduler, idle, (first, second, calls_after_replace) = _run(scenario)
+    assert calls_after_replace == 0
+    assert (first.played, first.cancelled) == (1, True)
+    assert second.played == 1 and second.done
+    assert scheduler.get(first.sequence_id) is second
+    assert idle.calls == 1
+
+
+def test_cancel_goes_idle_once_nothing_is_pending():
+
+    async def scenario(scheduler):
+        first = scheduler.schedule([(5.0, "left", "lunge")])
+        second = scheduler.schedule([(5.0, "right", "lunge")])
+        scheduler.cancel(first.sequence_id)
+        calls = scheduler.on_idle.calls
+        scheduler.cancel(second.sequence_id)
+        return calls
+
+    scheduler, idle, calls_after_first = _run(scenario)
+    assert calls_after_first == 0 and idle.calls == 1
+    with pytest.raises(KeyError):
+        scheduler.get("missing")
+
+
+def test_new_empty_sequence_goes_idle():
+
+    async def scenario(scheduler):
+        return scheduler.schedule([])
+
+    scheduler, idle, sequence = _run(scenario)
+    assert sequence.summary()["duration"] == 0.0
+    assert idle.calls == 1
+
+
+@pytest.mark.parametrize("actions,delay", [
+    ([(0.0, "left", "lunge")] * (MAX_ACTIONS + 1), 0.0),
+    ([(-1.0, "left", "lunge")], 0.0),
+    ([(MAX_DURATION + 1, "left", "lunge")], 0.0),
+    ([], MAX_DURATION + 1),
+])
+def test_out_of_bounds_sequences_are_rejected(actions, delay):
+
+    async def scenario(scheduler):
+        with pytest.raises(ValueError):
+            scheduler.schedule(actions, delay)
+
+    _, idle, _ = _run(scenario)
+    assert idle.calls == 0
@@ -0,0 +1,69 @@
+import pytest
+
+from sim import BoutStreams, Fencer, FencerSpec, HeadlessBout, simulate_many
+
+
+@pytest.mark.parametrize("skill", [0, -0.5, float("nan")])
+def test_fencer_rejects_non_positive_skill(skill):
+    with pytest.raises(ValueError):
+        Fencer("A", skill)
+    fencer = Fencer("A", 0.5)
+    with pytest.raises(ValueError):
+        fencer.skill_level = skill
+
+
+@pytest.mark.parametrize("defenses", [False, True])
+def test_outcome_batches_match_their_counts(defenses):
+    alice, bob = FencerSpec("Alice", 0.7), FencerSpec("Bob", 0.6)
+    results = simulate_many(2000, alice, bob, seed=4, defenses=defenses)
+    again = simulate_many(2000, alice, bob, seed=4, defenses=defenses)
+    assert list(results) == list(again)
+    for result in results:
+        # Every touch is one successful action of the bout
+        assert sum(result.action_successes.values()) == sum(result.score)
+        assert max(result.score) == 5
+        assert result.score[result.winner - 1] == 5
+        assert result.seed is None
+    assert results[-1] == list(results)[-1]
+
+
+def _record_draws(streams):
+    """Logs every uniform of each stream; other kinds of draw log None"""
+    draws = {}
+    for name in BoutStreams.NAMES:
+        stream = getattr(streams, name)
+        log = draws[name] = []
+
+        def uniform(draw=stream.random, log=log):
+            value = draw()
+            log.append(value)
+            return value
+
+        def bits(k, draw=stream.getrandbits, log=log):
+            log.append(None)
+            return draw(k)
+
+        # Instance attributes, so the generators' own methods use them too
+        stream.random = uniform
+        stream.getrandbits = bits
+    return draws
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_antithetic_streams_stay_paired(seed):
+    bouts = {}
+    for mirror in (False, True):
+        streams = BoutStreams.from_seed(seed, antithetic=mirror)
+        draws = _record_draws(streams)
+        HeadlessBout(FencerSpec("Alice", 0.7).build(),
+                     FencerSpec("Bob", 0.6).build(),
+                     streams=streams,
+                     defenses=True).simulate_bout()
+        bouts[mirror] = draws
+
+    for name in BoutStreams.NAMES:
+        plain, mirrored = bouts[False][name], bouts[True][name]
+        assert None not in plain and None not in mirrored
+        pairs = list(zip(plain, mirrored))
+        assert len(pairs) > 10
+        assert all(a + b == pytest.approx(1.0) for a, b in pairs)
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from sim import BoutStarted, EventSink, FencerSpec, simulate_many
+from stats import ActionStatistics, RunningStats, wilson_interval
+
+
+def _running(values):
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+
+def test_running_stats_merge_matches_single_pass():
+    rng = random.Random(1)
+    values = [rng.gauss(3.0, 2.0) for _ in range(1000)]
+    single = _running(values)
+
+    merged = RunningStats()
+    for start, stop in [(0, 0), (0, 1), (1, 250), (250, 251), (251, 1000)]:
+        merged.merge(_running(values[start:stop]))
+
+    assert merged.count == single.count
+    assert merged.mean == pytest.approx(single.mean, rel=1e-12)
+    assert merged.variance == pytest.approx(single.variance, rel=1e-12)
+
+
+class Splitter(EventSink):
+    """Sends each bout's events to one of several sinks in turn"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.bout = -1
+
+    def handle(self, bout, event):
+        if isinstance(event, BoutStarted):
+            self.bout += 1
+        self.parts[self.bout % len(self.parts)].handle(bout, event)
+
+
+@pytest.mark.parametrize("defenses", [False, True])
+def test_action_statistics_merge_matches_single_pass(defenses):
+    single = ActionStatistics()
+    parts = [ActionStatistics() for _ in range(3)]
+    simulate_many(30,
+                  FencerSpec("Alice", 0.7),
+                  FencerSpec("Bob", 0.6),
+                  seed=5,
+                  sinks=[single, Splitter(parts)],
+                  defenses=defenses)
+    merged = ActionStatistics.merged(parts)
+
+    assert merged.stats.keys() == single.stats.keys()
+    for key, stats in single.stats.items():
+        assert merged.stats[key].count == stats.count
+        assert merged.stats[key].mean == pytest.approx(stats.mean)
+        assert merged.stats[key].variance == pytest.approx(stats.variance)
+    assert merged.report() == single.report()
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(1 - high)
+    assert low < 0.5 < high
+    assert wilson_interval(100, 100)[1] == pytest.approx(1.0)
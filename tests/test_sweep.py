@@ -0,0 +1,64 @@
+import numpy as np
+
+from markov import win_probability
+from sim import Fencer, FencingBout
+from sweep import run_sweep
+
+
+def test_cells_are_cached(tmp_path):
+    cache = str(tmp_path)
+    first = run_sweep([0.4, 0.6], [3, 5], cache_dir=cache, workers=1)
+    assert first.computed == 8
+    assert first.win_probability[1, 1, 0] == win_probability(
+        Fencer("A", 0.6), Fencer("B", 0.4), 5)
+
+    again = run_sweep([0.4, 0.6], [3, 5], cache_dir=cache, workers=2)
+    assert again.computed == 0
+    assert np.array_equal(again.win_probability, first.win_probability)
+    assert np.array_equal(again.expected_rounds, first.expected_rounds)
+
+    # Only the cells of the new skill level are computed
+    wider = run_sweep([0.4, 0.6, 0.8], [3, 5], cache_dir=cache, workers=1)
+    assert wider.computed == 2 * (9 - 4)
+    assert np.array_equal(wider.win_probability[:, :2, :2],
+                          first.win_probability)
+
+
+def test_model_change_invalidates_cells(tmp_path, monkeypatch):
+    cache = str(tmp_path)
+    before = run_sweep([0.4, 0.6], cache_dir=cache, workers=1)
+
+    modifiers = dict(FencingBout.DISTANCE_MODIFIERS)
+    for distance in modifiers:
+        modifiers[distance] *= 0.9
+    monkeypatch.setattr(FencingBout, "DISTANCE_MODIFIERS", modifiers)
+    after = run_sweep([0.4, 0.6], cache_dir=cache, workers=1)
+    assert after.computed == 4
+    assert not np.array_equal(after.expected_rounds, before.expected_rounds)
+
+
+def test_monte_carlo_cells_are_cached(tmp_path):
+    cache = str(tmp_path)
+    first = run_sweep([0.4, 0.7],
+                      method="monte_carlo",
+                      cache_dir=cache,
+                      workers=1,
+                      target_ci=0.02,
+                      seed=1)
+    assert first.computed == 4
+    assert np.isnan(first.expected_rounds).all()
+    again = run_sweep([0.4, 0.7],
+                      method="monte_carlo",
+                      cache_dir=cache,
+                      workers=1,
+                      target_ci=0.02,
+                      seed=1)
+    assert again.computed == 0
+    assert np.array_equal(again.win_probability, first.win_probability)
+    # Another seed is another cell
+    assert run_sweep([0.4, 0.7],
+                     method="monte_carlo",
+                     cache_dir=cache,
+                     workers=1,
+                     target_ci=0.02,
+                     seed=2).computed == 4
@@ -0,0 +1,64 @@
+from sim import (ActionDatabase, ActionRolled, DefenseDatabase, EventSink,
+                 FencerSpec, ParryAttempted, ScoreChanged)
+from timing import simulate_many_timed
+
+SPECS = (FencerSpec("A", 0.7), FencerSpec("B", 0.6))
+
+
+class Recorder(EventSink):
+
+    def __init__(self):
+        self.events = []
+
+    def handle(self, bout, event):
+        self.events.append(event)
+
+
+def test_defense_phase_is_off_by_default():
+    recorder = Recorder()
+    simulate_many_timed(50, *SPECS, seed=1, sinks=[recorder])
+    assert not any(
+        isinstance(event, ParryAttempted) for event in recorder.events)
+    assert not any(event.parried for event in recorder.events
+                   if isinstance(event, ActionRolled))
+
+
+def test_parries_fit_in_the_attack_and_are_answered():
+    recorder = Recorder()
+    results = simulate_many_timed(300,
+                                  *SPECS,
+                                  seed=2,
+                                  sinks=[recorder],
+                                  defenses=True)
+    actions = ActionDatabase.get_all_actions()
+    defenses = DefenseDatabase.get_all_defenses()
+    events = recorder.events
+
+    parries = [
+        index for index, event in enumerate(events)
+        if isinstance(event, ParryAttempted)
+    ]
+    assert any(events[index].success for index in parries)
+    for index in parries:
+        parry, attack = events[index], events[index - 1]
+        # An attack lands exactly its execution time after it started
+        assert isinstance(attack, ActionRolled)
+        assert attack.fencer != parry.fencer
+        assert (defenses[parry.defense_type].execution_time <=
+                actions[attack.action_type].execution_time)
+        assert attack.parried == parry.success
+
+    riposte_touches = 0
+    for index in parries:
+        if not events[index].success:
+            continue
+        # The defender's next roll, if the bout goes on, is its riposte
+        for event in events[index + 1:]:
+            if isinstance(event, ActionRolled) and event.fencer == events[
+                    index].fencer:
+                riposte_touches += event.success
+                break
+    assert riposte_touches
+
+    touches = sum(isinstance(event, ScoreChanged) for event in events)
+    assert touches == sum(sum(result.score) for result in results)
@@ -0,0 +1,31 @@
+import pytest
+
+from sim import FencerSpec
+from tournament import run_tournament
+
+SPECS = [
+    FencerSpec(f"Fencer {index}", skill)
+    for index, skill in enumerate([0.4, 0.55, 0.7])
+]
+
+
+@pytest.mark.parametrize("collect_stats", [False, True])
+def test_results_do_not_depend_on_workers(collect_stats):
+    bouts = 40 if collect_stats else 2000
+    single = run_tournament(SPECS,
+                            bouts,
+                            seed=3,
+                            workers=1,
+                            collect_stats=collect_stats)
+    pooled = run_tournament(SPECS,
+                            bouts,
+                            seed=3,
+                            workers=2,
+                            chunk_size=1,
+                            collect_stats=collect_stats)
+    assert single.wins == pooled.wins
+    for i in range(len(SPECS)):
+        for j in range(i + 1, len(SPECS)):
+            assert single.wins[i][j] + single.wins[j][i] == bouts
+    if collect_stats:
+        assert single.action_stats.report() == pooled.action_stats.report()
@@ -0,0 +1,87 @@
+import pytest
+
+from markov import win_probability
+from sim import FencerSpec
+from vectorized import (compare_with_reference, estimate_win_probability,
+                        simulate_batch)
+
+# Two-sample z statistics beyond this are not sampling noise
+Z_LIMIT = 4.0
+
+
+@pytest.mark.parametrize("defenses", [False, True])
+@pytest.mark.parametrize("skills", [(0.7, 0.6), (0.4, 0.5)])
+def test_vectorized_matches_reference(skills, defenses):
+    comparison = compare_with_reference(FencerSpec("A", skills[0]),
+                                        FencerSpec("B", skills[1]),
+                                        reference_bouts=4000,
+                                        vectorized_bouts=100_000,
+                                        seed=11,
+                                        defenses=defenses)
+    assert abs(comparison["win_probability_z"]) < Z_LIMIT
+    assert abs(comparison["mean_rounds_z"]) < Z_LIMIT
+
+
+def test_batch_is_reproducible():
+    first = simulate_batch(5000, FencerSpec("A", 0.7), FencerSpec("B", 0.6),
+                           seed=3)
+    second = simulate_batch(5000, FencerSpec("A", 0.7), FencerSpec("B", 0.6),
+                            seed=3)
+    assert (first.winners == second.winners).all()
+    assert (first.rounds == second.rounds).all()
+
+
+def test_defenses_change_the_bout():
+    plain = simulate_batch(20_000, FencerSpec("A", 0.7), FencerSpec("B", 0.6),
+                           seed=5)
+    defended = simulate_batch(20_000,
+                              FencerSpec("A", 0.7),
+                              FencerSpec("B", 0.6),
+                              seed=5,
+                              defenses=True)
+    # Parried touches make bouts longer
+    assert defended.rounds.mean() > plain.rounds.mean()
+
+
+def test_estimate_stops_at_target_precision():
+    alice, bob = FencerSpec("A", 0.7).build(), FencerSpec("B", 0.6).build()
+    exact = win_probability(alice, bob)
+    estimate = estimate_win_probability(alice, bob, target_ci=0.01, seed=1)
+    assert estimate.converged
+    assert estimate.half_width <= 0.01
+    assert estimate.interval[0] - 0.005 < exact < estimate.interval[1] + 0.005
+    # Sized from the estimate rather than a fixed guess
+    assert estimate.samples < 2 * 1.96**2 * 0.25 / 0.01**2
+
+
+def test_sprt_names_the_favourite():
+    alice, bob = FencerSpec("A", 0.7).build(), FencerSpec("B", 0.5).build()
+    estimate = estimate_win_probability(alice, bob, method="sprt", seed=2)
+    assert estimate.converged and estimate.favoured == 1
+    reverse = estimate_win_probability(bob, alice, method="sprt", seed=2)
+    assert reverse.converged and reverse.favoured == 2
+
+
+def test_estimate_reports_running_out_of_samples():
+    alice, bob = FencerSpec("A", 0.6).build(), FencerSpec("B", 0.6).build()
+    estimate = estimate_win_probability(alice,
+                                        bob,
+                                        target_ci=0.001,
+                                        seed=3,
+                                        max_samples=5000)
+    assert not estimate.converged
+    assert estimate.samples == 5000
+
+
+@pytest.mark.parametrize("kwargs", [{
+    "method": "bayes"
+}, {
+    "target_ci": 0
+}, {
+    "target_ci": 0.5
+}])
+def test_estimate_rejects_bad_arguments(kwargs):
+    with pytest.raises(ValueError):
+        estimate_win_probability(
+            FencerSpec("A", 0.7).build(),
+            FencerSpec("B", 0.6).build(), **kwargs)
@@ -0,0 +1,270 @@
+"""Event-driven bout engine on a continuous clock.
+
+Instead of alternating turns, each fencer acts on its own clock: it picks an
+action, and the action lands ``execution_time`` seconds later. Action
+completions, distance changes and idle waits are events in one heap, so each
+event costs O(log n) to schedule and pop. Actions landing within
+SIMULTANEOUS_WINDOW of each other resolve together by right of way.
+
+After a touch the referee halts: pending actions are cancelled (lazily, by
+bumping the fencer's generation counter) and both fencers restart after
+RESTART_TIME.
+
+With ``defenses=True`` an attack that would land can be parried as in
+FencingBout, but only in time: the chosen defense must take no longer than
+the attack was in flight, and a fencer whose own action lands in the same
+window has no hand free to parry. A parry abandons the defender's action in
+flight; its riposte is scheduled as an action of its own, landing after its
+``execution_time``.
+"""
+import heapq
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from sim import (ACTION_ORDINALS, DEFENSE_ORDINALS, ActionChosen,
+                 ActionRolled, BoutCompleted, BoutResult, BoutStarted,
+                 BoutStreams, DefenseDatabase, DefenseType, DistanceChanged,
+                 EventSink, Fencer, FencerSpec, FencingAction, FencingBout,
+                 ParryAttempted, ScoreChanged, derive_seed)
+
+# Event kinds, ordered so that at equal times distance moves come first
+DISTANCE, ACTION, READY = 0, 1, 2
+
+# Owner of clock events, next to fencers 0 and 1; it is never halted
+CLOCK = 2
+
+
+class TimedBout(FencingBout):
+    """Bout where both fencers act concurrently on a shared clock"""
+
+    DISTANCE_INTERVAL = 0.5  # seconds between distance updates
+    IDLE_TIME = 0.25  # wait before retrying when no action is available
+    RESTART_TIME = 1.0  # pause after a touch
+    SIMULTANEOUS_WINDOW = 0.05  # completions this close resolve together
+
+    def __init__(self,
+                 fencer1: Fencer,
+                 fencer2: Fencer,
+                 points_to_win: int = 5,
+                 sinks: Optional[List[EventSink]] = None,
+                 rng: Optional[random.Random] = None,
+                 streams: Optional[BoutStreams] = None,
+                 defenses: bool = False):
+        super().__init__(fencer1, fencer2, points_to_win,
+                         [] if sinks is None else sinks, rng, streams,
+                         defenses)
+        self.clock = 0.0
+        self._queue: List[tuple] = []
+        self._sequence = 0
+        # Bumped on a halt; queued actions of older generations are stale
+        self._generation = [0, 0, 0]
+
+    def _schedule(self, time: float, kind: int, fencer: int = CLOCK,
+                  payload=None):
+        self._sequence += 1
+        heapq.heappush(self._queue,
+                       (time, kind, self._sequence, fencer,
+                        self._generation[fencer], payload))
+
+    def simulate_bout(self) -> BoutResult:
+        emit = self._emit if self.sinks else None
+        if emit:
+            emit(BoutStarted(self.points_to_win))
+
+        self._schedule(self.DISTANCE_INTERVAL, DISTANCE)
+        self._schedule(0.0, READY, 0)
+        self._schedule(0.0, READY, 1)
+
+        while max(self.fencer1.score,
+                  self.fencer2.score) < self.points_to_win:
+            time, kind, _, fencer, generation, payload = heapq.heappop(
+                self._queue)
+            if generation != self._generation[fencer]:
+                continue  # cancelled by a halt
+            self.clock = time
+
+            if kind == DISTANCE:
+                old_distance = self.distance
+                self._update_distance()
+                if emit and self.distance != old_distance:
+                    emit(
+                        DistanceChanged(self.rounds, old_distance,
+                                        self.distance))
+                self._schedule(time + self.DISTANCE_INTERVAL, DISTANCE)
+            elif kind == READY:
+                self._start_action(fencer, emit)
+            else:
+                self._resolve([(fencer, payload)] + self._simultaneous(time),
+                              emit)
+
+        result = BoutResult(
+            winner=1 if self.fencer1.score >= self.points_to_win else 2,
+            score=(self.fencer1.score, self.fencer2.score),
+            rounds=self.rounds,
+            action_attempts=self.action_attempts,
+            action_successes=self.action_successes)
+        if emit:
+            emit(BoutCompleted(self.rounds, result.winner, *result.score))
+        return result
+
+    def _fencers(self, fencer: int) -> Tuple[Fencer, Fencer]:
+        if fencer == 0:
+            return self.fencer1, self.fencer2
+        return self.fencer2, self.fencer1
+
+    def _start_action(self, fencer: int, emit):
+        own, opponent = self._fencers(fencer)
+        action = own.choose_action(self.distance, opponent.blade_position,
+                                   self.streams.choice)
+        if emit:
+            emit(
+                ActionChosen(self.rounds, fencer + 1,
+                             action.action_type if action else None,
+                             self.distance))
+        if action is None:
+            self._schedule(self.clock + self.IDLE_TIME, READY, fencer)
+        else:
+            self._schedule(self.clock + action.properties.execution_time,
+                           ACTION, fencer, (self.clock, action))
+
+    def _simultaneous(self, time: float) -> List[Tuple[int, tuple]]:
+        """Pops the other live actions landing within the window"""
+        landing = []
+        deferred = []
+        while self._queue and self._queue[0][0] <= time + self.SIMULTANEOUS_WINDOW:
+            entry = heapq.heappop(self._queue)
+            _, kind, _, fencer, generation, payload = entry
+            if kind == ACTION and generation == self._generation[fencer]:
+                landing.append((fencer, payload))
+            elif generation == self._generation[fencer]:
+                deferred.append(entry)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+        return landing
+
+    def _resolve(self, landing: List[Tuple[int, tuple]], emit):
+        hits = []
+        # Fencers completing an action cannot parry at the same time
+        busy = {fencer for fencer, _ in landing}
+        for fencer, (started, action) in landing:
+            own, opponent = self._fencers(fencer)
+            self.rounds += 1
+            # The distance may have changed while the action was under way
+            probability = 0.0
+            if self.distance in action.properties.valid_distances:
+                probability = min(
+                    action.get_success_probability(opponent.blade_position) *
+                    self.DISTANCE_MODIFIERS[self.distance], 1.0)
+            roll = self.streams.roll.random()
+            success = roll <= probability
+
+            action_type = action.action_type
+            self.action_attempts[action_type] = self.action_attempts.get(
+                action_type, 0) + 1
+            parry = None
+            if success and self.defenses and 1 - fencer not in busy:
+                parry = self._timed_parry(action, started, 1 - fencer)
+            parried = parry is not None and parry.success
+            if emit:
+                emit(
+                    ActionRolled(self.rounds, fencer + 1, action_type,
+                                 probability, roll, success and not parried,
+                                 parried))
+                if parry is not None:
+                    emit(parry)
+            if parried:
+                self._schedule(self.clock, READY, fencer)
+                self._start_riposte(parry.defense_type, 1 - fencer)
+            elif success:
+                # Right of way: priority actions, then the fencer holding
+                # priority, then whoever started first
+                hits.append(((action.properties.priority, own.has_priority,
+                              -started), fencer, action_type))
+            else:
+                self._schedule(self.clock, READY, fencer)
+
+        if not hits:
+            return
+        hits.sort(reverse=True)
+        if len(hits) > 1 and hits[0][0] == hits[1][0]:
+            scorer = None  # nobody has right of way, the touches annul
+        else:
+            _, scorer, action_type = hits[0]
+
+        if scorer is not None:
+            own, _ = self._fencers(scorer)
+            own.score += 1
+            self.action_successes[action_type] = self.action_successes.get(
+                action_type, 0) + 1
+            if emit:
+                emit(
+                    ScoreChanged(self.rounds, scorer + 1, self.fencer1.score,
+                                 self.fencer2.score))
+
+        # Halt: cancel everything in flight and restart both fencers
+        for fencer in (0, 1):
+            self._generation[fencer] += 1
+            self._schedule(self.clock + self.RESTART_TIME, READY, fencer)
+
+    def _timed_parry(self, attack: FencingAction, started: float,
+                     defender: int) -> Optional[ParryAttempted]:
+        """Defense against an attack that would otherwise land.
+
+        Returns None if the chosen defense cannot parry the attack or takes
+        longer than the attack was in flight.
+        """
+        defending, _ = self._fencers(defender)
+        defense_type = defending.choose_defense(self.streams.choice)
+        if defense_type is None or not DefenseDatabase.get_parry_masks()[
+                ACTION_ORDINALS[attack.action_type]] >> DEFENSE_ORDINALS[
+                    defense_type] & 1:
+            return None
+        if (defending.available_defenses[defense_type].execution_time >
+                self.clock - started):
+            return None
+        probability = defending.get_parry_probability(defense_type)
+        roll = self.streams.roll.random()
+        return ParryAttempted(self.rounds, defender + 1, defense_type,
+                              probability, roll, roll <= probability)
+
+    def _start_riposte(self, defense_type: DefenseType, defender: int):
+        """Replaces the defender's action in flight with its riposte"""
+        defending, attacking = self._fencers(defender)
+        self._generation[defender] += 1
+        riposte = defending.choose_riposte(defense_type, self.distance,
+                                           attacking.blade_position)
+        if riposte is None:
+            self._schedule(self.clock, READY, defender)
+        else:
+            self._schedule(self.clock + riposte.properties.execution_time,
+                           ACTION, defender, (self.clock, riposte))
+
+
+def simulate_many_timed(n: int,
+                        fencer1_spec: FencerSpec,
+                        fencer2_spec: FencerSpec,
+                        seed: Optional[int] = None,
+                        points_to_win: int = 5,
+                        sinks: Sequence[EventSink] = (),
+                        defenses: bool = False) -> List[BoutResult]:
+    """simulate_many for TimedBout, with the same per-bout seeding"""
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+
+    fencer1 = fencer1_spec.build()
+    fencer2 = fencer2_spec.build()
+
+    results = []
+    for index in range(n):
+        fencer1.reset()
+        fencer2.reset()
+        bout_seed = derive_seed(seed, index)
+        result = TimedBout(fencer1,
+                           fencer2,
+                           points_to_win,
+                           list(sinks),
+                           random.Random(bout_seed),
+                           defenses=defenses).simulate_bout()
+        result.seed = bout_seed
+        results.append(result)
+    return results
@@ -0,0 +1,209 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import combinations
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sim import FencerSpec, derive_seed, simulate_many
+from stats import ActionStatistics
+from vectorized import simulate_batch
+
+# (fencer index i, fencer index j, wins of i, wins of j)
+PairResult = Tuple[int, int, int, int]
+
+
+@dataclass
+class TournamentResult:
+    """Merged outcome of a round-robin tournament"""
+    specs: List[FencerSpec]
+    wins: List[List[int]]  # wins[i][j] = bouts fencer i won against fencer j
+    bouts_per_pair: int
+    # Per fencer/action/distance success rates, if collected
+    action_stats: Optional[ActionStatistics] = None
+
+    def win_rate(self, i: int, j: int) -> float:
+        return self.wins[i][j] / self.bouts_per_pair
+
+    def total_wins(self) -> List[int]:
+        return [sum(row) for row in self.wins]
+
+
+def pair_seed(seed: int, i: int, j: int) -> int:
+    """Derives the RNG seed of one pairing from the tournament seed.
+
+    Seeds depend only on the pairing, so results are identical regardless of
+    how pairs are chunked or how many workers run them.
+    """
+    return derive_seed(seed, i, j)
+
+
+def _play_pair(specs: Sequence[FencerSpec],
+               i: int,
+               j: int,
+               bouts: int,
+               points_to_win: int,
+               seed: int,
+               stats: Optional[ActionStatistics] = None) -> PairResult:
+    # Each fencer starts half of the bouts, since fencer1 acts first
+    first_half = bouts // 2
+    if stats is None:
+        # Outcomes only: the vectorized engine plays the batch
+        first = simulate_batch(first_half, specs[i], specs[j],
+                               pair_seed(seed, i, j), points_to_win)
+        second = simulate_batch(bouts - first_half, specs[j], specs[i],
+                                pair_seed(seed, j, i), points_to_win)
+        wins_i = int(np.count_nonzero(first.winners == 1)) + int(
+            np.count_nonzero(second.winners == 2))
+        return i, j, wins_i, bouts - wins_i
+
+    # Action statistics need the events of the per-object engine
+    wins_i = wins_j = 0
+    sinks = (stats, )
+
+    for result in simulate_many(first_half, specs[i], specs[j],
+                                pair_seed(seed, i, j), points_to_win, sinks):
+        if result.winner == 1:
+            wins_i += 1
+        else:
+            wins_j += 1
+
+    for result in simulate_many(bouts - first_half, specs[j], specs[i],
+                                pair_seed(seed, j, i), points_to_win, sinks):
+        if result.winner == 1:
+            wins_j += 1
+        else:
+            wins_i += 1
+
+    return i, j, wins_i, wins_j
+
+
+def _run_chunk(
+    specs: Sequence[FencerSpec], pairs: Sequence[Tuple[int, int]],
+    bouts: int, points_to_win: int, seed: int, collect_stats: bool
+) -> Tuple[List[PairResult], Optional[ActionStatistics]]:
+    # Workers send back their merged statistics instead of event logs
+    stats = ActionStatistics() if collect_stats else None
+    return [
+        _play_pair(specs, i, j, bouts, points_to_win, seed, stats)
+        for i, j in pairs
+    ], stats
+
+
+def run_tournament(specs: Sequence[FencerSpec],
+                   bouts_per_pair: int = 100,
+                   points_to_win: int = 5,
+                   seed: int = 0,
+                   workers: Optional[int] = None,
+                   chunk_size: Optional[int] = None,
+                   collect_stats: bool = False) -> TournamentResult:
+    """Plays every pair of specs against each other and merges a win matrix.
+
+    Pairs are sharded into chunks across a process pool. ``workers=1`` runs
+    everything in the current process. Bouts run on the vectorized engine;
+    with ``collect_stats`` they run on the per-object engine instead, and
+    every worker also aggregates action success rates, which are merged
+    into ``action_stats``.
+    """
+    specs = list(specs)
+    workers = workers or os.cpu_count() or 1
+    pairs = list(combinations(range(len(specs)), 2))
+
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool balanced without paying
+        # the pickling overhead of one task per pair
+        chunk_size = max(1, len(pairs) // (workers * 4))
+    chunks = [
+        pairs[start:start + chunk_size]
+        for start in range(0, len(pairs), chunk_size)
+    ]
+
+    wins = [[0] * len(specs) for _ in specs]
+    action_stats = ActionStatistics() if collect_stats else None
+
+    def merge(chunk_results: List[PairResult],
+              chunk_stats: Optional[ActionStatistics]):
+        for i, j, wins_i, wins_j in chunk_results:
+            wins[i][j] += wins_i
+            wins[j][i] += wins_j
+        if chunk_stats is not None:
+            action_stats.merge(chunk_stats)
+
+    if workers == 1:
+        for chunk in chunks:
+            merge(*_run_chunk(specs, chunk, bouts_per_pair, points_to_win,
+                              seed, collect_stats))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_run_chunk, specs, chunk, bouts_per_pair,
+                                points_to_win, seed, collect_stats)
+                for chunk in chunks
+            ]
+            for future in futures:
+                merge(*future.result())
+
+    return TournamentResult(specs=specs,
+                            wins=wins,
+                            bouts_per_pair=bouts_per_pair,
+                            action_stats=action_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Round-robin tournament between fencer configurations")
+    parser.add_argument("--skills",
+                        type=float,
+                        nargs="+",
+                        default=[0.4, 0.5, 0.6, 0.7, 0.8],
+                        help="skill level of each participating fencer")
+    parser.add_argument("--bouts",
+                        type=int,
+                        default=100,
+                        help="bouts played per pairing")
+    parser.add_argument("--points", type=int, default=5, help="points to win")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers",
+                        type=int,
+                        default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--stats",
+                        action="store_true",
+                        help="report action success rates per distance")
+    args = parser.parse_args()
+
+    specs = [
+        FencerSpec(f"Fencer {index + 1}", skill)
+        for index, skill in enumerate(args.skills)
+    ]
+    result = run_tournament(specs,
+                            bouts_per_pair=args.bouts,
+                            points_to_win=args.points,
+                            seed=args.seed,
+                            workers=args.workers,
+                            chunk_size=args.chunk_size,
+                            collect_stats=args.stats)
+
+    print(f"{'':12}" + "".join(f"{spec.name:>12}" for spec in specs))
+    for i, spec in enumerate(specs):
+        cells = "".join(
+            f"{'-':>12}" if i == j else f"{result.win_rate(i, j):>12.2f}"
+            for j in range(len(specs)))
+        print(f"{spec.name:12}{cells}")
+
+    print()
+    for spec, total in sorted(zip(specs, result.total_wins()),
+                              key=lambda item: item[1],
+                              reverse=True):
+        print(f"{spec.name:12} {total} wins")
+
+    if result.action_stats is not None:
+        print()
+        print(result.action_stats.report())
+
+
+if __name__ == "__main__":
+    main()